@@ -1,150 +1,165 @@
 # Backend/ml/datasets/build_dataset.py
 # ------------------------------------------------------------
-# Gera dataset enriquecido (Elo + forma rolling + odds pré-jogo)
+# Gera dataset enriquecido (Elo + forma rolling + stats rolling + odds pré-jogo)
 # Lê CSVs em Backend/data/matches/<pasta-liga>/*.csv
-# Salva em: Backend/ml/datasets/matches_enriched.csv
+# Salva em: Backend/ml/datasets/matches_enriched.csv (+ matches_enriched.parquet tipado)
 # ------------------------------------------------------------
 
 import os
 import re
+import sys
 import glob
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
 from typing import Dict, Tuple, Optional, List
 
+import numpy as np
 import pandas as pd
 
-# =========================
-# Parsing de placar e data
-# =========================
-
-SCORE_RE = re.compile(r"^\s*(\d+)\s*-\s*(\d+)\s*$")
-
-
-def parse_score(s: str) -> Optional[Tuple[int, int]]:
-    """Converte '2-1' -> (2,1). Retorna None se vazio/inválido."""
-    if not isinstance(s, str) or not s.strip():
-        return None
-    m = SCORE_RE.match(s.strip())
-    if not m:
-        return None
-    return int(m.group(1)), int(m.group(2))
-
-
-def safe_to_datetime(x) -> Optional[pd.Timestamp]:
-    """Converte Date (YYYY-MM-DD) -> Timestamp. Retorna None se vazio/inválido."""
-    if pd.isna(x) or str(x).strip() == "":
-        return None
-    dt = pd.to_datetime(x, format="%Y-%m-%d", errors="coerce")
-    if pd.isna(dt):
-        return None
-    return dt
-
-
-def result_1x2(hg: int, ag: int) -> int:
-    """0=Home, 1=Draw, 2=Away."""
-    if hg > ag:
-        return 0
-    if hg == ag:
-        return 1
-    return 2
-
+# Garante que o diretório atual (datasets/) está no sys.path (para importar o engine)
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if THIS_DIR not in sys.path:
+    sys.path.insert(0, THIS_DIR)
+
+from feature_engine import (  # noqa: E402
+    EloConfig,
+    FEATURE_COLS,
+    POST_COLS,
+    PoolState,
+    compute_elo_form_features,
+    export_elo_snapshot,
+    load_states,
+    save_states,
+)
+from feature_store import TeamFeatureStore, events_from_enriched, store_path_for  # noqa: E402
+from dataset_io import read_enriched, typed_path_for, write_typed  # noqa: E402
+from rolling_features import rolling_feature_cols, rolling_feature_frame, stat_source_cols  # noqa: E402
+from match_cache import MatchCsvCache  # noqa: E402
 
 # =========================
-# Elo
+# Parsing vetorizado (placar, data, odds)
 # =========================
 
-@dataclass
-class EloConfig:
-    base_elo: float = 1500.0
-    k: float = 20.0
-    home_adv: float = 60.0  # vantagem de casa para feature
+SCORE_RE = r"^\s*(\d+)\s*-\s*(\d+)\s*$"
 
 
-def elo_expected(elo_a: float, elo_b: float) -> float:
-    return 1.0 / (1.0 + 10 ** ((elo_b - elo_a) / 400.0))
+def parse_score_cols(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """'2-1' -> (2, 1) em 2 colunas inteiras (Int64); NA se vazio/inválido/não-texto."""
+    txt = s.where(s.map(type) == str).astype("string").str.strip()
+    m = txt.str.extract(SCORE_RE)
+    return pd.to_numeric(m[0], errors="coerce"), pd.to_numeric(m[1], errors="coerce")
 
 
-def elo_update(elo_home: float, elo_away: float, outcome_home: float, cfg: EloConfig) -> Tuple[float, float]:
-    """
-    outcome_home: 1.0 (home win), 0.5 (draw), 0.0 (home loss)
-    Atualiza Elo "real" (sem home_adv).
-    """
-    exp_home = elo_expected(elo_home, elo_away)
-    exp_away = 1.0 - exp_home
+def parse_date_col(s: pd.Series) -> pd.Series:
+    """Date (YYYY-MM-DD) -> datetime64; NaT se vazio/inválido (formato fixo)."""
+    return pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
 
-    new_home = elo_home + cfg.k * (outcome_home - exp_home)
-    new_away = elo_away + cfg.k * ((1.0 - outcome_home) - exp_away)
-    return new_home, new_away
 
-
-# =========================
-# Forma (rolling)
-# =========================
-
-def points_from_result(target_1x2: int, is_home_team: bool) -> int:
-    """
-    Converte resultado em pontos para o time:
-    - empate: 1
-    - vitória: 3
-    - derrota: 0
-    """
-    if target_1x2 == 1:
-        return 1
-    if (target_1x2 == 0 and is_home_team) or (target_1x2 == 2 and not is_home_team):
-        return 3
-    return 0
+def result_1x2_col(hg: pd.Series, ag: pd.Series) -> pd.Series:
+    """0=Home, 1=Draw, 2=Away."""
+    return pd.Series(np.select([hg > ag, hg == ag], [0, 1], default=2), index=hg.index)
 
 
-def rolling_sum(vals: List[int], n: int) -> float:
-    if not vals:
-        return 0.0
-    return float(sum(vals[-n:]))
+def to_float_col(s: pd.Series) -> pd.Series:
+    """Coerção numérica aceitando vírgula decimal ('1,85'); inválido/vazio -> NaN."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(np.float64)
+    out = pd.to_numeric(s, errors="coerce").astype(np.float64)
+    # só o que sobrou como texto (ex.: vírgula decimal) passa pelo caminho de string
+    todo = out.isna() & (s.map(type) == str)
+    if todo.any():
+        txt = s[todo].astype("string").str.strip().str.replace(",", ".", regex=False)
+        out[todo] = pd.to_numeric(txt, errors="coerce").astype(np.float64)
+    return out
 
 
 # =========================
-# Helpers de odds (pré-jogo)
+# Odds (pré-jogo)
 # =========================
 
-def safe_float(x) -> Optional[float]:
-    if x is None:
-        return None
-    if isinstance(x, float) and pd.isna(x):
-        return None
-    s = str(x).strip()
-    if s == "" or s.lower() == "nan":
-        return None
-    try:
-        return float(s.replace(",", "."))
-    except Exception:
-        return None
-
+ODDS_FEATURE_COLS = [
+    "odds_h", "odds_d", "odds_a",
+    "imp_ph", "imp_pd", "imp_pa",
+    "imp_overround_1x2", "imp_ph_minus_pa",
+    "ou_odds_over25", "ou_odds_under25",
+    "ou_p_over25", "ou_p_under25",
+    "ou_overround", "ou_p_over_minus_under",
+]
 
-def implied_prob(odds: Optional[float]) -> Optional[float]:
-    """Probabilidade implícita 1/odds (sem remover vigorish)."""
-    if odds is None:
-        return None
-    if odds <= 1e-9:
-        return None
-    return 1.0 / odds
+# Preferência: Pinnacle Close -> Pinnacle Open -> Avg Open -> Bet365 Open
+ODDS_CHAIN_H = ["PinnacleHomeClose", "PinnacleHomeOpen", "AvgHomeOpen", "Bet365HomeOpen"]
+ODDS_CHAIN_D = ["PinnacleDrawClose", "PinnacleDrawOpen", "AvgDrawOpen", "Bet365DrawOpen"]
+ODDS_CHAIN_A = ["PinnacleAwayClose", "PinnacleAwayOpen", "AvgAwayOpen", "Bet365AwayOpen"]
+OU_CHAIN_OVER = ["PinnacleOver25Open", "AvgOver25Open", "Bet365Over25Open"]
+OU_CHAIN_UNDER = ["PinnacleUnder25Open", "AvgUnder25Open", "Bet365Under25Open"]
 
 
-def normalize_probs(p_home, p_draw, p_away) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
+def first_truthy(df: pd.DataFrame, cols: List[str]) -> pd.Series:
     """
-    Normaliza probabilidades removendo o overround.
-    Retorna (ph, pd, pa, overround) onde overround = soma - 1.
+    Equivalente coluna a coluna de `r[c1] or r[c2] or ...` (regra histórica do dataset):
+    - 0.0 e colunas totalmente vazias são "falsy" -> passa p/ a próxima
+    - NaN numa coluna com dados é "truthy" em Python e encerra a cadeia
     """
-    if p_home is None or p_draw is None or p_away is None:
-        return None, None, None, None
-    s = p_home + p_draw + p_away
-    if s <= 1e-9:
-        return None, None, None, None
-    return p_home / s, p_draw / s, p_away / s, (s - 1.0)
-
-
-def prob_diff(ph: Optional[float], pa: Optional[float]) -> Optional[float]:
-    if ph is None or pa is None:
-        return None
-    return ph - pa
+    out = df[cols[-1]]
+    for c in reversed(cols[:-1]):
+        v = df[c]
+        if v.isna().all():
+            continue
+        out = v.where(v != 0, out)
+    return out
+
+
+def implied_prob_col(odds: pd.Series) -> pd.Series:
+    """Probabilidade implícita 1/odds (sem remover vigorish); odds <= 0 -> NaN."""
+    return (1.0 / odds).where(~(odds <= 1e-9))
+
+
+def odds_feature_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    """Odds “raw” selecionadas + derivadas (pré-jogo), todas as linhas de uma vez."""
+    p_h = first_truthy(raw, ODDS_CHAIN_H)
+    p_d = first_truthy(raw, ODDS_CHAIN_D)
+    p_a = first_truthy(raw, ODDS_CHAIN_A)
+
+    ip_h = implied_prob_col(p_h)
+    ip_d = implied_prob_col(p_d)
+    ip_a = implied_prob_col(p_a)
+
+    # Normaliza removendo o overround (overround = soma - 1)
+    s = ip_h + ip_d + ip_a
+    ok = ~(s <= 1e-9)
+    ph = (ip_h / s).where(ok)
+    pd_ = (ip_d / s).where(ok)
+    pa = (ip_a / s).where(ok)
+    overround = (s - 1.0).where(ok)
+
+    # O/U 2.5 (se tiver) -> normaliza 2-way
+    ou_over = first_truthy(raw, OU_CHAIN_OVER)
+    ou_under = first_truthy(raw, OU_CHAIN_UNDER)
+    ip_over = implied_prob_col(ou_over)
+    ip_under = implied_prob_col(ou_under)
+
+    s2 = ip_over + ip_under
+    ok2 = s2 > 1e-9
+    p_over = (ip_over / s2).where(ok2)
+    p_under = (ip_under / s2).where(ok2)
+
+    return pd.DataFrame({
+        "odds_h": p_h,
+        "odds_d": p_d,
+        "odds_a": p_a,
+        "imp_ph": ph,
+        "imp_pd": pd_,
+        "imp_pa": pa,
+        "imp_overround_1x2": overround,
+        "imp_ph_minus_pa": ph - pa,
+
+        "ou_odds_over25": ou_over,
+        "ou_odds_under25": ou_under,
+        "ou_p_over25": p_over,
+        "ou_p_under25": p_under,
+        "ou_overround": (s2 - 1.0).where(ok2),
+        "ou_p_over_minus_under": p_over - p_under,
+    }, index=raw.index)
 
 
 # =========================
@@ -225,11 +240,41 @@ def pool_key_for_comp(comp: str) -> str:
 # Builder principal
 # =========================
 
-def build_enriched_dataset(matches_root: str, out_csv: str, elo_cfg: EloConfig = EloConfig()) -> pd.DataFrame:
+# Colunas de odds (podem não existir em ligas antigas)
+RAW_ODDS_COLS = [
+    "PinnacleHomeOpen", "PinnacleDrawOpen", "PinnacleAwayOpen",
+    "AvgHomeOpen", "AvgDrawOpen", "AvgAwayOpen",
+    "MaxHomeOpen", "MaxDrawOpen", "MaxAwayOpen",
+    "Bet365HomeOpen", "Bet365DrawOpen", "Bet365AwayOpen",
+
+    "Bet365Over25Open", "Bet365Under25Open",
+    "PinnacleOver25Open", "PinnacleUnder25Open",
+    "AvgOver25Open", "AvgUnder25Open",
+
+    "PinnacleHomeClose", "PinnacleDrawClose", "PinnacleAwayClose",
+    "AvgHomeClose", "AvgDrawClose", "AvgAwayClose",
+]
+
+# Estatísticas de jogo (chutes, escanteios...) usadas pelas features rolling
+STAT_COLS = stat_source_cols()
+ROLLING_FEATURE_COLS = rolling_feature_cols()
+
+# Colunas que identificam um jogo + tudo que entra nas features (watermark/hash)
+MATCH_KEY_COLS = ["pool_key", "competition", "season", "date", "Home", "Away"]
+HASH_COLS = MATCH_KEY_COLS + ["ft_home_goals", "ft_away_goals"] + RAW_ODDS_COLS + STAT_COLS
+
+
+def load_history(matches_root: str, use_cache: bool = True) -> Tuple[pd.DataFrame, dict]:
+    """
+    Lê os CSVs das pastas permitidas e devolve o histórico (jogos com
+    date + placar), deduplicado e ordenado por pool_key + data.
+    CSVs inalterados vêm do cache colunar (match_cache.py).
+    """
     files = glob.glob(os.path.join(matches_root, "**", "*.csv"), recursive=True)
     if not files:
         raise FileNotFoundError(f"Nenhum CSV encontrado em: {matches_root}")
 
+    cache = MatchCsvCache(enabled=use_cache)
     dfs = []
     used_files = 0
     skipped_folder = 0
@@ -242,7 +287,7 @@ def build_enriched_dataset(matches_root: str, out_csv: str, elo_cfg: EloConfig =
             continue
 
         try:
-            df = pd.read_csv(fp)
+            df = cache.read(fp)
         except Exception:
             continue
 
@@ -256,20 +301,7 @@ def build_enriched_dataset(matches_root: str, out_csv: str, elo_cfg: EloConfig =
             df["HalfTime"] = None
 
         # === garante colunas de odds (podem não existir em ligas antigas) ===
-        ODDS_COLS = [
-            "PinnacleHomeOpen", "PinnacleDrawOpen", "PinnacleAwayOpen",
-            "AvgHomeOpen", "AvgDrawOpen", "AvgAwayOpen",
-            "MaxHomeOpen", "MaxDrawOpen", "MaxAwayOpen",
-            "Bet365HomeOpen", "Bet365DrawOpen", "Bet365AwayOpen",
-
-            "Bet365Over25Open", "Bet365Under25Open",
-            "PinnacleOver25Open", "PinnacleUnder25Open",
-            "AvgOver25Open", "AvgUnder25Open",
-
-            "PinnacleHomeClose", "PinnacleDrawClose", "PinnacleAwayClose",
-            "AvgHomeClose", "AvgDrawClose", "AvgAwayClose",
-        ]
-        for c in ODDS_COLS:
+        for c in RAW_ODDS_COLS + STAT_COLS:
             if c not in df.columns:
                 df[c] = None
 
@@ -281,33 +313,23 @@ def build_enriched_dataset(matches_root: str, out_csv: str, elo_cfg: EloConfig =
         dfs.append(df)
         used_files += 1
 
+    cache.save()
+
     if not dfs:
         raise RuntimeError("Nenhum CSV válido encontrado (com colunas Home/Away/Date) nas pastas permitidas.")
 
     raw = pd.concat(dfs, ignore_index=True)
 
     # Parse Date e (FT) score
-    raw["date"] = raw["Date"].apply(safe_to_datetime)
-    ft_scores = raw["FullTime"].apply(parse_score)
-    raw["ft_home_goals"] = ft_scores.apply(lambda x: x[0] if x else None)
-    raw["ft_away_goals"] = ft_scores.apply(lambda x: x[1] if x else None)
-
-    # Converte odds para float (sem quebrar)
-    ODDS_COLS = [
-        "PinnacleHomeOpen", "PinnacleDrawOpen", "PinnacleAwayOpen",
-        "AvgHomeOpen", "AvgDrawOpen", "AvgAwayOpen",
-        "MaxHomeOpen", "MaxDrawOpen", "MaxAwayOpen",
-        "Bet365HomeOpen", "Bet365DrawOpen", "Bet365AwayOpen",
-
-        "Bet365Over25Open", "Bet365Under25Open",
-        "PinnacleOver25Open", "PinnacleUnder25Open",
-        "AvgOver25Open", "AvgUnder25Open",
-
-        "PinnacleHomeClose", "PinnacleDrawClose", "PinnacleAwayClose",
-        "AvgHomeClose", "AvgDrawClose", "AvgAwayClose",
-    ]
-    for c in ODDS_COLS:
-        raw[c] = raw[c].apply(safe_float)
+    raw["date"] = parse_date_col(raw["Date"])
+    raw["ft_home_goals"], raw["ft_away_goals"] = parse_score_cols(raw["FullTime"])
+
+    # Converte odds para float (sem quebrar) + features de odds
+    for c in RAW_ODDS_COLS:
+        raw[c] = to_float_col(raw[c])
+    raw = pd.concat([raw, odds_feature_frame(raw)], axis=1)
+    for c in STAT_COLS:
+        raw[c] = to_float_col(raw[c])
 
     # Histórico: só jogos com date + placar (sem leak)
     hist = raw.dropna(subset=["date", "ft_home_goals", "ft_away_goals"]).copy()
@@ -318,7 +340,7 @@ def build_enriched_dataset(matches_root: str, out_csv: str, elo_cfg: EloConfig =
     hist["ft_away_goals"] = hist["ft_away_goals"].astype(int)
 
     # Target 1X2
-    hist["target_1x2"] = hist.apply(lambda r: result_1x2(r["ft_home_goals"], r["ft_away_goals"]), axis=1)
+    hist["target_1x2"] = result_1x2_col(hist["ft_home_goals"], hist["ft_away_goals"])
 
     # Dedup de cópias reais
     before = len(hist)
@@ -331,157 +353,295 @@ def build_enriched_dataset(matches_root: str, out_csv: str, elo_cfg: EloConfig =
     # Ordenação temporal por pool
     hist = hist.sort_values(["pool_key", "date", "competition", "season"]).reset_index(drop=True)
 
-    # Estados por pool_key
-    elo_state: Dict[Tuple[str, str], float] = {}
-    form_points: Dict[Tuple[str, str], List[int]] = {}
-    form_gd: Dict[Tuple[str, str], List[int]] = {}
-
-    def get_elo(pool_key: str, team: str) -> float:
-        return float(elo_state.get((pool_key, team), elo_cfg.base_elo))
-
-    def push_form(pool_key: str, team: str, pts: int, gd: int):
-        key = (pool_key, team)
-        form_points.setdefault(key, []).append(int(pts))
-        form_gd.setdefault(key, []).append(int(gd))
-
-        if len(form_points[key]) > 30:
-            form_points[key] = form_points[key][-30:]
-        if len(form_gd[key]) > 30:
-            form_gd[key] = form_gd[key][-30:]
-
-    enriched_rows: List[dict] = []
-
-    for _, r in hist.iterrows():
-        pool_key = str(r["pool_key"])
-        home = str(r["Home"])
-        away = str(r["Away"])
-
-        # Elo pré-jogo
-        elo_home_pre = get_elo(pool_key, home) + elo_cfg.home_adv
-        elo_away_pre = get_elo(pool_key, away)
-        elo_diff = elo_home_pre - elo_away_pre
-
-        # Forma pré-jogo
-        hp = form_points.get((pool_key, home), [])
-        ap = form_points.get((pool_key, away), [])
-        hgd = form_gd.get((pool_key, home), [])
-        agd = form_gd.get((pool_key, away), [])
-
-        # ===== Odds features (pré-jogo) =====
-        # Preferência: Pinnacle Close -> Pinnacle Open -> Avg Open -> Bet365 Open
-        p_h = r.get("PinnacleHomeClose") or r.get("PinnacleHomeOpen") or r.get("AvgHomeOpen") or r.get("Bet365HomeOpen")
-        p_d = r.get("PinnacleDrawClose") or r.get("PinnacleDrawOpen") or r.get("AvgDrawOpen") or r.get("Bet365DrawOpen")
-        p_a = r.get("PinnacleAwayClose") or r.get("PinnacleAwayOpen") or r.get("AvgAwayOpen") or r.get("Bet365AwayOpen")
-
-        ip_h = implied_prob(p_h)
-        ip_d = implied_prob(p_d)
-        ip_a = implied_prob(p_a)
-
-        ph, pd_, pa, overround = normalize_probs(ip_h, ip_d, ip_a)
-        ph_pa_diff = prob_diff(ph, pa)
-
-        # O/U 2.5 (se tiver)
-        ou_over = r.get("PinnacleOver25Open") or r.get("AvgOver25Open") or r.get("Bet365Over25Open")
-        ou_under = r.get("PinnacleUnder25Open") or r.get("AvgUnder25Open") or r.get("Bet365Under25Open")
-        ip_over = implied_prob(ou_over)
-        ip_under = implied_prob(ou_under)
-
-        # normaliza 2-way
-        if ip_over is not None and ip_under is not None and (ip_over + ip_under) > 1e-9:
-            s2 = ip_over + ip_under
-            p_over = ip_over / s2
-            p_under = ip_under / s2
-            overround_ou = s2 - 1.0
-        else:
-            p_over, p_under, overround_ou = None, None, None
+    info = {
+        "used_files": used_files,
+        "skipped_folder": skipped_folder,
+        "removed": removed,
+        "cache_hits": cache.hits,
+        "cache_misses": cache.misses,
+    }
+    return hist, info
+
+
+def enrich_history(
+    hist: pd.DataFrame,
+    elo_cfg: EloConfig,
+    states: Optional[Dict[str, PoolState]] = None,
+    workers: int = 1,
+) -> Tuple[pd.DataFrame, Dict[str, PoolState]]:
+    """
+    Gera as linhas do dataset enriquecido (avança `states` in-place).
+    Com workers > 1, cada pool_key roda num processo separado: pools não
+    compartilham estado, e o resultado é concatenado na ordem do `hist`.
+    """
+    if states is None:
+        states = {}
+
+    shards = [(str(pk), g) for pk, g in hist.groupby("pool_key", sort=False)]
+    if workers <= 1 or len(shards) <= 1:
+        return _enrich_rows(hist, elo_cfg, states), states
+
+    parts = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as ex:
+        futures = [ex.submit(_enrich_pool, g, elo_cfg, states.get(pk)) for pk, g in shards]
+        for (pk, _), fut in zip(shards, futures):
+            part, st = fut.result()
+            parts.append(part)
+            states[pk] = st
+
+    return pd.concat(parts, ignore_index=True), states
+
+
+def _enrich_pool(pool_hist: pd.DataFrame, elo_cfg: EloConfig, state: Optional[PoolState]):
+    """Worker: 1 pool_key -> (linhas enriquecidas, estado final do pool)."""
+    pk = str(pool_hist["pool_key"].iloc[0])
+    states = {pk: state} if state is not None else {}
+    out_df = _enrich_rows(pool_hist, elo_cfg, states)
+    return out_df, states[pk]
+
+
+def _enrich_rows(hist: pd.DataFrame, elo_cfg: EloConfig, states: Dict[str, PoolState]) -> pd.DataFrame:
+    # Elo + forma (engine vetorizado por pool_key)
+    feats, _ = compute_elo_form_features(
+        hist["pool_key"].astype(str).values,
+        hist["Home"].astype(str).values,
+        hist["Away"].astype(str).values,
+        hist["target_1x2"].values,
+        hist["ft_home_goals"].values,
+        hist["ft_away_goals"].values,
+        elo_cfg,
+        states=states,
+        with_post=True,
+    )
+
+    out_df = pd.DataFrame({
+        "league_folder": hist["league_folder"].values,
+        "pool_key": hist["pool_key"].astype(str).values,
+        "competition": hist["competition"].values,
+        "season": hist["season"].values,
+        "date": hist["date"].dt.strftime("%Y-%m-%d").values,
+        "home": hist["Home"].astype(str).values,
+        "away": hist["Away"].astype(str).values,
+        "ft_home_goals": hist["ft_home_goals"].values,
+        "ft_away_goals": hist["ft_away_goals"].values,
+        "target_1x2": hist["target_1x2"].astype(int).values,
+
+        # Elo + forma
+        **{c: feats[c] for c in FEATURE_COLS},
+    })
+    odds_df = hist[ODDS_FEATURE_COLS + ROLLING_FEATURE_COLS].reset_index(drop=True)
+    post_df = pd.DataFrame({c: feats[c] for c in POST_COLS})  # só p/ o feature store (não vai pro CSV)
+    return pd.concat([out_df, odds_df, post_df], axis=1)
+
+
+# =========================
+# Modo incremental (estado + watermark)
+# =========================
+
+def state_path_for(out_csv: str) -> str:
+    """Estado Elo/forma fica ao lado do CSV: matches_enriched_state.npz"""
+    return os.path.splitext(out_csv)[0] + "_state.npz"
+
+
+def snapshot_path_for(out_csv: str) -> str:
+    """Snapshot p/ inferência (lido pelo predict_from_betano_odds.py): elo_ratings.json"""
+    return os.path.join(os.path.dirname(out_csv), "elo_ratings.json")
 
-        row = {
-            "league_folder": r.get("league_folder"),
-            "pool_key": pool_key,
-            "competition": r.get("competition"),
-            "season": r["season"],
+
+def history_row_hashes(hist: pd.DataFrame) -> np.ndarray:
+    """Hash (uint64) por jogo sobre chave + placar + odds brutas."""
+    return pd.util.hash_pandas_object(hist[HASH_COLS], index=False).values
+
+
+def combine_hashes(h: np.ndarray) -> str:
+    """Combina hashes por soma (independe da ordem; overflow uint64 é proposital)."""
+    return str(int(h.sum(dtype=np.uint64)))
+
+
+def pool_watermarks(hist: pd.DataFrame, row_hashes: np.ndarray) -> Dict[str, dict]:
+    """
+    Último jogo processado por pool: (data, chave do jogo) + hashes dos jogos
+    dessa mesma data (jogos que chegam depois no mesmo dia ainda contam como novos).
+    """
+    wm: Dict[str, dict] = {}
+    last = hist.groupby("pool_key", sort=False).tail(1)
+    for r in last.to_dict("records"):
+        pk = str(r["pool_key"])
+        same_day = ((hist["pool_key"] == r["pool_key"]) & (hist["date"] == r["date"])).values
+        wm[pk] = {
             "date": r["date"].strftime("%Y-%m-%d"),
-            "home": home,
-            "away": away,
-            "ft_home_goals": int(r["ft_home_goals"]),
-            "ft_away_goals": int(r["ft_away_goals"]),
-            "target_1x2": int(r["target_1x2"]),
-
-            # Elo + forma
-            "elo_home_pre": float(elo_home_pre),
-            "elo_away_pre": float(elo_away_pre),
-            "elo_diff": float(elo_diff),
-            "form_pts_home_3": rolling_sum(hp, 3),
-            "form_pts_home_5": rolling_sum(hp, 5),
-            "form_pts_away_3": rolling_sum(ap, 3),
-            "form_pts_away_5": rolling_sum(ap, 5),
-            "gd_home_5": rolling_sum(hgd, 5),
-            "gd_away_5": rolling_sum(agd, 5),
-
-            # Odds “raw” selecionadas + derivadas
-            "odds_h": p_h,
-            "odds_d": p_d,
-            "odds_a": p_a,
-            "imp_ph": ph,
-            "imp_pd": pd_,
-            "imp_pa": pa,
-            "imp_overround_1x2": overround,
-            "imp_ph_minus_pa": ph_pa_diff,
-
-            "ou_odds_over25": ou_over,
-            "ou_odds_under25": ou_under,
-            "ou_p_over25": p_over,
-            "ou_p_under25": p_under,
-            "ou_overround": overround_ou,
-            "ou_p_over_minus_under": (p_over - p_under) if (p_over is not None and p_under is not None) else None,
+            "match_key": f'{r["competition"]}|{r["season"]}|{r["Home"]}|{r["Away"]}',
+            "date_hashes": [str(int(h)) for h in row_hashes[same_day]],
         }
+    return wm
 
-        enriched_rows.append(row)
 
-        # Outcome para Elo update
-        if row["target_1x2"] == 0:
-            outcome_home = 1.0
-        elif row["target_1x2"] == 1:
-            outcome_home = 0.5
-        else:
-            outcome_home = 0.0
+def match_keys_of(df: pd.DataFrame, home: str = "home", away: str = "away") -> np.ndarray:
+    """competition|season|home|away por linha (chave única do jogo)."""
+    parts = [df[c].astype(str) for c in ("competition", "season", home, away)]
+    return (parts[0] + "|" + parts[1] + "|" + parts[2] + "|" + parts[3]).to_numpy(dtype=object)
+
 
-        # Atualiza Elo "real" (sem home_adv)
-        elo_home_real = get_elo(pool_key, home)
-        elo_away_real = get_elo(pool_key, away)
-        new_home, new_away = elo_update(elo_home_real, elo_away_real, outcome_home, elo_cfg)
-        elo_state[(pool_key, home)] = new_home
-        elo_state[(pool_key, away)] = new_away
+def history_positions(hist: pd.DataFrame, is_new: np.ndarray, old_df: pd.DataFrame) -> Optional[np.ndarray]:
+    """
+    Posição no hist de cada linha do CSV anterior (pela chave do jogo). None se
+    o CSV não tem exatamente os jogos antigos (fora do watermark) -> rebuild total.
+    """
+    keys = pd.Index(match_keys_of(hist, "Home", "Away"))
+    if not keys.is_unique:
+        return None
+    pos = keys.get_indexer(match_keys_of(old_df))
+    if (pos < 0).any() or not np.array_equal(np.sort(pos), np.flatnonzero(~is_new)):
+        return None
+    return pos
 
-        # Atualiza forma
-        pts_home = points_from_result(row["target_1x2"], is_home_team=True)
-        pts_away = points_from_result(row["target_1x2"], is_home_team=False)
-        gd_home = row["ft_home_goals"] - row["ft_away_goals"]
-        gd_away = -gd_home
 
-        push_form(pool_key, home, pts_home, gd_home)
-        push_form(pool_key, away, pts_away, gd_away)
+def split_by_watermark(hist: pd.DataFrame, meta: dict) -> Optional[np.ndarray]:
+    """
+    Retorna máscara dos jogos novos (após o watermark do seu pool), ou None se
+    algo mudou atrás do watermark (jogo novo/alterado/removido) -> rebuild total.
+    """
+    wm = meta.get("watermarks") or {}
+    row_hashes = history_row_hashes(hist)
 
-    out_df = pd.DataFrame(enriched_rows)
+    wm_dates = hist["pool_key"].astype(str).map({pk: v["date"] for pk, v in wm.items()})
+    wm_dates = pd.to_datetime(wm_dates, format="%Y-%m-%d")
+    seen_on_wm_date = {int(h) for v in wm.values() for h in v.get("date_hashes", [])}
 
-    os.makedirs(os.path.dirname(out_csv), exist_ok=True)
-    out_df.to_csv(out_csv, index=False, encoding="utf-8")
+    on_wm_date = (hist["date"] == wm_dates).values
+    seen = np.fromiter((int(h) in seen_on_wm_date for h in row_hashes), dtype=bool, count=len(row_hashes))
+    is_new = (wm_dates.isna() | (hist["date"] > wm_dates)).values | (on_wm_date & ~seen)
 
-    print(f"[OK] CSVs lidos (pastas permitidas): {used_files}")
-    print(f"[OK] Arquivos ignorados (fora do escopo): {skipped_folder}")
-    print(f"[OK] Duplicatas reais removidas: {removed}")
+    old_hashes = row_hashes[~is_new]
+    if len(old_hashes) != meta.get("n_rows") or combine_hashes(old_hashes) != meta.get("rows_hash"):
+        return None
+    return is_new
+
+
+def build_enriched_dataset(
+    matches_root: str,
+    out_csv: str,
+    elo_cfg: EloConfig = EloConfig(),
+    incremental: bool = False,
+    workers: int = 1,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    hist, info = load_history(matches_root, use_cache=use_cache)
+    # rolling de stats no histórico inteiro (no incremental os jogos novos precisam dos antigos)
+    hist = pd.concat([hist, rolling_feature_frame(hist)], axis=1)
+    state_path = state_path_for(out_csv)
+
+    store_path = store_path_for(out_csv)
+
+    mode = "full"
+    out_df = None
+    states = None
+    store = None
+
+    if incremental and os.path.exists(out_csv):
+        states, meta = load_states(state_path)
+        store = TeamFeatureStore.load(store_path)
+        if states is None or store is None:
+            print("[INFO] Estado incremental ausente/incompatível -> rebuild completo")
+            states = None
+        elif meta.get("elo_cfg") != asdict(elo_cfg):
+            print("[INFO] EloConfig mudou -> rebuild completo")
+            states = None
+        else:
+            is_new = split_by_watermark(hist, meta)
+            if is_new is None:
+                print("[INFO] Jogo alterado atrás do watermark -> rebuild completo")
+                states = None
+            else:
+                # linhas antigas como texto (reescritas sem reformatar floats)
+                old_df = pd.read_csv(out_csv, dtype=str, keep_default_na=False)
+                old_pos = history_positions(hist, is_new, old_df)
+                if old_pos is None:
+                    print("[INFO] CSV anterior não bate com o histórico -> rebuild completo")
+                    states = None
+            if states is not None:
+                new_hist = hist.loc[is_new].reset_index(drop=True)
+                new_df, states = enrich_history(new_hist, elo_cfg, states, workers=workers)
+                new_rows = new_df.drop(columns=POST_COLS)
+                if list(new_rows.columns) != list(old_df.columns):
+                    print("[INFO] Colunas do dataset mudaram -> rebuild completo")
+                else:
+                    store = store.append(events_from_enriched(new_df))
+
+                    # antigas + novas na ordem do hist (= ordem do build completo: pool_key, data...)
+                    both = pd.concat([old_df, new_rows], ignore_index=True)
+                    order = np.argsort(np.concatenate([old_pos, np.flatnonzero(is_new)]), kind="stable")
+                    both.iloc[order].to_csv(out_csv, index=False, encoding="utf-8")
+                    out_df = read_enriched(out_csv, verbose=False)  # Parquet ficou velho -> CSV com dtypes
+                    mode = f"incremental (+{len(new_df)} jogos)"
+
+    if out_df is None:
+        out_df, states = enrich_history(hist, elo_cfg, workers=workers)
+        store = TeamFeatureStore.from_events(events_from_enriched(out_df), base_elo=elo_cfg.base_elo)
+        out_df = out_df.drop(columns=POST_COLS)
+        os.makedirs(os.path.dirname(out_csv), exist_ok=True)
+        out_df.to_csv(out_csv, index=False, encoding="utf-8")
+
+    store.save(store_path)
+
+    typed_path = typed_path_for(out_csv)
+    has_typed = write_typed(out_df, typed_path)
+
+    row_hashes = history_row_hashes(hist)
+    watermarks = pool_watermarks(hist, row_hashes)
+    save_states(state_path, states, {
+        "elo_cfg": asdict(elo_cfg),
+        "n_rows": int(len(hist)),
+        "rows_hash": combine_hashes(row_hashes),
+        "watermarks": watermarks,
+    })
+
+    snapshot_path = snapshot_path_for(out_csv)
+    export_elo_snapshot(snapshot_path, states, {
+        "elo_cfg": asdict(elo_cfg),
+        "watermarks": {pk: {"date": v["date"], "match_key": v["match_key"]} for pk, v in watermarks.items()},
+    })
+
+    print(f"[OK] CSVs lidos (pastas permitidas): {info['used_files']}")
+    print(f"[OK] Arquivos ignorados (fora do escopo): {info['skipped_folder']}")
+    print(f"[OK] Cache de CSVs: {info['cache_hits']} hits / {info['cache_misses']} relidos")
+    print(f"[OK] Duplicatas reais removidas: {info['removed']}")
+    print(f"[OK] Modo: {mode}")
     print(f"[OK] Dataset enriquecido: {len(out_df)} linhas")
     print(f"[OK] Salvo em: {out_csv}")
+    if has_typed:
+        print(f"[OK] Dataset tipado: {typed_path}")
+    else:
+        print("[WARN] pyarrow não instalado: dataset tipado (.parquet) não gerado")
+    print(f"[OK] Estado Elo/forma: {state_path}")
+    print(f"[OK] Snapshot Elo (inferência): {snapshot_path}")
+    print(f"[OK] Feature store as-of: {store_path} ({len(store.days)} eventos)")
 
     return out_df
 
 
 if __name__ == "__main__":
+    import argparse
+
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/datasets
     BACKEND_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))  # .../Backend
 
     MATCHES_ROOT = os.path.join(BACKEND_DIR, "data", "matches")
     OUT_CSV = os.path.join(BACKEND_DIR, "ml", "datasets", "matches_enriched.csv")
 
-    df = build_enriched_dataset(MATCHES_ROOT, OUT_CSV, EloConfig())
+    ap = argparse.ArgumentParser(description="Gera matches_enriched.csv (Elo + forma + odds).")
+    ap.add_argument("--incremental", action="store_true",
+                    help="processa só jogos após o watermark salvo (fallback: rebuild completo)")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="processos em paralelo (1 pool_key por processo)")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="ignora o cache colunar e relê todos os CSVs")
+    args = ap.parse_args()
+
+    df = build_enriched_dataset(
+        MATCHES_ROOT, OUT_CSV, EloConfig(),
+        incremental=args.incremental,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+    )
     print(df.head(10))
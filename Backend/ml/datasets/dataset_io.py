@@ -0,0 +1,170 @@
+# Backend/ml/datasets/dataset_io.py
+# ------------------------------------------------------------
+# Layout tipado (enxuto em memória) do matches_enriched
+#
+# - Texto (time, competição, pool_key, temporada, pasta) -> category
+# - Features do modelo (NUM_COLS) -> float32 (o DMatrix já usa float32)
+# - Odds e probs implícitas (odds_*, imp_*) e demais numéricas -> float64:
+#   vão p/ relatórios (odd média/mediana do pick), não só p/ o modelo
+# - Placar/target -> inteiros pequenos (int16/int8)
+# - date -> datetime64
+#
+# O build_dataset.py grava, ao lado do CSV, matches_enriched.parquet
+# (precisa de pyarrow; sem ele fica só o CSV). Os leitores (treino/eval)
+# usam read_enriched(): Parquet se estiver em dia, senão CSV com os mesmos
+# dtypes. Em ambos os casos imprime o uso de memória do DataFrame.
+# iter_enriched() lê os mesmos dados em lotes (treino em memória externa).
+# ------------------------------------------------------------
+
+import os
+import sys
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if THIS_DIR not in sys.path:
+    sys.path.insert(0, THIS_DIR)
+
+from match_cache import HAS_ARROW  # noqa: E402
+from feature_pipeline import NUM_COLS  # noqa: E402
+
+
+CAT_COLS = ["league_folder", "pool_key", "competition", "season", "home", "away"]
+INT_COLS = {"ft_home_goals": "int16", "ft_away_goals": "int16", "target_1x2": "int8"}
+DATE_COL = "date"
+
+# odds/probs implícitas ficam em float64 mesmo sendo feature (valor exato nos relatórios)
+REPORT_PREFIXES = ("odds_", "imp_")
+FLOAT32_COLS = {c for c in NUM_COLS if not c.startswith(REPORT_PREFIXES)}
+
+# Row groups menores deixam ler o Parquet em lotes (iter_enriched) sem carregar tudo
+ROW_GROUP_ROWS = 65536
+
+
+def enriched_dtypes(columns: List[str]) -> Dict[str, str]:
+    """dtype de cada coluna do dataset (texto/inteiro/data; features float32; resto float64)."""
+    out = {}
+    for c in columns:
+        if c in CAT_COLS:
+            out[c] = "category"
+        elif c in INT_COLS:
+            out[c] = INT_COLS[c]
+        elif c != DATE_COL:
+            out[c] = "float32" if c in FLOAT32_COLS else "float64"
+    return out
+
+
+def to_typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia do DataFrame no layout tipado."""
+    out = df.copy()
+    for c in CAT_COLS:
+        if c in out.columns:
+            out[c] = out[c].astype(str)  # CSV relido pode misturar int/str (ex.: season)
+    out = out.astype(enriched_dtypes(out.columns.tolist()))
+    if DATE_COL in out.columns:
+        out[DATE_COL] = pd.to_datetime(out[DATE_COL], errors="coerce")
+    return out
+
+
+def typed_path_for(out_csv: str) -> str:
+    """Artefato tipado fica ao lado do CSV: matches_enriched.parquet"""
+    return os.path.splitext(out_csv)[0] + ".parquet"
+
+
+def write_typed(df: pd.DataFrame, path: str) -> bool:
+    """Grava o Parquet tipado (escrita atômica). False se não há pyarrow."""
+    if not HAS_ARROW:
+        return False
+    tmp = path + ".tmp"
+    to_typed(df).to_parquet(tmp, index=False, row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp, path)
+    return True
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    return float(df.memory_usage(deep=True).sum()) / (1 << 20)
+
+
+def typed_is_fresh(csv_path: str) -> bool:
+    """
+    Parquet tipado existe, não é mais antigo que o CSV (e há pyarrow p/ ler) e
+    tem os floats no layout atual (Parquet de layout antigo -> lê o CSV).
+    """
+    typed_path = typed_path_for(csv_path)
+    if not (
+        HAS_ARROW
+        and os.path.exists(typed_path)
+        and (not os.path.exists(csv_path) or os.path.getmtime(typed_path) >= os.path.getmtime(csv_path))
+    ):
+        return False
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(typed_path)
+    want = enriched_dtypes(schema.names)
+    arrow_float = {"float": "float32", "double": "float64"}
+    return all(
+        arrow_float[str(f.type)] == want.get(f.name)
+        for f in schema if str(f.type) in arrow_float
+    )
+
+
+def enriched_columns(csv_path: str) -> List[str]:
+    """Colunas do dataset sem ler os dados (schema do Parquet ou header do CSV)."""
+    if typed_is_fresh(csv_path):
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(typed_path_for(csv_path)).names)
+    return pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+
+def read_enriched(csv_path: str, columns: Optional[List[str]] = None, verbose: bool = True) -> pd.DataFrame:
+    """
+    Lê o dataset enriquecido já tipado.
+    Usa o Parquet se existir e não for mais antigo que o CSV; senão lê o CSV com os dtypes.
+    """
+    typed_path = typed_path_for(csv_path)
+    use_typed = typed_is_fresh(csv_path)
+
+    if use_typed:
+        df = pd.read_parquet(typed_path, columns=columns)
+        src = typed_path
+    else:
+        header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+        usecols = columns if columns is not None else header
+        df = pd.read_csv(
+            csv_path,
+            usecols=usecols,
+            dtype=enriched_dtypes(usecols),
+            parse_dates=[DATE_COL] if DATE_COL in usecols else False,
+            float_precision="round_trip",  # float64 igual ao do build (odds/imp_*)
+        )
+        src = csv_path
+
+    if verbose:
+        print(f"[INFO] Dataset: {len(df)} linhas x {df.shape[1]} colunas | {frame_memory_mb(df):.1f} MB em memória ({os.path.basename(src)})")
+    return df
+
+
+def iter_enriched(csv_path: str, columns: List[str], batch_size: int = ROW_GROUP_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Lê o dataset em lotes de até `batch_size` linhas (mesmos dtypes do read_enriched),
+    na ordem do arquivo. Memória de pico ~ 1 lote (+ 1 row group do Parquet).
+    """
+    if typed_is_fresh(csv_path):
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(typed_path_for(csv_path))
+        for batch in pf.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    yield from pd.read_csv(
+        csv_path,
+        usecols=columns,
+        dtype=enriched_dtypes(columns),
+        parse_dates=[DATE_COL] if DATE_COL in columns else False,
+        float_precision="round_trip",
+        chunksize=batch_size,
+    )
+
@@ -0,0 +1,116 @@
+# Backend/ml/datasets/elo_sweep.py
+# ------------------------------------------------------------
+# Sweep de EloConfig (k, home_adv, base_elo) num único passe cronológico
+#
+# Em vez de rodar o build_enriched_dataset 1x por config, o histórico é
+# lido 1x e todas as configs avançam juntas (dimensão extra no array
+# de Elo). Métrica: log loss 1X2 da expectativa "só Elo", por config e
+# por pool_key (+ linha "ALL" com todos os pools).
+#
+# Uso:
+#   python elo_sweep.py --k 10:40:2 --home-adv 0:120:10
+#   python elo_sweep.py --k 16,20,24 --home-adv 60 --base-elo 1500
+#
+# Salva em: Backend/ml/datasets/elo_sweep_results.csv
+# ------------------------------------------------------------
+
+import os
+import sys
+import time
+import itertools
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+if THIS_DIR not in sys.path:
+    sys.path.insert(0, THIS_DIR)
+
+from feature_engine import EloConfig, sweep_elo_configs  # noqa: E402
+from build_dataset import load_history  # noqa: E402
+
+
+def parse_grid(spec: str) -> List[float]:
+    """'10:40:5' -> 10,15,...,40 (inclusivo) ; '16,20,24' -> lista ; '20' -> [20]"""
+    spec = str(spec).strip()
+    if ":" in spec:
+        parts = [float(x) for x in spec.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1.0
+        if step <= 0:
+            raise ValueError(f"Passo inválido no grid: {spec}")
+        return np.round(np.arange(start, stop + step / 2.0, step), 10).tolist()
+    return [float(x) for x in spec.split(",") if x.strip()]
+
+
+def build_grid(ks: List[float], home_advs: List[float], base_elos: List[float]) -> List[EloConfig]:
+    return [
+        EloConfig(base_elo=b, k=k, home_adv=h)
+        for b, k, h in itertools.product(base_elos, ks, home_advs)
+    ]
+
+
+def run_sweep(hist: pd.DataFrame, configs: List[EloConfig]) -> pd.DataFrame:
+    """Histórico (load_history) + configs -> tabela longa de log loss."""
+    loss, pools, counts = sweep_elo_configs(
+        hist["pool_key"].astype(str).values,
+        hist["Home"].astype(str).values,
+        hist["Away"].astype(str).values,
+        hist["target_1x2"].values,
+        configs,
+    )
+
+    total = np.vstack([loss, loss.sum(axis=0, keepdims=True)])
+    n = np.concatenate([counts, [counts.sum()]])
+    names = list(pools) + ["ALL"]
+
+    n_cfg = len(configs)
+    return pd.DataFrame({
+        "pool_key": np.repeat(names, n_cfg),
+        "k": np.tile([c.k for c in configs], len(names)),
+        "home_adv": np.tile([c.home_adv for c in configs], len(names)),
+        "base_elo": np.tile([c.base_elo for c in configs], len(names)),
+        "n_matches": np.repeat(n, n_cfg),
+        "logloss": (total / np.maximum(n, 1)[:, None]).ravel(),
+    })
+
+
+if __name__ == "__main__":
+    import argparse
+
+    BACKEND_DIR = os.path.abspath(os.path.join(THIS_DIR, "..", ".."))  # .../Backend
+    MATCHES_ROOT = os.path.join(BACKEND_DIR, "data", "matches")
+    OUT_CSV = os.path.join(THIS_DIR, "elo_sweep_results.csv")
+
+    default = EloConfig()
+    ap = argparse.ArgumentParser(description="Sweep de EloConfig (log loss 1X2 só Elo) num único passe.")
+    ap.add_argument("--k", default="10:40:2", help="grid de K ('a:b:passo' ou 'a,b,c')")
+    ap.add_argument("--home-adv", default="0:120:10", help="grid de vantagem de casa")
+    ap.add_argument("--base-elo", default=str(default.base_elo), help="grid de Elo inicial")
+    ap.add_argument("--no-cache", action="store_true", help="ignora o cache colunar e relê todos os CSVs")
+    ap.add_argument("--top", type=int, default=10, help="quantas configs mostrar no ranking geral")
+    ap.add_argument("--out", default=OUT_CSV)
+    args = ap.parse_args()
+
+    configs = build_grid(parse_grid(args.k), parse_grid(args.home_adv), parse_grid(args.base_elo))
+
+    t0 = time.perf_counter()
+    hist, _ = load_history(MATCHES_ROOT, use_cache=not args.no_cache)
+    t1 = time.perf_counter()
+    res = run_sweep(hist, configs)
+    t2 = time.perf_counter()
+
+    res.to_csv(args.out, index=False, encoding="utf-8")
+
+    print(f"[OK] Jogos: {len(hist)} | Configs: {len(configs)} | Pools: {res['pool_key'].nunique() - 1}")
+    print(f"[OK] Leitura: {t1 - t0:.1f}s | Sweep: {t2 - t1:.1f}s")
+    print(f"[OK] Resultados: {args.out}")
+
+    overall = res[res["pool_key"] == "ALL"].sort_values("logloss")
+    print(f"\n=== TOP {args.top} (todos os pools) ===")
+    print(overall.head(args.top).to_string(index=False))
+
+    best = res[res["pool_key"] != "ALL"].sort_values("logloss").groupby("pool_key", sort=True).head(1)
+    print("\n=== MELHOR CONFIG POR POOL ===")
+    print(best.sort_values("pool_key").to_string(index=False))
@@ -0,0 +1,465 @@
+# Backend/ml/datasets/feature_engine.py
+# ------------------------------------------------------------
+# Motor vetorizado de Elo + forma rolling (usado pelo build_dataset.py)
+#
+# - Elo: 1 array NumPy por pool_key, indexado por id inteiro do time
+# - Forma: ring buffers de tamanho fixo (pontos e saldo de gols)
+# - Jogos são agrupados em "ondas": dentro de uma onda nenhum time
+#   aparece 2x, então a onda inteira é processada de uma vez só
+#   (mesmo resultado do loop jogo a jogo, mas em lotes de colunas)
+# ------------------------------------------------------------
+
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+FORM_BUFFER = 30  # últimos N jogos guardados por time (igual ao loop antigo)
+
+
+# =========================
+# Elo
+# =========================
+
+@dataclass
+class EloConfig:
+    base_elo: float = 1500.0
+    k: float = 20.0
+    home_adv: float = 60.0  # vantagem de casa para feature
+
+
+def elo_expected(elo_a, elo_b):
+    """Funciona com float ou np.ndarray (pow vetorizado; pode diferir do escalar no último bit)."""
+    x = (elo_b - elo_a) / 400.0
+    return 1.0 / (1.0 + np.power(10.0, x))
+
+
+# =========================
+# Estado por pool
+# =========================
+
+@dataclass
+class PoolState:
+    """
+    Estado de Elo/forma de um pool_key.
+    - elo[i]: Elo "real" (sem home_adv) do time i
+    - pts_buf/gd_buf[i]: ring buffer com os últimos FORM_BUFFER jogos
+    - n_games[i]: total de jogos já empurrados (define a posição no ring)
+    """
+    base_elo: float = 1500.0
+    teams: List[str] = field(default_factory=list)
+    index: Dict[str, int] = field(default_factory=dict)
+    elo: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float64))
+    pts_buf: np.ndarray = field(default_factory=lambda: np.zeros((0, FORM_BUFFER), dtype=np.int16))
+    gd_buf: np.ndarray = field(default_factory=lambda: np.zeros((0, FORM_BUFFER), dtype=np.int16))
+    n_games: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    def team_ids(self, names) -> np.ndarray:
+        """Mapeia nomes -> ids, registrando times novos (Elo base, forma vazia)."""
+        ids = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            idx = self.index.get(name)
+            if idx is None:
+                idx = len(self.teams)
+                self.index[name] = idx
+                self.teams.append(name)
+            ids[i] = idx
+        self._grow(len(self.teams))
+        return ids
+
+    def _grow(self, n: int):
+        cur = len(self.elo)
+        if n <= cur:
+            return
+        extra = n - cur
+        self.elo = np.concatenate([self.elo, np.full(extra, self.base_elo, dtype=np.float64)])
+        self.pts_buf = np.vstack([self.pts_buf, np.zeros((extra, FORM_BUFFER), dtype=np.int16)])
+        self.gd_buf = np.vstack([self.gd_buf, np.zeros((extra, FORM_BUFFER), dtype=np.int16)])
+        self.n_games = np.concatenate([self.n_games, np.zeros(extra, dtype=np.int64)])
+
+    def last_n_sum(self, buf: np.ndarray, ids: np.ndarray, n: int) -> np.ndarray:
+        """Soma dos últimos n valores do ring buffer de cada time (0.0 se vazio)."""
+        k = np.arange(1, n + 1)
+        cnt = self.n_games[ids][:, None]
+        pos = (cnt - k[None, :]) % FORM_BUFFER
+        vals = buf[ids[:, None], pos].astype(np.float64)
+        vals[k[None, :] > cnt] = 0.0
+        return vals.sum(axis=1)
+
+    def push(self, ids: np.ndarray, pts: np.ndarray, gd: np.ndarray):
+        """Empurra 1 jogo por time (ids precisam ser únicos)."""
+        pos = self.n_games[ids] % FORM_BUFFER
+        self.pts_buf[ids, pos] = pts
+        self.gd_buf[ids, pos] = gd
+        self.n_games[ids] += 1
+
+
+# =========================
+# Ondas (lotes sem conflito)
+# =========================
+
+def wave_ids(home_ids: np.ndarray, away_ids: np.ndarray, n_teams: int) -> np.ndarray:
+    """
+    Onda de cada jogo = 1 + maior onda anterior de qualquer um dos 2 times.
+    Jogos da mesma onda não compartilham time, e a ordem relativa
+    dos jogos de cada time é preservada.
+    """
+    last = [-1] * n_teams
+    waves = np.empty(len(home_ids), dtype=np.int64)
+    for i, (h, a) in enumerate(zip(home_ids.tolist(), away_ids.tolist())):
+        w = max(last[h], last[a]) + 1
+        waves[i] = w
+        last[h] = w
+        last[a] = w
+    return waves
+
+
+# =========================
+# Engine
+# =========================
+
+FEATURE_COLS = [
+    "elo_home_pre", "elo_away_pre", "elo_diff",
+    "form_pts_home_3", "form_pts_home_5",
+    "form_pts_away_3", "form_pts_away_5",
+    "gd_home_5", "gd_away_5",
+]
+
+# Estado de cada time logo APÓS o jogo (usado pelo feature store as-of)
+POST_COLS = [
+    "elo_home_post", "elo_away_post",
+    "form_pts_home_3_post", "form_pts_home_5_post",
+    "form_pts_away_3_post", "form_pts_away_5_post",
+    "gd_home_5_post", "gd_away_5_post",
+]
+
+
+def compute_pool_features(
+    state: PoolState,
+    homes,
+    aways,
+    target_1x2: np.ndarray,
+    home_goals: np.ndarray,
+    away_goals: np.ndarray,
+    elo_cfg: EloConfig,
+    with_post: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    Calcula features pré-jogo de um pool (jogos já em ordem cronológica)
+    e avança o estado. Retorna {coluna: array} na ordem dos jogos.
+    Com with_post=True inclui também POST_COLS (estado após cada jogo).
+    """
+    n = len(homes)
+    cols = FEATURE_COLS + (POST_COLS if with_post else [])
+    out = {c: np.zeros(n, dtype=np.float64) for c in cols}
+    if n == 0:
+        return out
+
+    h_ids = state.team_ids(homes)
+    a_ids = state.team_ids(aways)
+
+    target = np.asarray(target_1x2, dtype=np.int64)
+    outcome_home = np.where(target == 0, 1.0, np.where(target == 1, 0.5, 0.0))
+    pts_home = np.where(target == 0, 3, np.where(target == 1, 1, 0))
+    pts_away = np.where(target == 2, 3, np.where(target == 1, 1, 0))
+    gd_home = np.asarray(home_goals, dtype=np.int64) - np.asarray(away_goals, dtype=np.int64)
+
+    waves = wave_ids(h_ids, a_ids, len(state.teams))
+    order = np.argsort(waves, kind="stable")
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+
+    for rows in np.split(order, bounds):
+        h = h_ids[rows]
+        a = a_ids[rows]
+
+        # Elo pré-jogo
+        elo_h = state.elo[h]
+        elo_a = state.elo[a]
+        out["elo_home_pre"][rows] = elo_h + elo_cfg.home_adv
+        out["elo_away_pre"][rows] = elo_a
+
+        # Forma pré-jogo
+        out["form_pts_home_3"][rows] = state.last_n_sum(state.pts_buf, h, 3)
+        out["form_pts_home_5"][rows] = state.last_n_sum(state.pts_buf, h, 5)
+        out["form_pts_away_3"][rows] = state.last_n_sum(state.pts_buf, a, 3)
+        out["form_pts_away_5"][rows] = state.last_n_sum(state.pts_buf, a, 5)
+        out["gd_home_5"][rows] = state.last_n_sum(state.gd_buf, h, 5)
+        out["gd_away_5"][rows] = state.last_n_sum(state.gd_buf, a, 5)
+
+        # Atualiza Elo "real" (sem home_adv)
+        exp_home = elo_expected(elo_h, elo_a)
+        exp_away = 1.0 - exp_home
+        o = outcome_home[rows]
+        state.elo[h] = elo_h + elo_cfg.k * (o - exp_home)
+        state.elo[a] = elo_a + elo_cfg.k * ((1.0 - o) - exp_away)
+
+        # Atualiza forma
+        state.push(h, pts_home[rows], gd_home[rows])
+        state.push(a, pts_away[rows], -gd_home[rows])
+
+        if with_post:
+            out["elo_home_post"][rows] = state.elo[h]
+            out["elo_away_post"][rows] = state.elo[a]
+            out["form_pts_home_3_post"][rows] = state.last_n_sum(state.pts_buf, h, 3)
+            out["form_pts_home_5_post"][rows] = state.last_n_sum(state.pts_buf, h, 5)
+            out["form_pts_away_3_post"][rows] = state.last_n_sum(state.pts_buf, a, 3)
+            out["form_pts_away_5_post"][rows] = state.last_n_sum(state.pts_buf, a, 5)
+            out["gd_home_5_post"][rows] = state.last_n_sum(state.gd_buf, h, 5)
+            out["gd_away_5_post"][rows] = state.last_n_sum(state.gd_buf, a, 5)
+
+    out["elo_diff"] = out["elo_home_pre"] - out["elo_away_pre"]
+    return out
+
+
+def compute_elo_form_features(
+    pool_keys,
+    homes,
+    aways,
+    target_1x2,
+    home_goals,
+    away_goals,
+    elo_cfg: EloConfig,
+    states: Optional[Dict[str, PoolState]] = None,
+    with_post: bool = False,
+) -> Tuple[Dict[str, np.ndarray], Dict[str, PoolState]]:
+    """
+    Features de Elo/forma para todos os jogos (ordenados por pool_key + data).
+    `states` permite continuar de um estado anterior; é atualizado in-place.
+    """
+    if states is None:
+        states = {}
+
+    pool_keys = np.asarray(pool_keys, dtype=object)
+    homes = np.asarray(homes, dtype=object)
+    aways = np.asarray(aways, dtype=object)
+    target_1x2 = np.asarray(target_1x2)
+    home_goals = np.asarray(home_goals)
+    away_goals = np.asarray(away_goals)
+
+    n = len(pool_keys)
+    cols = FEATURE_COLS + (POST_COLS if with_post else [])
+    out = {c: np.zeros(n, dtype=np.float64) for c in cols}
+
+    codes, uniques = _factorize(pool_keys)
+    for code, pk in enumerate(uniques):
+        rows = np.flatnonzero(codes == code)
+        st = states.setdefault(pk, PoolState(base_elo=elo_cfg.base_elo))
+        feats = compute_pool_features(
+            st, homes[rows], aways[rows],
+            target_1x2[rows], home_goals[rows], away_goals[rows],
+            elo_cfg,
+            with_post=with_post,
+        )
+        for c in cols:
+            out[c][rows] = feats[c]
+
+    return out, states
+
+
+def _factorize(values: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+    """Códigos por ordem de primeira aparição (mantém a ordem dos pools)."""
+    index: Dict[str, int] = {}
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, v in enumerate(values.tolist()):
+        codes[i] = index.setdefault(str(v), len(index))
+    return codes, list(index.keys())
+
+
+# =========================
+# Persistência do estado
+# =========================
+
+STATE_VERSION = 1
+
+
+def save_states(path: str, states: Dict[str, PoolState], meta: dict):
+    """
+    Salva o estado de todos os pools em 1 arquivo .npz (escrita atômica).
+    `meta` (dict JSON) guarda config/watermark do build.
+    """
+    arrays = {"meta": np.array(json.dumps({**meta, "version": STATE_VERSION}, ensure_ascii=False))}
+    for i, (pk, st) in enumerate(states.items()):
+        arrays[f"p{i}_key"] = np.array(pk)
+        arrays[f"p{i}_base_elo"] = np.array(st.base_elo, dtype=np.float64)
+        arrays[f"p{i}_teams"] = np.array(st.teams, dtype=str)
+        arrays[f"p{i}_elo"] = st.elo
+        arrays[f"p{i}_pts_buf"] = st.pts_buf
+        arrays[f"p{i}_gd_buf"] = st.gd_buf
+        arrays[f"p{i}_n_games"] = st.n_games
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_states(path: str) -> Tuple[Optional[Dict[str, PoolState]], dict]:
+    """Lê o .npz salvo por save_states. Retorna (None, {}) se ausente/incompatível."""
+    if not os.path.exists(path):
+        return None, {}
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            if meta.get("version") != STATE_VERSION:
+                return None, {}
+
+            states: Dict[str, PoolState] = {}
+            i = 0
+            while f"p{i}_key" in z:
+                teams = [str(t) for t in z[f"p{i}_teams"]]
+                states[str(z[f"p{i}_key"])] = PoolState(
+                    base_elo=float(z[f"p{i}_base_elo"]),
+                    teams=teams,
+                    index={t: j for j, t in enumerate(teams)},
+                    elo=z[f"p{i}_elo"].astype(np.float64),
+                    pts_buf=z[f"p{i}_pts_buf"].astype(np.int16),
+                    gd_buf=z[f"p{i}_gd_buf"].astype(np.int16),
+                    n_games=z[f"p{i}_n_games"].astype(np.int64),
+                )
+                i += 1
+        return states, meta
+    except Exception:
+        return None, {}
+
+
+# =========================
+# Snapshot p/ inferência (elo_ratings.json)
+# =========================
+
+SNAPSHOT_VERSION = 1
+
+
+def export_elo_snapshot(path: str, states: Dict[str, PoolState], meta: dict):
+    """
+    Exporta Elo final + forma atual por pool em JSON colunar (escrita atômica):
+    {"version", "elo_cfg", "watermarks",
+     "pools": {pool_key: {"teams": [...], "elo": [...], "form_pts_3": [...],
+                          "form_pts_5": [...], "gd_5": [...], "n_games": [...]}}}
+    """
+    pools = {}
+    for pk, st in states.items():
+        ids = np.arange(len(st.teams))
+        pools[pk] = {
+            "teams": list(st.teams),
+            "elo": st.elo.tolist(),
+            "form_pts_3": st.last_n_sum(st.pts_buf, ids, 3).tolist(),
+            "form_pts_5": st.last_n_sum(st.pts_buf, ids, 5).tolist(),
+            "gd_5": st.last_n_sum(st.gd_buf, ids, 5).tolist(),
+            "n_games": st.n_games.tolist(),
+        }
+
+    snapshot = {**meta, "version": SNAPSHOT_VERSION, "pools": pools}
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# =========================
+# Sweep de EloConfig (várias configs num único passe)
+# =========================
+
+LOGLOSS_EPS = 1e-15
+DRAW_PRIOR = 0.26     # taxa de empate inicial (antes de ver jogos do pool)
+DRAW_PRIOR_N = 20.0   # peso do prior (em jogos)
+
+
+def sweep_pool_logloss(
+    homes,
+    aways,
+    target_1x2: np.ndarray,
+    ks: np.ndarray,
+    home_advs: np.ndarray,
+    base_elos: np.ndarray,
+) -> Tuple[np.ndarray, int]:
+    """
+    Avalia C configs de Elo de uma vez num pool (jogos em ordem cronológica).
+    O estado é uma matriz (C, n_times): cada onda atualiza todas as configs.
+
+    Probabilidade 1X2 "só Elo" de cada jogo:
+      E     = elo_expected(elo_casa + home_adv, elo_fora)
+      taxa  = taxa de empate do pool até o jogo (prior DRAW_PRIOR)
+      p_d   = taxa * 4E(1-E)   (empate mais raro em jogo desequilibrado)
+      p_h   = E - p_d/2 ; p_a = 1 - E - p_d/2   (soma 1, E = p_h + p_d/2)
+
+    Retorna (soma do log loss por config [C], n jogos).
+    """
+    n = len(homes)
+    ks = np.asarray(ks, dtype=np.float64)[:, None]
+    home_advs = np.asarray(home_advs, dtype=np.float64)[:, None]
+    base_elos = np.asarray(base_elos, dtype=np.float64)
+    loss = np.zeros(len(base_elos), dtype=np.float64)
+    if n == 0:
+        return loss, 0
+
+    st = PoolState()
+    h_ids = st.team_ids(homes)
+    a_ids = st.team_ids(aways)
+    elo = np.repeat(base_elos[:, None], len(st.teams), axis=1)
+
+    target = np.asarray(target_1x2, dtype=np.int64)
+    outcome_home = np.where(target == 0, 1.0, np.where(target == 1, 0.5, 0.0))
+
+    # taxa de empate "até o jogo" (não depende da config)
+    draws_before = np.concatenate([[0.0], np.cumsum(target == 1)[:-1]])
+    p_draw = (draws_before + DRAW_PRIOR * DRAW_PRIOR_N) / (np.arange(n) + DRAW_PRIOR_N)
+
+    waves = wave_ids(h_ids, a_ids, len(st.teams))
+    order = np.argsort(waves, kind="stable")
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+
+    for rows in np.split(order, bounds):
+        h = h_ids[rows]
+        a = a_ids[rows]
+        elo_h = elo[:, h]
+        elo_a = elo[:, a]
+
+        # previsão (com vantagem de casa) -> log loss
+        e_pred = 1.0 / (1.0 + 10.0 ** ((elo_a - elo_h - home_advs) / 400.0))
+        pd_ = p_draw[rows][None, :] * 4.0 * e_pred * (1.0 - e_pred)
+        probs = np.stack([e_pred - pd_ / 2.0, pd_, 1.0 - e_pred - pd_ / 2.0])
+        p_true = np.take_along_axis(probs, target[rows][None, None, :], axis=0)[0]
+        loss -= np.log(np.clip(p_true, LOGLOSS_EPS, 1.0)).sum(axis=1)
+
+        # atualização (Elo "real", sem home_adv — igual ao compute_pool_features)
+        exp_home = 1.0 / (1.0 + 10.0 ** ((elo_a - elo_h) / 400.0))
+        o = outcome_home[rows][None, :]
+        elo[:, h] = elo_h + ks * (o - exp_home)
+        elo[:, a] = elo_a + ks * ((1.0 - o) - (1.0 - exp_home))
+
+    return loss, n
+
+
+def sweep_elo_configs(
+    pool_keys,
+    homes,
+    aways,
+    target_1x2,
+    configs: List[EloConfig],
+) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Log loss 1X2 (só Elo) de cada config em cada pool, num único passe.
+    Retorna (loss_sum [n_pools, C], pools, n_jogos [n_pools]).
+    """
+    pool_keys = np.asarray(pool_keys, dtype=object)
+    homes = np.asarray(homes, dtype=object)
+    aways = np.asarray(aways, dtype=object)
+    target_1x2 = np.asarray(target_1x2)
+
+    ks = np.array([c.k for c in configs], dtype=np.float64)
+    advs = np.array([c.home_adv for c in configs], dtype=np.float64)
+    bases = np.array([c.base_elo for c in configs], dtype=np.float64)
+
+    codes, uniques = _factorize(pool_keys)
+    loss = np.zeros((len(uniques), len(configs)), dtype=np.float64)
+    counts = np.zeros(len(uniques), dtype=np.int64)
+    for code in range(len(uniques)):
+        rows = np.flatnonzero(codes == code)
+        loss[code], counts[code] = sweep_pool_logloss(
+            homes[rows], aways[rows], target_1x2[rows], ks, advs, bases,
+        )
+    return loss, uniques, counts
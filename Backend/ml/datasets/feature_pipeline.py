@@ -0,0 +1,220 @@
+# Backend/ml/datasets/feature_pipeline.py
+# ------------------------------------------------------------
+# Pipeline único de features do modelo 1X2 (treino, eval e previsão)
+#
+# - add_model_features(): features derivadas das odds/Elo (flags, entropia,
+#   fav_prob, draw_edge...), vetorizadas e iguais p/ dataset e odds da Betano
+# - FeaturePipeline: ajustado no treino (layout fixo de colunas + mapa
+#   categoria -> índice da coluna one-hot) e salvo junto do modelo
+#   (xgb_1x2_pipeline.json). transform() escreve direto numa matriz float32
+#   pré-alocada, sem get_dummies/concat/reindex.
+#
+# Categoria não vista no treino -> todas as colunas one-hot daquele campo = 0
+# (mesmo comportamento do antigo reindex(fill_value=0)).
+# ------------------------------------------------------------
+
+import os
+import json
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+
+PIPELINE_VERSION = 1
+
+NUM_COLS = [
+    "elo_home_pre", "elo_away_pre", "elo_diff", "abs_elo_diff",
+    "form_pts_home_3", "form_pts_home_5",
+    "form_pts_away_3", "form_pts_away_5",
+    "gd_home_5", "gd_away_5",
+
+    "odds_h", "odds_d", "odds_a",
+
+    "imp_ph", "imp_pd", "imp_pa",
+    "imp_overround_1x2",
+    "imp_ph_minus_pa",
+    "abs_imp_ph_minus_pa",
+    "imp_entropy_1x2",
+
+    "fav_prob",
+    "draw_edge",
+    "balanced_flag",
+
+    "ou_p_over25", "ou_p_under25",
+    "ou_overround",
+    "ou_p_over_minus_under",
+
+    "has_odds_1x2",
+    "has_ou_25",
+]
+CAT_COLS = ["pool_key", "competition"]
+
+BALANCED_FAV_MAX = 0.45
+
+
+# =========================
+# Features derivadas
+# =========================
+
+def _num(df: pd.DataFrame, col: str) -> np.ndarray:
+    s = df[col]
+    if not pd.api.types.is_float_dtype(s):
+        s = pd.to_numeric(s, errors="coerce").astype(float)
+    return s.to_numpy()
+
+
+def entropy_1x2(ph: np.ndarray, pd_: np.ndarray, pa: np.ndarray) -> np.ndarray:
+    """Entropia (base e) das probs 1x2 normalizadas; NaN se faltar prob ou alguma for <= 0."""
+    ok = (ph > 0) & (pd_ > 0) & (pa > 0)  # NaN -> False
+    s = (ph + pd_ + pa).astype(np.float64)
+    out = np.full(len(s), np.nan)
+    if ok.any():
+        s = s[ok]
+        terms = [np.asarray(p[ok], dtype=np.float64) / s for p in (ph, pd_, pa)]
+        out[ok] = -(terms[0] * np.log(terms[0]) + terms[1] * np.log(terms[1]) + terms[2] * np.log(terms[2]))
+    return out
+
+
+def add_model_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Features derivadas do modelo (in-place). Precisa de elo_diff, imp_ph/pd/pa,
+    imp_ph_minus_pa e ou_p_over25/under25. Flags -> int8, resto -> float32.
+    """
+    ph, pd_, pa = _num(df, "imp_ph"), _num(df, "imp_pd"), _num(df, "imp_pa")
+    has_odds = ~np.isnan(ph) & ~np.isnan(pd_) & ~np.isnan(pa)
+    has_ou = ~np.isnan(_num(df, "ou_p_over25")) & ~np.isnan(_num(df, "ou_p_under25"))
+
+    fav = np.where(has_odds, np.maximum(ph, pa), np.nan).astype(np.float64)
+    draw_edge = np.where(has_odds, pd_ - fav, np.nan)
+    balanced = has_odds & (fav < BALANCED_FAV_MAX)
+
+    df["has_odds_1x2"] = has_odds.astype(np.int8)
+    df["has_ou_25"] = has_ou.astype(np.int8)
+    df["abs_elo_diff"] = np.abs(_num(df, "elo_diff")).astype(np.float32)
+    df["abs_imp_ph_minus_pa"] = np.abs(_num(df, "imp_ph_minus_pa")).astype(np.float32)
+    df["imp_entropy_1x2"] = entropy_1x2(ph, pd_, pa).astype(np.float32)
+    df["fav_prob"] = fav.astype(np.float32)
+    df["draw_edge"] = draw_edge.astype(np.float32)
+    df["balanced_flag"] = balanced.astype(np.int8)
+    return df
+
+
+# =========================
+# Transform (num + one-hot) ajustado no treino
+# =========================
+
+class FeaturePipeline:
+    """
+    Uso:
+        pipe = FeaturePipeline.fit(df)          # treino
+        X = pipe.transform(df)                  # np.float32 (n, len(pipe.columns))
+        pipe.save(path); FeaturePipeline.load(path)
+    """
+
+    def __init__(self, num_cols: List[str], cat_levels: Dict[str, List[str]], columns: List[str]):
+        self.num_cols = list(num_cols)
+        self.cat_levels = {c: list(v) for c, v in cat_levels.items()}
+        self.columns = list(columns)
+
+        col_idx = {c: i for i, c in enumerate(self.columns)}
+        self._num_idx = np.array([col_idx[c] for c in self.num_cols], dtype=np.int64)
+        # categoria -> índice da coluna one-hot (via Index.get_indexer, sem dict por linha)
+        self._cat_index = {c: pd.Index(levels) for c, levels in self.cat_levels.items()}
+        self._cat_cols_idx = {
+            c: np.array([col_idx[f"{c}_{v}"] for v in levels], dtype=np.int64)
+            for c, levels in self.cat_levels.items()
+        }
+
+    @property
+    def n_features(self) -> int:
+        return len(self.columns)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, num_cols: List[str] = NUM_COLS, cat_cols: List[str] = CAT_COLS) -> "FeaturePipeline":
+        """Níveis de cada categórica vistos em `df`; layout = nomes ordenados (igual ao get_dummies + sorted)."""
+        cat_levels = {c: sorted(pd.unique(df[c].astype(str))) for c in cat_cols}
+        columns = sorted(list(num_cols) + [f"{c}_{v}" for c in cat_cols for v in cat_levels[c]])
+        return cls(num_cols, cat_levels, columns)
+
+    @classmethod
+    def from_columns(cls, columns: List[str], num_cols: List[str] = NUM_COLS, cat_cols: List[str] = CAT_COLS) -> "FeaturePipeline":
+        """Reconstrói o pipeline a partir da lista de colunas de um modelo antigo (xgb_1x2_columns.pkl)."""
+        num_set = set(num_cols)
+        cat_levels = {c: [] for c in cat_cols}
+        for name in columns:
+            if name in num_set:
+                continue
+            owner = next((c for c in cat_cols if name.startswith(c + "_")), None)
+            if owner is None:
+                raise ValueError(f"Coluna desconhecida no layout do modelo: {name}")
+            cat_levels[owner].append(name[len(owner) + 1:])
+        return cls([c for c in num_cols if c in set(columns)], cat_levels, columns)
+
+    def column_groups(self) -> List[str]:
+        """Feature "humana" de cada coluna: numérica -> ela mesma; one-hot -> a categórica (pool_key, competition...)."""
+        owner = {f"{c}_{v}": c for c, levels in self.cat_levels.items() for v in levels}
+        return [owner.get(col, col) for col in self.columns]
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        n = len(df)
+        X = np.zeros((n, self.n_features), dtype=np.float32)
+
+        missing = [c for c in self.num_cols if c not in df.columns]
+        if missing:
+            raise KeyError(f"Colunas numéricas ausentes p/ o modelo: {missing}")
+        for j, c in zip(self._num_idx, self.num_cols):
+            X[:, j] = df[c].to_numpy(dtype=np.float32, na_value=np.nan)
+
+        rows = np.arange(n)
+        for c, index in self._cat_index.items():
+            if c not in df.columns or not len(index):
+                continue
+            pos = index.get_indexer(df[c].astype(str))
+            ok = pos >= 0
+            X[rows[ok], self._cat_cols_idx[c][pos[ok]]] = 1.0
+        return X
+
+    # -------------------------
+    # Persistência (JSON ao lado do modelo)
+    # -------------------------
+    def to_dict(self) -> dict:
+        return {
+            "version": PIPELINE_VERSION,
+            "num_cols": self.num_cols,
+            "cat_levels": self.cat_levels,
+            "columns": self.columns,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "FeaturePipeline":
+        if d.get("version") != PIPELINE_VERSION:
+            raise ValueError(f"Versão do pipeline de features não suportada: {d.get('version')}")
+        return cls(d["num_cols"], d["cat_levels"], d["columns"])
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FeaturePipeline":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def pipeline_path_for(model_path: str) -> str:
+    """Pipeline fica ao lado do modelo: xgb_1x2.json -> xgb_1x2_pipeline.json"""
+    return os.path.splitext(model_path)[0] + "_pipeline.json"
+
+
+def load_model_pipeline(model_path: str, cols_path: Optional[str] = None) -> FeaturePipeline:
+    """Pipeline salvo com o modelo; modelos antigos (só columns.pkl) são reconstruídos pelas colunas."""
+    path = pipeline_path_for(model_path)
+    if os.path.exists(path):
+        return FeaturePipeline.load(path)
+    if cols_path and os.path.exists(cols_path):
+        return FeaturePipeline.from_columns(joblib.load(cols_path))
+    raise FileNotFoundError(f"Pipeline de features não encontrado: {path}")
@@ -0,0 +1,207 @@
+# Backend/ml/datasets/feature_store.py
+# ------------------------------------------------------------
+# Feature store point-in-time por (pool_key, time)
+#
+# Guarda, para cada time de cada pool, a linha do tempo ordenada do
+# estado APÓS cada jogo (Elo + forma rolling). Consulta "as-of":
+#   estado do time X no pool P considerando só jogos ANTES do dia T
+# via busca binária (np.searchsorted), em lote para milhares de pares.
+#
+# Gerado pelo build_dataset.py em: Backend/ml/datasets/team_feature_store.npz
+# Usado por: prediction/predict_from_betano_odds.py (e backtests)
+# ------------------------------------------------------------
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+STORE_VERSION = 1
+STORE_COLS = ["elo", "form_pts_3", "form_pts_5", "gd_5"]
+
+_DAY_OFFSET = 1 << 31  # dias desde 1970 podem ser negativos; chave composta precisa >= 0
+
+
+def to_days(when) -> np.ndarray:
+    """Datas/timestamps (str, datetime, com ou sem fuso) -> dias desde 1970 (int64, UTC)."""
+    ts = pd.to_datetime(pd.Series(np.asarray(when, dtype=object)), utc=True, errors="coerce", format="mixed")
+    days = ts.dt.tz_localize(None).dt.floor("D").values.astype("datetime64[D]").astype(np.int64)
+    days[ts.isna().values] = np.iinfo(np.int64).max // 4  # sem data -> "fim dos tempos" (estado mais recente)
+    return days
+
+
+def events_from_enriched(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Linhas do dataset (com POST_COLS do feature_engine) -> eventos por time:
+    1 evento p/ o mandante + 1 p/ o visitante, na ordem dos jogos.
+    """
+    n = len(df)
+    seq = np.arange(n, dtype=np.int64) * 2
+    home = pd.DataFrame({
+        "pool_key": df["pool_key"].astype(str).values,
+        "team": df["home"].astype(str).values,
+        "date": df["date"].values,
+        "seq": seq,
+        "elo": df["elo_home_post"].values,
+        "form_pts_3": df["form_pts_home_3_post"].values,
+        "form_pts_5": df["form_pts_home_5_post"].values,
+        "gd_5": df["gd_home_5_post"].values,
+    })
+    away = pd.DataFrame({
+        "pool_key": df["pool_key"].astype(str).values,
+        "team": df["away"].astype(str).values,
+        "date": df["date"].values,
+        "seq": seq + 1,
+        "elo": df["elo_away_post"].values,
+        "form_pts_3": df["form_pts_away_3_post"].values,
+        "form_pts_5": df["form_pts_away_5_post"].values,
+        "gd_5": df["gd_away_5_post"].values,
+    })
+    return pd.concat([home, away], ignore_index=True)
+
+
+@dataclass
+class TeamFeatureStore:
+    """
+    Linhas do tempo em formato CSR:
+    - pools/teams[k]: chave k = (pool_key, time)
+    - offsets[k]:offsets[k+1]: eventos da chave k, ordenados por dia
+    - days[i], values[i, :]: dia do jogo e estado (STORE_COLS) após o jogo
+    """
+    pools: np.ndarray
+    teams: np.ndarray
+    offsets: np.ndarray
+    days: np.ndarray
+    values: np.ndarray
+    base_elo: float = 1500.0
+
+    def __post_init__(self):
+        self._key_index = {(p, t): k for k, (p, t) in enumerate(zip(self.pools.tolist(), self.teams.tolist()))}
+        key_of_event = np.repeat(np.arange(len(self.pools), dtype=np.int64), np.diff(self.offsets))
+        self._composite = (key_of_event << 32) | (self.days + _DAY_OFFSET)
+
+    # -------------------------
+    # Build / append
+    # -------------------------
+    @classmethod
+    def from_events(cls, events: pd.DataFrame, base_elo: float = 1500.0) -> "TeamFeatureStore":
+        key = events["pool_key"].astype(str) + "\x1f" + events["team"].astype(str)
+        codes, uniques = pd.factorize(key, sort=True)
+        days = to_days(events["date"].values)
+        order = np.lexsort((events["seq"].values, days, codes))
+
+        pools, teams = zip(*(u.split("\x1f", 1) for u in uniques)) if len(uniques) else ((), ())
+        counts = np.bincount(codes, minlength=len(uniques))
+        return cls(
+            pools=np.array(pools, dtype=str),
+            teams=np.array(teams, dtype=str),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            days=days[order],
+            values=events[STORE_COLS].values[order].astype(np.float64),
+            base_elo=float(base_elo),
+        )
+
+    def to_events(self) -> pd.DataFrame:
+        counts = np.diff(self.offsets)
+        return pd.DataFrame({
+            "pool_key": np.repeat(self.pools, counts),
+            "team": np.repeat(self.teams, counts),
+            "date": self.days.astype("datetime64[D]"),
+            "seq": np.arange(len(self.days), dtype=np.int64),
+            **{c: self.values[:, j] for j, c in enumerate(STORE_COLS)},
+        })
+
+    def append(self, events: pd.DataFrame) -> "TeamFeatureStore":
+        """Novo store com eventos adicionais (sempre posteriores aos já guardados)."""
+        if events.empty:
+            return self
+        old = self.to_events()
+        new = events.copy()
+        new["seq"] = new["seq"].values + len(old)
+        return TeamFeatureStore.from_events(pd.concat([old, new], ignore_index=True), base_elo=self.base_elo)
+
+    # -------------------------
+    # Consulta as-of (lote)
+    # -------------------------
+    def asof(self, pools, teams, when) -> Dict[str, np.ndarray]:
+        """
+        Estado de cada (pool, time) considerando só jogos de dias ANTERIORES a `when`.
+        Sem histórico -> Elo base e forma 0. Retorna {col: array} + "n_hist" (0/1).
+        """
+        pools = [str(p) for p in pools]
+        teams = [str(t) for t in teams]
+        kid = np.fromiter((self._key_index.get((p, t), -1) for p, t in zip(pools, teams)),
+                          dtype=np.int64, count=len(pools))
+        qday = to_days(when)
+
+        comp = (np.maximum(kid, 0) << 32) | (qday.clip(max=(1 << 31) - 1) + _DAY_OFFSET)
+        idx = np.searchsorted(self._composite, comp, side="left") - 1
+
+        found = kid >= 0
+        found[found] &= idx[found] >= self.offsets[kid[found]]
+
+        out = {c: np.zeros(len(kid), dtype=np.float64) for c in STORE_COLS}
+        out["elo"][:] = self.base_elo
+        for j, c in enumerate(STORE_COLS):
+            out[c][found] = self.values[idx[found], j]
+        out["n_hist"] = found.astype(np.int8)
+        return out
+
+    # -------------------------
+    # Persistência
+    # -------------------------
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                version=np.array(STORE_VERSION),
+                pools=self.pools, teams=self.teams, offsets=self.offsets,
+                days=self.days, values=self.values,
+                base_elo=np.array(self.base_elo),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["TeamFeatureStore"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if int(z["version"]) != STORE_VERSION:
+                    return None
+                return cls(
+                    pools=z["pools"], teams=z["teams"], offsets=z["offsets"],
+                    days=z["days"], values=z["values"], base_elo=float(z["base_elo"]),
+                )
+        except Exception:
+            return None
+
+
+def store_path_for(out_csv: str) -> str:
+    """Store fica ao lado do CSV: team_feature_store.npz"""
+    return os.path.join(os.path.dirname(out_csv), "team_feature_store.npz")
+
+
+def team_features_asof(store: TeamFeatureStore, pools: List[str], homes: List[str], aways: List[str], when) -> pd.DataFrame:
+    """
+    Atalho p/ jogos: features de forma/Elo pré-jogo (mandante + visitante) as-of `when`.
+    Elo sai "real" (sem home_adv) — some a vantagem de casa no chamador.
+    """
+    h = store.asof(pools, homes, when)
+    a = store.asof(pools, aways, when)
+    return pd.DataFrame({
+        "elo_home_real": h["elo"],
+        "elo_away_real": a["elo"],
+        "form_pts_home_3": h["form_pts_3"],
+        "form_pts_home_5": h["form_pts_5"],
+        "form_pts_away_3": a["form_pts_3"],
+        "form_pts_away_5": a["form_pts_5"],
+        "gd_home_5": h["gd_5"],
+        "gd_away_5": a["gd_5"],
+        "home_has_hist": h["n_hist"],
+        "away_has_hist": a["n_hist"],
+    })
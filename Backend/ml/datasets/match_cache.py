@@ -0,0 +1,132 @@
+# Backend/ml/datasets/match_cache.py
+# ------------------------------------------------------------
+# Cache colunar (Feather) dos CSVs de Backend/data/matches
+#
+# - Chave: caminho + leitor (tag) ; validade: tamanho + mtime + hash do conteúdo
+# - Arquivo inalterado -> devolve o DataFrame do cache (sem pd.read_csv)
+# - mtime mudou mas conteúdo igual (updater reescreveu) -> continua no cache
+# - Sem pyarrow instalado o cache fica desligado (lê o CSV normalmente)
+#
+# Cache em: Backend/ml/datasets/.cache/matches/
+# ------------------------------------------------------------
+
+import os
+import json
+import hashlib
+import importlib.util
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(THIS_DIR, ".cache", "matches")
+
+INDEX_VERSION = 1
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class MatchCsvCache:
+    """
+    Uso:
+        cache = MatchCsvCache()
+        df = cache.read(fp)                                  # pd.read_csv
+        df = cache.read(fp, reader=read_csv_robust, tag="robust")
+        cache.save()                                         # grava o índice
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled and HAS_ARROW
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.index: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f) or {}
+        except Exception:
+            return
+        if data.get("version") == INDEX_VERSION:
+            self.index = data.get("entries") or {}
+
+    def _entry_key(self, path: str, tag: str) -> str:
+        return f"{tag}::{os.path.abspath(path)}"
+
+    def _frame_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".feather")
+
+    def read(
+        self,
+        path: str,
+        reader: Callable[[str], Optional[pd.DataFrame]] = pd.read_csv,
+        tag: str = "read_csv",
+    ) -> Optional[pd.DataFrame]:
+        """Lê `path` via cache; em miss chama reader(path) e guarda o resultado."""
+        if not self.enabled:
+            return reader(path)
+
+        key = self._entry_key(path, tag)
+        st = os.stat(path)
+        entry = self.index.get(key)
+        frame_path = self._frame_path(key)
+
+        if entry is not None and os.path.exists(frame_path):
+            same_stat = entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+            if same_stat or (entry.get("size") == st.st_size and entry.get("sha1") == file_digest(path)):
+                df = self._read_frame(frame_path)
+                if df is not None:
+                    if not same_stat:
+                        entry["mtime_ns"] = st.st_mtime_ns
+                        self._dirty = True
+                    self.hits += 1
+                    return df
+
+        self.misses += 1
+        df = reader(path)
+        if df is None:
+            return None
+
+        try:
+            df.reset_index(drop=True).to_feather(frame_path + ".tmp")
+            os.replace(frame_path + ".tmp", frame_path)
+        except Exception:
+            # colunas com tipos mistos que o Arrow não aceita: só não cacheia
+            self.index.pop(key, None)
+            return df
+
+        self.index[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": file_digest(path)}
+        self._dirty = True
+        return df
+
+    def _read_frame(self, frame_path: str) -> Optional[pd.DataFrame]:
+        try:
+            return pd.read_feather(frame_path)
+        except Exception:
+            return None
+
+    def save(self):
+        """Grava o índice (atômico). Chame 1x no fim da leitura."""
+        if not self.enabled or not self._dirty:
+            return
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "entries": self.index}, f, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+        self._dirty = False
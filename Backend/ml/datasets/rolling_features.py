@@ -0,0 +1,131 @@
+# Backend/ml/datasets/rolling_features.py
+# ------------------------------------------------------------
+# Features rolling de estatísticas de jogo (chutes, escanteios, cartões...)
+#
+# Declarativo: cada StatSpec diz de quais colunas (mandante/visitante)
+# sai a estatística; o engine gera, para cada janela, a média dos
+# últimos N jogos do time no pool ("for" = do time, "against" = sofrido).
+#
+# Como funciona (sem loop por linha):
+# - formato longo centrado no time: 1 linha por (jogo, lado)
+# - ordena por (pool_key, time) mantendo a ordem cronológica do hist
+# - somas acumuladas por grupo -> janela = cs[i] - cs[max(início, i-N)]
+#   (cs exclusivo = só jogos ANTERIORES -> shift de 1 jogo, sem leak)
+# - NaN (liga sem a estatística) não conta na média; sem jogos -> NaN
+#
+# Colunas geradas: {home|away}_{stat}_{for|against}_avg{N}
+# ------------------------------------------------------------
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class StatSpec:
+    name: str
+    home_col: str
+    away_col: str
+
+
+ROLLING_STATS: List[StatSpec] = [
+    StatSpec("ht_goals", "HalfTimeHomeGoals", "HalfTimeAwayGoals"),
+    StatSpec("shots", "HomeShots", "AwayShots"),
+    StatSpec("shots_ot", "HomeShotsOnTarget", "AwayShotsOnTarget"),
+    StatSpec("corners", "HomeCorners", "AwayCorners"),
+    StatSpec("fouls", "HomeFouls", "AwayFouls"),
+    StatSpec("yellow", "HomeYellowCards", "AwayYellowCards"),
+    StatSpec("red", "HomeRedCards", "AwayRedCards"),
+]
+
+ROLLING_WINDOWS: Tuple[int, ...] = (5, 10)
+
+ROUND_DECIMALS = 4  # médias de contagens: 4 casas bastam e deixam o CSV bem menor
+
+
+def stat_source_cols(stats: List[StatSpec] = ROLLING_STATS) -> List[str]:
+    """Colunas brutas (CSV de jogos) usadas pelas specs."""
+    cols = []
+    for s in stats:
+        cols += [s.home_col, s.away_col]
+    return cols
+
+
+def rolling_feature_cols(
+    stats: List[StatSpec] = ROLLING_STATS,
+    windows: Tuple[int, ...] = ROLLING_WINDOWS,
+) -> List[str]:
+    return [
+        f"{side}_{s.name}_{kind}_avg{w}"
+        for s in stats
+        for w in windows
+        for side in ("home", "away")
+        for kind in ("for", "against")
+    ]
+
+
+def _group_window_sum(cs: np.ndarray, starts: np.ndarray, w: int) -> np.ndarray:
+    """
+    cs: soma acumulada exclusiva (len n+1) no formato longo ordenado.
+    Retorna, p/ cada linha i, a soma das linhas [max(start_i, i-w), i) do mesmo grupo.
+    """
+    i = np.arange(len(starts))
+    lo = np.maximum(starts, i - w)
+    return cs[i] - cs[lo]
+
+
+def rolling_feature_frame(
+    hist: pd.DataFrame,
+    stats: List[StatSpec] = ROLLING_STATS,
+    windows: Tuple[int, ...] = ROLLING_WINDOWS,
+    pool_col: str = "pool_key",
+    home_col: str = "Home",
+    away_col: str = "Away",
+) -> pd.DataFrame:
+    """
+    Features rolling pré-jogo p/ cada linha de `hist` (já em ordem cronológica
+    dentro de cada pool). Retorna DataFrame alinhado ao hist (mesmo índice).
+    """
+    n = len(hist)
+    cols = rolling_feature_cols(stats, windows)
+    if n == 0:
+        return pd.DataFrame({c: np.zeros(0) for c in cols}, index=hist.index)
+
+    # formato longo: linhas [0, n) = lado mandante, [n, 2n) = lado visitante
+    pools = hist[pool_col].astype(str).values
+    teams = np.concatenate([hist[home_col].astype(str).values, hist[away_col].astype(str).values])
+    key = pd.Series(np.concatenate([pools, pools])) + "\x1f" + teams
+    codes, _ = pd.factorize(key)
+    seq = np.concatenate([np.arange(n), np.arange(n)])  # ordem cronológica do hist
+
+    order = np.lexsort((seq, codes))
+    g = codes[order]
+    new_group = np.r_[True, g[1:] != g[:-1]]
+    starts = np.maximum.accumulate(np.where(new_group, np.arange(2 * n), 0))
+
+    inv = np.empty(2 * n, dtype=np.int64)
+    inv[order] = np.arange(2 * n)
+    pos_home, pos_away = inv[:n], inv[n:]
+
+    out = {}
+    for s in stats:
+        h = pd.to_numeric(hist[s.home_col], errors="coerce").values.astype(np.float64) if s.home_col in hist else np.full(n, np.nan)
+        a = pd.to_numeric(hist[s.away_col], errors="coerce").values.astype(np.float64) if s.away_col in hist else np.full(n, np.nan)
+
+        for kind, vals in (("for", np.concatenate([h, a])), ("against", np.concatenate([a, h]))):
+            v = vals[order]
+            ok = ~np.isnan(v)
+            cs_sum = np.r_[0.0, np.cumsum(np.where(ok, v, 0.0))]
+            cs_cnt = np.r_[0, np.cumsum(ok)]
+
+            for w in windows:
+                tot = _group_window_sum(cs_sum, starts, w)
+                cnt = _group_window_sum(cs_cnt, starts, w)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    avg = np.where(cnt > 0, np.round(tot / np.maximum(cnt, 1), ROUND_DECIMALS), np.nan)
+                out[f"home_{s.name}_{kind}_avg{w}"] = avg[pos_home]
+                out[f"away_{s.name}_{kind}_avg{w}"] = avg[pos_away]
+
+    return pd.DataFrame({c: out[c] for c in cols}, index=hist.index)
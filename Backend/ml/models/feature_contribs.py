@@ -0,0 +1,197 @@
+# Backend/ml/models/feature_contribs.py
+# ------------------------------------------------------------
+# Contribuição de cada feature na previsão ("por que o modelo deu HOME?")
+#
+# - 1 chamada em lote: booster.predict(..., pred_contribs=True) p/ todos os
+#   jogos ainda não explicados -> (n, 3 classes, colunas + bias), na
+#   escala da margem (log-odds antes do softmax); soma = margem da classe
+# - Colunas one-hot voltam p/ a feature "humana" (pool_key_X, competition_Y
+#   -> pool_key, competition) com 1 matmul (colunas x features)
+# - Cache por (versão do modelo, hash do vetor de features): o mesmo jogo
+#   visto de novo não chama o booster. Em memória por processo + npz em
+#   Backend/ml/prediction/.cache/contribs/<versão>.npz
+#   (versões do registro são imutáveis; modelo "legacy" não vai p/ disco)
+# ------------------------------------------------------------
+
+import os
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from model_registry import LEGACY_VERSION, LoadedModel
+
+
+ML_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_CACHE_DIR = os.path.join(ML_DIR, "prediction", ".cache", "contribs")
+
+CLASS_LABELS = ("HOME", "DRAW", "AWAY")
+BIAS = "bias"
+MAX_CACHE_ROWS = 50_000  # por versão; acima disso guarda só os mais recentes
+
+
+def human_features(pipeline) -> List[str]:
+    """Features "humanas" na ordem do layout (one-hot agrupado) + bias no fim."""
+    return list(dict.fromkeys(pipeline.column_groups())) + [BIAS]
+
+
+def group_matrix(pipeline, features: List[str]) -> np.ndarray:
+    """(colunas + bias, features + bias): 1 onde a coluna pertence à feature."""
+    pos = {f: i for i, f in enumerate(features)}
+    owners = pipeline.column_groups() + [BIAS]
+    M = np.zeros((len(owners), len(features)), dtype=np.float32)
+    M[np.arange(len(owners)), [pos[o] for o in owners]] = 1.0
+    return M
+
+
+def row_keys(X: np.ndarray) -> np.ndarray:
+    """Hash de cada vetor de features (bytes do float32; NaN estável)."""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    return np.array([hashlib.blake2b(r.tobytes(), digest_size=16).hexdigest() for r in X], dtype=object)
+
+
+class ContribCache:
+    """
+    Uso:
+        cache = ContribCache.for_model(model)     # 1 por versão (memoizado)
+        hit, vals = cache.get(keys)               # hit: bool[n]; vals[hit] preenchido
+        cache.put(keys_novas, vals_novos); cache.save()
+    """
+
+    def __init__(self, version: str, features: List[str], cache_dir: Optional[str] = DEFAULT_CACHE_DIR):
+        self.version = version
+        self.features = list(features)
+        self.path = os.path.join(cache_dir, f"{version}.npz") if cache_dir else None
+        self._rows: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        self._load()
+
+    @classmethod
+    def for_model(cls, model: LoadedModel, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> "ContribCache":
+        persist = cache_dir if model.version != LEGACY_VERSION else None
+        key = (model.version, persist)
+        with _CACHE_LOCK:
+            cache = _CACHES.get(key)
+            if cache is None:
+                cache = _CACHES[key] = cls(model.version, human_features(model.pipeline), persist)
+        return cache
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as z:
+                if list(z["features"]) != self.features:
+                    return  # layout diferente: ignora o arquivo
+                self._rows = dict(zip(z["keys"].tolist(), z["values"]))
+        except Exception:
+            self._rows = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        hit = np.array([k in self._rows for k in keys], dtype=bool)
+        vals = np.zeros((len(keys), len(CLASS_LABELS), len(self.features)), dtype=np.float32)
+        for i in np.flatnonzero(hit):
+            vals[i] = self._rows[keys[i]]
+        return hit, vals
+
+    def put(self, keys: np.ndarray, values: np.ndarray):
+        for k, v in zip(keys, values):
+            self._rows.pop(k, None)  # reinsere no fim (mais recente)
+            self._rows[k] = v
+        if len(self._rows) > MAX_CACHE_ROWS:
+            for k in list(self._rows)[: len(self._rows) - MAX_CACHE_ROWS]:
+                del self._rows[k]
+        self._dirty = self._dirty or len(keys) > 0
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp.npz"
+        keys = list(self._rows)
+        np.savez(
+            tmp,
+            features=np.array(self.features),
+            keys=np.array(keys, dtype=str),
+            values=np.stack([self._rows[k] for k in keys]).astype(np.float32),
+        )
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+_CACHES: Dict[Tuple[str, Optional[str]], ContribCache] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def feature_contributions(
+    model: LoadedModel,
+    X: np.ndarray,
+    cache: Optional[ContribCache] = None,
+) -> Tuple[List[str], np.ndarray]:
+    """
+    (features, contribs[n, 3, features]) do X já transformado pelo pipeline do modelo.
+    Só vetores fora do cache (e sem repetição no lote) vão p/ o pred_contribs.
+    """
+    features = human_features(model.pipeline)
+    if len(X) == 0:
+        return features, np.zeros((0, len(CLASS_LABELS), len(features)), dtype=np.float32)
+
+    keys = row_keys(X)
+    if cache is not None:
+        hit, out = cache.get(keys)
+    else:
+        hit = np.zeros(len(keys), dtype=bool)
+        out = np.zeros((len(keys), len(CLASS_LABELS), len(features)), dtype=np.float32)
+
+    miss = np.flatnonzero(~hit)
+    if len(miss):
+        uniq, first, inverse = np.unique(keys[miss], return_index=True, return_inverse=True)
+        raw = model.booster.predict(xgb.DMatrix(X[miss[first]]), pred_contribs=True)  # (u, 3, colunas + 1)
+        grouped = (raw @ group_matrix(model.pipeline, features)).astype(np.float32)
+        out[miss] = grouped[inverse]
+        if cache is not None:
+            cache.put(uniq, grouped)
+    return features, out
+
+
+def contributions_frame(
+    ids: pd.DataFrame,
+    features: List[str],
+    contribs: np.ndarray,
+    pick: np.ndarray,
+    top_k: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Formato longo: 1 linha por (jogo, feature), com a contribuição p/ cada
+    classe; por jogo, bias (rank 0) e depois as features por |contribuição na
+    classe escolhida| (rank 1 = a que mais pesou).
+    """
+    n, _, g = contribs.shape
+    picked = contribs[np.arange(n), pick]                    # (n, features)
+    bias = features.index(BIAS)
+    strength = np.abs(picked)
+    strength[:, bias] = -1.0                                  # bias fora do ranking (rank 0)
+    order = np.argsort(-strength, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(1, g + 1), axis=1)
+    rank[:, bias] = 0
+
+    game = np.repeat(np.arange(n), g)
+    out = ids.reset_index(drop=True).iloc[game].reset_index(drop=True)
+    out["pick"] = np.asarray(CLASS_LABELS)[pick][game]
+    out["feature"] = np.tile(features, n)
+    out["rank"] = rank.ravel()
+    for k, label in enumerate(CLASS_LABELS):
+        out[f"contrib_{label.lower()}"] = contribs[:, k, :].ravel()
+    out["contrib_pick"] = picked.ravel()
+
+    keep = np.lexsort((out["rank"].values, game))  # jogos na ordem de entrada, bias primeiro
+    if top_k is not None:
+        keep = keep[out["rank"].values[keep] <= top_k]
+    return out.iloc[keep].reset_index(drop=True)
@@ -0,0 +1,272 @@
+# Backend/ml/models/model_registry.py
+# ------------------------------------------------------------
+# Registro versionado de modelos (em vez de sobrescrever xgb_1x2.json)
+#
+# Layout:
+#   Backend/ml/models/registry/<nome>/versions/<versão>/model.json
+#                                                   /schema.json  (pipeline de features: colunas + categorias)
+#                                                   /meta.json    (métricas, split, params; só caminhos relativos)
+#                                                   /trees.npz    (árvores em arrays p/ o avaliador NumPy)
+#                                                   /predictions.parquet (previsões fora da amostra; oos_predictions.py)
+#   Backend/ml/models/registry/<nome>/champion.json  (ponteiro p/ a versão em produção + histórico)
+#
+# - Versão = hash do conteúdo (modelo + schema): retreino idêntico -> mesma versão
+# - Versão é gravada num diretório tmp e renomeada (nunca fica pela metade);
+#   promoção troca o champion.json com os.replace (leitor nunca vê arquivo truncado)
+# - load_model(): versão fixada (argumento / env BISS_MODEL_VERSION) ou champion;
+#   booster + pipeline ficam em memória por processo (versões são imutáveis)
+# - LoadedModel.predict_proba(): lote pequeno (<= FAST_PATH_MAX_ROWS) vai
+#   pelo avaliador NumPy (models/tree_evaluator.py), sem custo fixo do DMatrix
+# - Sem registro (modelo antigo): cai p/ xgb_1x2.json + xgb_1x2_columns.pkl
+# ------------------------------------------------------------
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import xgboost as xgb
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/models
+DATASETS_DIR = os.path.abspath(os.path.join(MODELS_DIR, "..", "datasets"))
+if DATASETS_DIR not in sys.path:
+    sys.path.insert(0, DATASETS_DIR)
+
+from feature_pipeline import FeaturePipeline, load_model_pipeline  # noqa: E402
+from tree_evaluator import TreeEnsemble  # noqa: E402
+
+
+DEFAULT_REGISTRY_DIR = os.path.join(MODELS_DIR, "registry")
+DEFAULT_MODEL_NAME = "xgb_1x2"
+VERSION_ENV = "BISS_MODEL_VERSION"
+
+LEGACY_MODEL_PATH = os.path.join(MODELS_DIR, "xgb_1x2.json")
+LEGACY_COLS_PATH = os.path.join(MODELS_DIR, "xgb_1x2_columns.pkl")
+LEGACY_META_PATH = os.path.join(MODELS_DIR, "xgb_1x2_meta.json")
+LEGACY_VERSION = "legacy"
+
+MODEL_FILE = "model.json"
+SCHEMA_FILE = "schema.json"
+META_FILE = "meta.json"
+TREES_FILE = "trees.npz"
+PREDICTIONS_FILE = "predictions.parquet"
+
+# até aqui o avaliador NumPy ganha do booster.predict + DMatrix (ver tree_evaluator.py)
+FAST_PATH_MAX_ROWS = 8
+
+
+def _write_json_atomic(path: str, obj) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@dataclass
+class LoadedModel:
+    version: str
+    booster: xgb.Booster
+    pipeline: FeaturePipeline
+    meta: dict
+    trees_path: Optional[str] = None
+    predictions_path: Optional[str] = None
+    _trees: Optional[TreeEnsemble] = field(default=None, repr=False)
+
+    def trees(self) -> TreeEnsemble:
+        """Árvores em arrays (trees.npz da versão; sem ele, exportadas do booster)."""
+        if self._trees is None:
+            if self.trees_path and os.path.exists(self.trees_path):
+                self._trees = TreeEnsemble.load(self.trees_path)
+            else:
+                self._trees = TreeEnsemble.from_booster(self.booster)
+        return self._trees
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probs (n, 3) do X já transformado pelo pipeline."""
+        if len(X) <= FAST_PATH_MAX_ROWS:
+            return self.trees().predict_proba(X)
+        return self.booster.predict(xgb.DMatrix(X))
+
+
+class ModelRegistry:
+    """
+    Uso:
+        reg = ModelRegistry()
+        v = reg.register(booster, pipeline, meta)   # grava a versão (idempotente)
+        reg.promote(v)                              # vira o champion
+        m = reg.load()                              # champion (ou reg.load(v) p/ fixar)
+    """
+
+    def __init__(self, name: str = DEFAULT_MODEL_NAME, root: str = DEFAULT_REGISTRY_DIR):
+        self.name = name
+        self.root = os.path.join(root, name)
+        self.versions_dir = os.path.join(self.root, "versions")
+        self.champion_path = os.path.join(self.root, "champion.json")
+
+    # -------------------------
+    # Escrita
+    # -------------------------
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.versions_dir, version)
+
+    def register(self, booster: xgb.Booster, pipeline: FeaturePipeline, meta: dict) -> str:
+        model_raw = bytes(booster.save_raw(raw_format="json"))
+        schema = pipeline.to_dict()
+        schema_raw = json.dumps(schema, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+        h = hashlib.sha1()
+        h.update(model_raw)
+        h.update(schema_raw)
+        version = h.hexdigest()[:16]
+
+        d = self.version_dir(version)
+        if os.path.exists(os.path.join(d, META_FILE)):
+            return version  # mesmo conteúdo já registrado
+
+        tmp = d + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp, exist_ok=True)
+        with open(os.path.join(tmp, MODEL_FILE), "wb") as f:
+            f.write(model_raw)
+        _write_json_atomic(os.path.join(tmp, SCHEMA_FILE), schema)
+        TreeEnsemble.from_booster(booster).save(os.path.join(tmp, TREES_FILE))
+        _write_json_atomic(os.path.join(tmp, META_FILE), {
+            **meta,
+            "name": self.name,
+            "version": version,
+            "registered_at": datetime.now().isoformat(timespec="seconds"),
+            "files": {"model": MODEL_FILE, "schema": SCHEMA_FILE, "trees": TREES_FILE},
+        })
+        shutil.rmtree(d, ignore_errors=True)
+        os.replace(tmp, d)
+        return version
+
+    def promote(self, version: str, reason: str = "") -> dict:
+        if not os.path.exists(os.path.join(self.version_dir(version), META_FILE)):
+            raise FileNotFoundError(f"Versão não registrada: {self.name}/{version}")
+        cur = _read_json(self.champion_path) or {}
+        history = list(cur.get("history") or [])
+        if cur.get("version") and cur["version"] != version:
+            history.append({"version": cur["version"], "promoted_at": cur.get("promoted_at")})
+        pointer = {
+            "version": version,
+            "promoted_at": datetime.now().isoformat(timespec="seconds"),
+            "reason": reason,
+            "history": history[-50:],
+        }
+        _write_json_atomic(self.champion_path, pointer)
+        return pointer
+
+    # -------------------------
+    # Leitura
+    # -------------------------
+    def champion(self) -> Optional[str]:
+        pointer = _read_json(self.champion_path)
+        return pointer.get("version") if pointer else None
+
+    def versions(self) -> List[dict]:
+        """Metas de todas as versões registradas (mais recente primeiro)."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        out = []
+        for v in os.listdir(self.versions_dir):
+            meta = _read_json(os.path.join(self.versions_dir, v, META_FILE))
+            if meta:
+                out.append(meta)
+        return sorted(out, key=lambda m: m.get("registered_at", ""), reverse=True)
+
+    def resolve(self, version: Optional[str] = None) -> str:
+        """Versão pedida > env BISS_MODEL_VERSION > champion > modelo antigo (legacy)."""
+        version = version or os.getenv(VERSION_ENV) or self.champion()
+        if version:
+            return version
+        if self.name == DEFAULT_MODEL_NAME and os.path.exists(LEGACY_MODEL_PATH):
+            return LEGACY_VERSION
+        raise FileNotFoundError(f"Nenhum modelo registrado em {self.root} (rode train_1x2_xgb.py)")
+
+    def meta(self, version: Optional[str] = None) -> dict:
+        version = self.resolve(version)
+        if version == LEGACY_VERSION:
+            return _read_json(LEGACY_META_PATH) or {}
+        meta = _read_json(os.path.join(self.version_dir(version), META_FILE))
+        if meta is None:
+            raise FileNotFoundError(f"Versão não registrada: {self.name}/{version}")
+        return meta
+
+    def load(self, version: Optional[str] = None) -> LoadedModel:
+        version = self.resolve(version)
+        key = (self.root, version)
+        with _CACHE_LOCK:
+            hit = _LOADED.get(key)
+        if hit is not None:
+            return hit
+
+        if version == LEGACY_VERSION:
+            booster = xgb.Booster()
+            booster.load_model(LEGACY_MODEL_PATH)
+            loaded = LoadedModel(version, booster, load_model_pipeline(LEGACY_MODEL_PATH, LEGACY_COLS_PATH), self.meta(version))
+        else:
+            d = self.version_dir(version)
+            if not os.path.exists(os.path.join(d, META_FILE)):
+                raise FileNotFoundError(f"Versão não registrada: {self.name}/{version}")
+            booster = xgb.Booster()
+            booster.load_model(os.path.join(d, MODEL_FILE))
+            pipeline = FeaturePipeline.load(os.path.join(d, SCHEMA_FILE))
+            loaded = LoadedModel(version, booster, pipeline, _read_json(os.path.join(d, META_FILE)),
+                                 trees_path=os.path.join(d, TREES_FILE),
+                                 predictions_path=os.path.join(d, PREDICTIONS_FILE))
+
+        with _CACHE_LOCK:
+            _LOADED.setdefault(key, loaded)
+            return _LOADED[key]
+
+
+# versões são imutáveis -> cache por processo nunca fica velho
+_LOADED: Dict[Tuple[str, str], LoadedModel] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def load_model(version: Optional[str] = None, name: str = DEFAULT_MODEL_NAME) -> LoadedModel:
+    """Atalho: ModelRegistry(name).load(version)."""
+    return ModelRegistry(name).load(version)
+
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Registro de modelos: lista versões e troca o champion.")
+    ap.add_argument("--name", default=DEFAULT_MODEL_NAME)
+    ap.add_argument("--promote", default=None, help="versão que vira champion")
+    args = ap.parse_args()
+
+    reg = ModelRegistry(args.name)
+    if args.promote:
+        reg.promote(args.promote, reason="manual")
+        print(f"[OK] Champion de {args.name}: {args.promote}")
+
+    champ = reg.champion()
+    print(f"[INFO] Registro: {reg.root} | champion: {champ}")
+    for m in reg.versions():
+        metrics = m.get("metrics") or {}
+        split = "test" if "test" in metrics else "holdout"  # atualização incremental só tem holdout
+        ev = metrics.get(split) or {}
+        mark = "*" if m["version"] == champ else " "
+        parent = f"  <- {m['parent_version']}" if m.get("parent_version") else ""
+        print(f" {mark} {m['version']}  {m.get('registered_at')}  {split} logloss={ev.get('logloss')}  acc={ev.get('accuracy')}{parent}")
+
+
+if __name__ == "__main__":
+    main()
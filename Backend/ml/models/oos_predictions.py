@@ -0,0 +1,135 @@
+# Backend/ml/models/oos_predictions.py
+# ------------------------------------------------------------
+# Tabela persistida de previsões fora da amostra (por versão do modelo)
+#
+# - Colunas: match_key, date, split, p_home, p_draw, p_away, model_version
+#   match_key = competition|season|home|away (mesma convenção do
+#   build_dataset.py; único no dataset)
+# - Arquivo colunar por versão, ao lado do modelo no registro:
+#   Backend/ml/models/registry/<nome>/versions/<versão>/predictions.parquet
+#   Versão nova -> arquivo novo; a mesma versão nunca re-prevê o mesmo jogo
+# - Treino (train_1x2_xgb.py) grava o TEST que já previu no eval_split;
+#   avaliação / backtests leem com oos_proba(): jogos da tabela saem dela,
+#   só os que faltam passam pelo modelo (e entram na tabela)
+# - Sem pyarrow ou modelo "legacy" (fora do registro): não persiste,
+#   sempre prevê
+# - Versão de atualização incremental (meta "trained_through"): jogos até
+#   essa data já foram vistos no treino; exclude_trained() tira do frame e
+#   oos_proba() recusa (ValueError) se ainda vierem
+# ------------------------------------------------------------
+
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from model_registry import LoadedModel
+from match_cache import HAS_ARROW  # ml/datasets (no sys.path via model_registry)
+
+
+PROB_COLS = ["p_home", "p_draw", "p_away"]
+COLUMNS = ["match_key", "date", "split"] + PROB_COLS + ["model_version"]
+
+
+def trained_through(model: LoadedModel) -> Optional[pd.Timestamp]:
+    """Última data vista no treino da versão (só atualizações incrementais gravam)."""
+    v = (model.meta or {}).get("trained_through")
+    return pd.Timestamp(v) if v else None
+
+
+def exclude_trained(model: LoadedModel, df: pd.DataFrame, split: str) -> pd.DataFrame:
+    """Tira do frame os jogos com data <= trained_through (in-sample p/ a versão)."""
+    cut = trained_through(model)
+    if cut is None:
+        return df
+    keep = pd.to_datetime(df["date"]).to_numpy() > np.datetime64(cut)
+    out = df[keep].reset_index(drop=True)
+    if len(out) == 0:
+        raise RuntimeError(
+            f"Versão {model.version} foi treinada até {cut.date()} (atualização incremental): "
+            f"nenhum jogo do {split} fica fora da amostra. Avalie uma versão de treino completo "
+            f"(--model-version) ou espere jogos novos."
+        )
+    if len(out) < len(df):
+        print(f"[INFO] {split}: {len(df) - len(out)} jogos até {cut.date()} fora (já vistos no treino de "
+              f"{model.version}); {len(out)} avaliados")
+    return out
+
+
+def match_keys(df: pd.DataFrame) -> np.ndarray:
+    """competition|season|home|away por linha."""
+    parts = [df[c].astype(str) for c in ("competition", "season", "home", "away")]
+    return (parts[0] + "|" + parts[1] + "|" + parts[2] + "|" + parts[3]).to_numpy(dtype=object)
+
+
+def prediction_table(df: pd.DataFrame, prob: np.ndarray, split: str, version: str) -> pd.DataFrame:
+    prob = np.asarray(prob, dtype=np.float32)
+    return pd.DataFrame({
+        "match_key": match_keys(df),
+        "date": pd.to_datetime(df["date"]).to_numpy(),
+        "split": split,
+        "p_home": prob[:, 0], "p_draw": prob[:, 1], "p_away": prob[:, 2],
+        "model_version": version,
+    }, columns=COLUMNS)
+
+
+def read_predictions(model: LoadedModel) -> Optional[pd.DataFrame]:
+    """Tabela da versão (None se não existe / é de outra versão / ilegível)."""
+    path = model.predictions_path
+    if not path or not HAS_ARROW or not os.path.exists(path):
+        return None
+    try:
+        table = pd.read_parquet(path)
+    except Exception as e:
+        print(f"[WARN] Tabela de previsões ilegível ({path}): {e}")
+        return None
+    if list(table.columns) != COLUMNS or (table["model_version"] != model.version).any():
+        return None
+    return table
+
+
+def write_predictions(model: LoadedModel, table: pd.DataFrame) -> Optional[str]:
+    """Junta com o que já existe (linha nova vence no mesmo match_key) e grava atômico."""
+    path = model.predictions_path
+    if not path or not HAS_ARROW or len(table) == 0:
+        return None
+    old = read_predictions(model)
+    if old is not None:
+        table = pd.concat([old, table], ignore_index=True).drop_duplicates("match_key", keep="last")
+    table = table.sort_values(["split", "date", "match_key"], kind="stable").reset_index(drop=True)
+    tmp = path + ".tmp"
+    table.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def oos_proba(model: LoadedModel, df: pd.DataFrame, split: str) -> np.ndarray:
+    """
+    Probs (n, 3) dos jogos de df (frame do split, colunas do dataset).
+    Hit na tabela da versão -> sem inferência; faltantes: pipeline + modelo,
+    e a tabela é atualizada.
+    """
+    cut = trained_through(model)
+    if cut is not None and (pd.to_datetime(df["date"]).to_numpy() <= np.datetime64(cut)).any():
+        raise ValueError(f"Frame tem jogos até {cut.date()}, já vistos no treino de {model.version}; "
+                         f"use exclude_trained() antes")
+
+    keys = match_keys(df)
+    prob = np.full((len(df), 3), np.nan, dtype=np.float32)
+
+    table = read_predictions(model)
+    if table is not None:
+        pos = pd.Index(table["match_key"]).get_indexer(keys)
+        hit = pos >= 0
+        prob[hit] = table[PROB_COLS].to_numpy(dtype=np.float32)[pos[hit]]
+    else:
+        hit = np.zeros(len(df), dtype=bool)
+
+    miss = np.flatnonzero(~hit)
+    if len(miss):
+        part = df.iloc[miss]
+        prob[miss] = model.predict_proba(model.pipeline.transform(part))
+        write_predictions(model, prediction_table(part, prob[miss], split, model.version))
+    print(f"[INFO] Previsões {split} ({model.version}): {int(hit.sum())} da tabela, {len(miss)} recalculadas")
+    return prob
@@ -0,0 +1,99 @@
+# Backend/ml/models/pool_router.py
+# ------------------------------------------------------------
+# Roteador de modelos especialistas por pool_key
+#
+# Manifesto: Backend/ml/models/registry/xgb_1x2_router.json
+#   {"routes": {"POOL_BRASIL": {"name": "xgb_1x2_pool_pool_brasil", "version": "..."}, ...},
+#    "fallback": "xgb_1x2"}
+# (gravado pelo train/train_pool_specialists.py)
+#
+# - Cada linha vai p/ o modelo do seu pool; pool sem especialista (esparso
+#   ou novo) -> modelo global (champion de xgb_1x2)
+# - Vetorizado: agrupa as linhas por modelo e faz 1 transform + 1 predict
+#   por modelo, depois devolve as probs na ordem original (grupo pequeno
+#   vai pelo avaliador NumPy, ver LoadedModel.predict_proba)
+# - Modelos vêm do registro (memoizados por processo)
+# ------------------------------------------------------------
+
+import os
+import json
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from model_registry import DEFAULT_MODEL_NAME, DEFAULT_REGISTRY_DIR, LoadedModel, ModelRegistry
+
+
+ROUTER_PATH = os.path.join(DEFAULT_REGISTRY_DIR, f"{DEFAULT_MODEL_NAME}_router.json")
+
+
+def pool_model_name(pool_key: str) -> str:
+    """'POOL_SÉRIE_A+UCL' -> 'xgb_1x2_pool_pool_serie_a_ucl' (nome seguro p/ diretório)."""
+    ascii_ = unicodedata.normalize("NFKD", str(pool_key)).encode("ascii", "ignore").decode("ascii")
+    return f"{DEFAULT_MODEL_NAME}_pool_" + re.sub(r"[^0-9a-z]+", "_", ascii_.lower()).strip("_")
+
+
+def read_manifest(path: str = ROUTER_PATH) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(routes: Dict[str, dict], fallback: str = DEFAULT_MODEL_NAME, path: str = ROUTER_PATH) -> dict:
+    manifest = {"routes": routes, "fallback": fallback}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)  # leitor nunca vê manifesto pela metade
+    return manifest
+
+
+class PoolRouter:
+    """
+    Uso:
+        router = PoolRouter.load()                # None se não há manifesto
+        prob = router.predict_proba(df)           # (n, 3), df com as features + pool_key
+    """
+
+    def __init__(self, routes: Dict[str, LoadedModel], fallback: LoadedModel, pool_col: str = "pool_key"):
+        self.routes = routes
+        self.fallback = fallback
+        self.pool_col = pool_col
+
+    @classmethod
+    def load(cls, path: str = ROUTER_PATH, root: str = DEFAULT_REGISTRY_DIR) -> Optional["PoolRouter"]:
+        manifest = read_manifest(path)
+        if manifest is None:
+            return None
+        routes = {
+            pk: ModelRegistry(r["name"], root=root).load(r.get("version"))
+            for pk, r in (manifest.get("routes") or {}).items()
+        }
+        fallback = ModelRegistry(manifest.get("fallback") or DEFAULT_MODEL_NAME, root=root).load()
+        return cls(routes, fallback)
+
+    def describe(self) -> Dict[str, str]:
+        return {pk: m.version for pk, m in self.routes.items()}
+
+    def groups(self, df: pd.DataFrame) -> List[Tuple[LoadedModel, np.ndarray]]:
+        """[(modelo, posições das linhas dele)], 1 entrada por modelo distinto."""
+        if len(df) == 0:
+            return []
+        codes, uniques = pd.factorize(df[self.pool_col].astype(str))
+        # modelo de cada pool distinto (especialista ou global) -> linhas de cada modelo
+        model_of = [self.routes.get(pk, self.fallback) for pk in uniques]
+        groups: Dict[int, list] = {}
+        for code, m in enumerate(model_of):
+            groups.setdefault(id(m), [m, []])[1].append(code)
+        return [(m, np.flatnonzero(np.isin(codes, pool_codes))) for m, pool_codes in groups.values()]
+
+    def predict_proba(self, df: pd.DataFrame) -> np.ndarray:
+        prob = np.zeros((len(df), 3), dtype=np.float32)
+        for m, rows in self.groups(df):
+            prob[rows] = m.predict_proba(m.pipeline.transform(df.iloc[rows]))
+        return prob
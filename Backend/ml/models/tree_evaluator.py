@@ -0,0 +1,269 @@
+# Backend/ml/models/tree_evaluator.py
+# ------------------------------------------------------------
+# Avaliador de árvores em NumPy puro (baixa latência p/ poucos jogos)
+#
+# - Exporta as árvores do booster (JSON do xgboost) p/ arrays planos:
+#   feature, threshold, filho esq./dir., default_left e valor da folha de
+#   todos os nós de todas as árvores concatenados (índices globais)
+# - Regra do xgboost: x < threshold -> esquerda; NaN -> default_left
+# - Folha aponta p/ si mesma: todas as árvores descem juntas, max_depth
+#   passos vetorizados em (linhas x árvores), sem DMatrix; cada passo é
+#   1 gather na tabela de filhos (2*nó + foi_p/_esquerda)
+# - Margem por classe = base_score + soma das folhas das árvores da classe;
+#   softmax -> mesmas probs do booster.predict (multi:softprob)
+# - Usa TODAS as árvores (igual ao booster.predict sem iteration_range)
+#
+# Vale p/ lotes pequenos (card de 1 jogo): o custo fixo do DMatrix some.
+# Em lotes grandes o booster.predict (C++ multithread) continua melhor.
+#
+# Uso (valida contra o booster no TEST e mede latência):
+#   python Backend/ml/models/tree_evaluator.py
+# ------------------------------------------------------------
+
+import os
+import json
+import time
+from typing import Optional
+
+import numpy as np
+import xgboost as xgb
+
+
+SUPPORTED_OBJECTIVES = ("multi:softprob", "multi:softmax")
+DEFAULT_ATOL = 1e-5
+
+
+def _softmax(margin: np.ndarray) -> np.ndarray:
+    z = margin - margin.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+def _parse_base_score(raw: str, num_class: int) -> np.ndarray:
+    """xgboost >= 3 grava '[a,b,c]' (margem por classe); versões antigas, 1 escalar."""
+    vals = np.array(json.loads(raw) if raw.strip().startswith("[") else [float(raw)], dtype=np.float32)
+    return np.broadcast_to(vals, (num_class,)).astype(np.float32)
+
+
+class TreeEnsemble:
+    """
+    Uso:
+        trees = TreeEnsemble.from_booster(booster)
+        prob = trees.predict_proba(X)          # X float32 (n, n_features), NaN = ausente
+        trees.save(path) / TreeEnsemble.load(path)
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        leaf_value: np.ndarray,
+        roots: np.ndarray,
+        tree_class: np.ndarray,
+        base_margin: np.ndarray,
+        max_depth: int,
+        num_feature: int,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.tree_class = tree_class
+        self.base_margin = base_margin
+        self.max_depth = int(max_depth)
+        self.num_feature = int(num_feature)
+
+        self.num_class = len(base_margin)
+        # (árvores x classes): soma das folhas por classe vira 1 matmul
+        self._class_onehot = np.zeros((len(roots), self.num_class), dtype=np.float32)
+        self._class_onehot[np.arange(len(roots)), tree_class] = 1.0
+        # filho do nó i: _child[2*i] (direita) / _child[2*i + 1] (esquerda)
+        self._child = np.stack([right, left], axis=1).ravel()
+
+    # -------------------------
+    # Exportação
+    # -------------------------
+    @classmethod
+    def from_booster(cls, booster: xgb.Booster) -> "TreeEnsemble":
+        model = json.loads(bytes(booster.save_raw(raw_format="json")))
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Objetivo não suportado: {objective} (esperado {SUPPORTED_OBJECTIVES})")
+        gb = learner["gradient_booster"]
+        if gb.get("name") != "gbtree":
+            raise ValueError(f"Booster não suportado: {gb.get('name')} (só gbtree)")
+
+        lparam = learner["learner_model_param"]
+        num_class = int(lparam["num_class"])
+        trees = gb["model"]["trees"]
+        tree_info = gb["model"]["tree_info"]
+
+        feature, threshold, left, right, default_left, leaf_value, roots = [], [], [], [], [], [], []
+        max_depth, offset = 0, 0
+        for tree in trees:
+            if any(int(t) != 0 for t in tree["split_type"]):
+                raise ValueError("Split categórico não suportado (o pipeline usa one-hot)")
+            lc = np.asarray(tree["left_children"], dtype=np.int32)
+            rc = np.asarray(tree["right_children"], dtype=np.int32)
+            n = len(lc)
+            own = np.arange(n, dtype=np.int32)
+            is_leaf = lc == -1
+
+            # folha aponta p/ si mesma -> descida de tamanho fixo
+            left.append(np.where(is_leaf, own, lc) + offset)
+            right.append(np.where(is_leaf, own, rc) + offset)
+            feature.append(np.where(is_leaf, 0, np.asarray(tree["split_indices"], dtype=np.int32)))
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            threshold.append(np.where(is_leaf, np.float32(0), cond))
+            leaf_value.append(np.where(is_leaf, cond, np.float32(0)))  # folha: split_conditions = valor
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            roots.append(offset)
+
+            # profundidade: pais vêm antes dos filhos na numeração do xgboost
+            depth = np.zeros(n, dtype=np.int32)
+            for i in np.flatnonzero(~is_leaf):
+                depth[lc[i]] = depth[rc[i]] = depth[i] + 1
+            max_depth = max(max_depth, int(depth.max()))
+            offset += n
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold).astype(np.float32),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            default_left=np.concatenate(default_left),
+            leaf_value=np.concatenate(leaf_value).astype(np.float32),
+            roots=np.asarray(roots, dtype=np.int32),
+            tree_class=np.asarray(tree_info, dtype=np.int32),
+            base_margin=_parse_base_score(lparam["base_score"], num_class),
+            max_depth=max_depth,
+            num_feature=int(lparam["num_feature"]),
+        )
+
+    # -------------------------
+    # Persistência (npz)
+    # -------------------------
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            feature=self.feature, threshold=self.threshold,
+            left=self.left, right=self.right,
+            default_left=self.default_left, leaf_value=self.leaf_value,
+            roots=self.roots, tree_class=self.tree_class, base_margin=self.base_margin,
+            max_depth=np.int32(self.max_depth), num_feature=np.int32(self.num_feature),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEnsemble":
+        with np.load(path) as z:
+            arrs = {k: z[k] for k in z.files}
+        arrs["max_depth"] = int(arrs["max_depth"])
+        arrs["num_feature"] = int(arrs["num_feature"])
+        return cls(**arrs)
+
+    # -------------------------
+    # Avaliação
+    # -------------------------
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def leaf_index(self, X: np.ndarray) -> np.ndarray:
+        """Nó folha (índice global) de cada linha em cada árvore: (n, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.num_feature:
+            raise ValueError(f"X deve ter shape (n, {self.num_feature}); veio {X.shape}")
+        row_base = np.arange(len(X))[:, None] * X.shape[1]
+        flat = np.ascontiguousarray(X).ravel()
+        node = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = flat[row_base + self.feature[node]]
+            go_left = (x < self.threshold[node]) | (np.isnan(x) & self.default_left[node])
+            node = self._child[2 * node + go_left]
+        return node
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        leaves = self.leaf_value[self.leaf_index(X)]
+        return leaves @ self._class_onehot + self.base_margin
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return _softmax(self.predict_margin(X))
+
+
+# =========================
+# Validação contra o booster
+# =========================
+
+def check_against_booster(
+    trees: TreeEnsemble,
+    booster: xgb.Booster,
+    X: np.ndarray,
+    atol: float = DEFAULT_ATOL,
+) -> float:
+    """Maior |diferença| de prob vs booster.predict em X; RuntimeError se passar de atol."""
+    ref = booster.predict(xgb.DMatrix(X))
+    got = trees.predict_proba(X)
+    diff = float(np.max(np.abs(ref - got))) if len(X) else 0.0
+    if diff > atol:
+        raise RuntimeError(f"Avaliador NumPy diverge do booster: max |diff| = {diff:.3g} > {atol:g}")
+    return diff
+
+
+def _best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv: Optional[list] = None):
+    import sys
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Valida o avaliador NumPy contra o booster e mede latência.")
+    ap.add_argument("--version", default=None, help="versão do registro (padrão: champion)")
+    ap.add_argument("--atol", type=float, default=DEFAULT_ATOL)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args(argv)
+
+    train_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "train"))
+    if train_dir not in sys.path:
+        sys.path.insert(0, train_dir)
+    from model_registry import load_model
+    from train_1x2_xgb import TRAIN_FRAC, VAL_FRAC, load_model_frame, split_by_pool_temporal
+
+    data_path = os.path.join(os.path.dirname(train_dir), "datasets", "matches_enriched.csv")
+
+    model = load_model(args.version)
+    t0 = time.perf_counter()
+    trees = model.trees()
+    print(f"[INFO] Modelo {model.version}: {trees.n_trees} árvores, {len(trees.feature)} nós, "
+          f"profundidade {trees.max_depth} (carregado em {time.perf_counter() - t0:.2f}s)")
+
+    test_df = split_by_pool_temporal(load_model_frame(data_path), train_frac=TRAIN_FRAC, val_frac=VAL_FRAC)[2]
+    X = model.pipeline.transform(test_df)
+    diff = check_against_booster(trees, model.booster, X, atol=args.atol)
+    print(f"[OK] TEST ({len(X)} jogos): max |diff| vs booster.predict = {diff:.2e} (tol {args.atol:g})")
+
+    print(f"\n{'lote':>6}  {'booster+DMatrix':>16}  {'numpy':>10}")
+    for n in (1, 10, 100, 1000):
+        xb = X[:n]
+        t_xgb = _best_time(lambda: model.booster.predict(xgb.DMatrix(xb)), args.repeat)
+        t_np = _best_time(lambda: trees.predict_proba(xb), args.repeat)
+        print(f"{n:>6}  {t_xgb * 1e3:>13.3f} ms  {t_np * 1e3:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
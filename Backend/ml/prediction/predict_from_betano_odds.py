@@ -8,15 +8,20 @@
 # Obs:
 # - probs e overround saem em porcentagem (0-100), com 1 casa decimal
 # - odds também saem com 1 casa decimal
+#
+# --explain: também grava predictions_betano_explain.csv (formato longo)
+# campeonato,casa,fora,data_hora,model_version,pick,feature,rank,
+# contrib_home,contrib_draw,contrib_away,contrib_pick
+# (contribuição de cada feature na margem de cada classe; one-hot agrupado
+#  em pool_key/competition; rank 1 = a que mais pesou no pick; bias = rank 0)
 # ------------------------------------------------------------
 
 import os
 import math
-import joblib
 import numpy as np
 import pandas as pd
-import xgboost as xgb
 import json
+import sys
 from typing import Optional, Tuple
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,11 +30,24 @@ BACKEND_DIR = os.path.abspath(os.path.join(ML_DIR, ".."))
 
 DEFAULT_ODDS_CSV = os.path.join(BACKEND_DIR, "data", "odds_betano_final.csv")
 MODELS_DIR = os.path.join(ML_DIR, "models")
-MODEL_PATH = os.path.join(MODELS_DIR, "xgb_1x2.json")
-COLS_PATH = os.path.join(MODELS_DIR, "xgb_1x2_columns.pkl")
 ELO_STATE_PATH = os.path.join(ML_DIR, "datasets", "elo_ratings.json")
+FEATURE_STORE_PATH = os.path.join(ML_DIR, "datasets", "team_feature_store.npz")
+
+DATASETS_DIR = os.path.join(ML_DIR, "datasets")
+if DATASETS_DIR not in sys.path:
+    sys.path.insert(0, DATASETS_DIR)
+if MODELS_DIR not in sys.path:
+    sys.path.insert(0, MODELS_DIR)
+
+from feature_pipeline import add_model_features  # noqa: E402
+from feature_contribs import ContribCache, contributions_frame, feature_contributions  # noqa: E402
+from feature_store import TeamFeatureStore, team_features_asof  # noqa: E402
+from model_registry import VERSION_ENV, load_model  # noqa: E402
+from pool_router import PoolRouter  # noqa: E402
 
 OUT_CSV = os.path.join(THIS_DIR, "predictions_betano.csv")
+EXPLAIN_CSV = os.path.join(THIS_DIR, "predictions_betano_explain.csv")
+EXPLAIN_ID_COLS = ["campeonato", "casa", "fora", "data_hora"]
 
 BRA_A = "Brasileirão - Série A Betano"
 BRA_B = "Brasileirão - Série B"
@@ -73,24 +91,33 @@ def normalize_probs(ph, pd_, pa) -> Tuple[Optional[float], Optional[float], Opti
         return None, None, None, None
     return ph / s, pd_ / s, pa / s, (s - 1.0)
 
-def entropy_1x2(ph, pd_, pa) -> float:
-    for v in (ph, pd_, pa):
-        if v is None or (isinstance(v, float) and np.isnan(v)) or v <= 0:
-            return np.nan
-    s = float(ph + pd_ + pa)
-    if s <= 0:
-        return np.nan
-    ph2, pd2, pa2 = float(ph) / s, float(pd_) / s, float(pa) / s
-    return -(ph2 * math.log(ph2) + pd2 * math.log(pd2) + pa2 * math.log(pa2))
-
 def load_elo_state(path: str) -> dict:
+    """
+    Lê elo_ratings.json (gerado pelo build_dataset.py) e devolve:
+      {"elo": {pool: {time: elo}}, "form": {pool: {time: {...}}}, "elo_cfg": {...}}
+    Aceita também o formato antigo {pool: {time: elo}}. Vazio se ausente/inválido.
+    """
+    empty = {"elo": {}, "form": {}, "elo_cfg": {}}
     if not os.path.exists(path):
-        return {}
+        return empty
     try:
         with open(path, "r", encoding="utf-8") as f:
-            return json.load(f) or {}
+            raw = json.load(f) or {}
     except Exception:
-        return {}
+        return empty
+
+    if "pools" not in raw:
+        return {**empty, "elo": raw}
+
+    elo, form = {}, {}
+    for pk, p in raw["pools"].items():
+        teams = p.get("teams", [])
+        elo[pk] = dict(zip(teams, p.get("elo", [])))
+        form[pk] = {
+            t: {"form_pts_3": f3, "form_pts_5": f5, "gd_5": g5}
+            for t, f3, f5, g5 in zip(teams, p.get("form_pts_3", []), p.get("form_pts_5", []), p.get("gd_5", []))
+        }
+    return {"elo": elo, "form": form, "elo_cfg": raw.get("elo_cfg") or {}}
 
 def get_elo(elo_state: dict, pool_key: str, team: str, base=1500.0) -> float:
     try:
@@ -99,6 +126,14 @@ def get_elo(elo_state: dict, pool_key: str, team: str, base=1500.0) -> float:
     except Exception:
         return float(base)
 
+def get_form(form_state: dict, pool_key: str, team: str, key: str) -> float:
+    """Forma do time no snapshot (form_pts_3 / form_pts_5 / gd_5); 0 p/ time desconhecido."""
+    try:
+        v = form_state.get(pool_key, {}).get(team, {}).get(key, None)
+        return float(v) if v is not None else 0.0
+    except Exception:
+        return 0.0
+
 def confidence_bucket(conf: float) -> str:
     if conf >= 0.70:
         return "ALTA"
@@ -154,16 +189,37 @@ def _round_1d(x):
     except Exception:
         return np.nan
 
-def main():
+def explain_predictions(piv: pd.DataFrame, groups, top_k: Optional[int] = None) -> pd.DataFrame:
+    """
+    Contribuições por jogo, com o modelo que previu cada linha (especialista ou global).
+    1 pred_contribs em lote por modelo, só p/ vetores fora do cache da versão.
+    """
+    parts = []
+    for m, rows in groups:
+        sub = piv.iloc[rows]
+        cache = ContribCache.for_model(m)
+        before = len(cache)
+        features, contribs = feature_contributions(m, m.pipeline.transform(sub), cache)
+        cache.save()
+        print(f"[INFO] Contribuições ({m.version}): {len(sub)} jogos, {len(cache) - before} calculados, resto do cache")
+
+        ids = sub[EXPLAIN_ID_COLS].copy()
+        ids["model_version"] = m.version
+        ids["_row"] = rows  # ordem original entre modelos
+        parts.append(contributions_frame(ids, features, contribs, sub["ai_pick"].values.astype(int), top_k=top_k))
+
+    out = pd.concat(parts, ignore_index=True)
+    return out.sort_values("_row", kind="stable").drop(columns="_row").reset_index(drop=True)
+
+def main(model_version: Optional[str] = None, explain: bool = False, top_k: Optional[int] = None):
     odds_csv = os.getenv("BETANO_CSV_PATH", DEFAULT_ODDS_CSV)
     odds_csv = os.path.abspath(odds_csv)
 
     if not os.path.exists(odds_csv):
         raise FileNotFoundError(f"Não encontrei odds CSV em: {odds_csv}")
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Modelo não encontrado: {MODEL_PATH}")
-    if not os.path.exists(COLS_PATH):
-        raise FileNotFoundError(f"Colunas do modelo não encontradas: {COLS_PATH}")
+
+    # champion do registro (ou versão fixada: argumento / env BISS_MODEL_VERSION)
+    model = load_model(model_version)
 
     df = pd.read_csv(odds_csv)
 
@@ -206,102 +262,67 @@ def main():
 
     piv["pool_key"] = piv["campeonato"].apply(pool_key_for_comp)
 
-    elo_state = load_elo_state(ELO_STATE_PATH)
-    HOME_ADV = 60.0
-    BASE_ELO = 1500.0
-
-    piv["elo_home_pre"] = [
-        get_elo(elo_state, str(pk), str(home), base=BASE_ELO) + HOME_ADV
-        for pk, home in zip(piv["pool_key"].values, piv["casa"].values)
-    ]
-    piv["elo_away_pre"] = [
-        get_elo(elo_state, str(pk), str(away), base=BASE_ELO)
-        for pk, away in zip(piv["pool_key"].values, piv["fora"].values)
-    ]
+    snapshot = load_elo_state(ELO_STATE_PATH)
+    elo_state = snapshot["elo"]
+    if not elo_state:
+        print(f"[WARN] Snapshot de Elo não encontrado ({ELO_STATE_PATH}); usando Elo base p/ todos os times.")
+    HOME_ADV = float(snapshot["elo_cfg"].get("home_adv", 60.0))
+    BASE_ELO = float(snapshot["elo_cfg"].get("base_elo", 1500.0))
+
+    FORM_COLS = ["form_pts_home_3", "form_pts_home_5", "form_pts_away_3", "form_pts_away_5", "gd_home_5", "gd_away_5"]
+
+    # Feature store point-in-time: Elo + forma as-of a data do jogo (mesmo caminho dos backtests)
+    store = TeamFeatureStore.load(FEATURE_STORE_PATH)
+    if store is not None:
+        feats = team_features_asof(store, piv["pool_key"].values, piv["casa"].values, piv["fora"].values, piv["data_hora"].values)
+        piv["elo_home_pre"] = feats["elo_home_real"].values + HOME_ADV
+        piv["elo_away_pre"] = feats["elo_away_real"].values
+        for c in FORM_COLS:
+            piv[c] = feats[c].values
+    else:
+        print(f"[WARN] Feature store não encontrado ({FEATURE_STORE_PATH}); usando Elo e forma do snapshot "
+              f"(estado atual, não as-of a data do jogo).")
+        piv["elo_home_pre"] = [
+            get_elo(elo_state, str(pk), str(home), base=BASE_ELO) + HOME_ADV
+            for pk, home in zip(piv["pool_key"].values, piv["casa"].values)
+        ]
+        piv["elo_away_pre"] = [
+            get_elo(elo_state, str(pk), str(away), base=BASE_ELO)
+            for pk, away in zip(piv["pool_key"].values, piv["fora"].values)
+        ]
+        form_state = snapshot["form"]
+        for side, team_col in (("home", "casa"), ("away", "fora")):
+            for key, col in (("form_pts_3", f"form_pts_{side}_3"), ("form_pts_5", f"form_pts_{side}_5"), ("gd_5", f"gd_{side}_5")):
+                piv[col] = [
+                    get_form(form_state, str(pk), str(team), key)
+                    for pk, team in zip(piv["pool_key"].values, piv[team_col].values)
+                ]
     piv["elo_diff"] = piv["elo_home_pre"] - piv["elo_away_pre"]
-    piv["abs_elo_diff"] = piv["elo_diff"].abs()
-
-    piv["has_odds_1x2"] = (~piv["betano_ph"].isna() & ~piv["betano_pd"].isna() & ~piv["betano_pa"].isna()).astype(int)
 
     piv["imp_ph"] = piv["betano_ph"]
     piv["imp_pd"] = piv["betano_pd"]
     piv["imp_pa"] = piv["betano_pa"]
     piv["imp_overround_1x2"] = piv["betano_overround"]
-
     piv["imp_ph_minus_pa"] = (piv["betano_ph"] - piv["betano_pa"]).astype(float)
-    piv["abs_imp_ph_minus_pa"] = piv["imp_ph_minus_pa"].abs()
-
-    piv["imp_entropy_1x2"] = [
-        entropy_1x2(ph, pd_, pa)
-        for ph, pd_, pa in zip(piv["betano_ph"].values, piv["betano_pd"].values, piv["betano_pa"].values)
-    ]
-
-    piv["fav_prob"] = np.nan
-    m = piv["has_odds_1x2"] == 1
-    if m.any():
-        piv.loc[m, "fav_prob"] = np.maximum(piv.loc[m, "betano_ph"].values, piv.loc[m, "betano_pa"].values)
-
-    piv["draw_edge"] = np.nan
-    piv.loc[m, "draw_edge"] = piv.loc[m, "betano_pd"].values - piv.loc[m, "fav_prob"].values
-
-    piv["balanced_flag"] = 0
-    piv.loc[m, "balanced_flag"] = (piv.loc[m, "fav_prob"].values < 0.45).astype(int)
-
-    piv["form_pts_home_3"] = 0.0
-    piv["form_pts_home_5"] = 0.0
-    piv["form_pts_away_3"] = 0.0
-    piv["form_pts_away_5"] = 0.0
-    piv["gd_home_5"] = 0.0
-    piv["gd_away_5"] = 0.0
 
     piv["ou_p_over25"] = np.nan
     piv["ou_p_under25"] = np.nan
     piv["ou_overround"] = np.nan
     piv["ou_p_over_minus_under"] = np.nan
-    piv["has_ou_25"] = 0
-
-    num_cols = [
-        "elo_home_pre", "elo_away_pre", "elo_diff", "abs_elo_diff",
-        "form_pts_home_3", "form_pts_home_5",
-        "form_pts_away_3", "form_pts_away_5",
-        "gd_home_5", "gd_away_5",
-        "odds_h", "odds_d", "odds_a",
-        "imp_ph", "imp_pd", "imp_pa",
-        "imp_overround_1x2",
-        "imp_ph_minus_pa",
-        "abs_imp_ph_minus_pa",
-        "imp_entropy_1x2",
-        "fav_prob",
-        "draw_edge",
-        "balanced_flag",
-        "ou_p_over25", "ou_p_under25",
-        "ou_overround",
-        "ou_p_over_minus_under",
-        "has_odds_1x2",
-        "has_ou_25",
-    ]
-
-    Xn = piv[num_cols].copy()
-
-    Xc = pd.get_dummies(
-        pd.DataFrame({
-            "pool_key": piv["pool_key"].astype(str),
-            "competition": piv["campeonato"].astype(str),
-        }),
-        prefix=["pool_key", "competition"],
-        dummy_na=False,
-    )
 
-    X = pd.concat([Xn, Xc], axis=1)
+    # flags, entropia, fav_prob, draw_edge... iguais ao treino
+    add_model_features(piv)
+    piv["competition"] = piv["campeonato"].astype(str)
 
-    all_cols = joblib.load(COLS_PATH)
-    X = X.reindex(columns=all_cols, fill_value=0)
-
-    booster = xgb.Booster()
-    booster.load_model(MODEL_PATH)
-
-    dmat = xgb.DMatrix(X.values.astype(np.float32))
-    prob = booster.predict(dmat)
+    # especialistas por pool (se houver manifesto do roteador e nenhuma versão fixada)
+    router = None if (model_version or os.getenv(VERSION_ENV)) else PoolRouter.load()
+    if router is not None:
+        print(f"[INFO] Roteador por pool: {len(router.describe())} especialistas; resto -> {router.fallback.version}")
+        prob = router.predict_proba(piv)
+    else:
+        # pipeline salvo com o modelo: mesmo layout de colunas/one-hot do treino
+        # (poucos jogos -> avaliador NumPy, sem DMatrix)
+        prob = model.predict_proba(model.pipeline.transform(piv))
 
     piv["ai_ph"] = prob[:, 0]
     piv["ai_pd"] = prob[:, 1]
@@ -351,5 +372,20 @@ def main():
     print("\nPreview:")
     print(out.head(30).to_string(index=False))
 
+    if explain:
+        groups = router.groups(piv) if router is not None else [(model, np.arange(len(piv)))]
+        expl = explain_predictions(piv, groups, top_k=top_k)
+        expl.to_csv(EXPLAIN_CSV, index=False, encoding="utf-8")
+        print("\n[OK] Contribuições salvas em:", EXPLAIN_CSV)
+        top = expl[expl["rank"].between(1, 3)]
+        print(top[["casa", "fora", "pick", "rank", "feature", "contrib_pick"]].head(30).round(3).to_string(index=False))
+
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Previsões 1X2 a partir das odds da Betano.")
+    ap.add_argument("--model-version", default=None, help="versão do registro (padrão: champion / roteador)")
+    ap.add_argument("--explain", action="store_true", help="grava as contribuições por feature de cada jogo")
+    ap.add_argument("--top-k", type=int, default=None, help="com --explain: só as K features que mais pesaram")
+    args = ap.parse_args()
+    main(model_version=args.model_version, explain=args.explain, top_k=args.top_k)
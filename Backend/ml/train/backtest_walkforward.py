@@ -0,0 +1,222 @@
+# Backend/ml/train/backtest_walkforward.py
+# ------------------------------------------------------------
+# Backtest walk-forward (rolling origin) do XGBoost 1X2
+#
+# - Aquecimento: treina o booster inicial com os primeiros N anos
+# - Anda no tempo em passos (mensal por padrão). Em cada passo:
+#     1) prevê os jogos do passo com o booster atual (fora da amostra)
+#     2) continua o booster (xgb.train(..., xgb_model=booster)) com
+#        --rounds-per-step rounds numa janela deslizante dos últimos
+#        --window-rows jogos já encerrados (não só os do passo), com eta
+#        reduzido (--step-eta x eta) p/ as árvores anexadas
+#     3) a cada --retrain-every passos retreina do zero com todo o
+#        histórico (limita o total de árvores: o modelo avaliado fica
+#        próximo do que é treinado/servido)
+# - Resultado: probabilidade OOS p/ todo jogo após o aquecimento
+#   + curva de desempenho por passo
+#
+# --mode retrain refaz o treino do zero a cada passo (referência lenta)
+#
+# Saídas:
+#   Backend/ml/train/backtest_oos_predictions.csv
+#   Backend/ml/train/backtest_curve.csv
+# ------------------------------------------------------------
+
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from train_1x2_xgb import class_weights, load_model_frame, resolve_params
+from feature_pipeline import FeaturePipeline
+from model_registry import ModelRegistry
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
+ML_DIR = os.path.abspath(os.path.join(THIS_DIR, ".."))
+DATA_PATH = os.path.join(ML_DIR, "datasets", "matches_enriched.csv")
+
+OUT_PRED = os.path.join(THIS_DIR, "backtest_oos_predictions.csv")
+OUT_CURVE = os.path.join(THIS_DIR, "backtest_curve.csv")
+
+EPS = 1e-15
+
+# modo continue (ver cabeçalho)
+WINDOW_ROWS = 15000
+STEP_ETA = 0.5
+RETRAIN_EVERY = 12
+
+
+def logloss_rows(prob: np.ndarray, y: np.ndarray) -> np.ndarray:
+    return -np.log(np.clip(prob[np.arange(len(y)), y], EPS, 1.0))
+
+
+def weighted_dmatrix(X: np.ndarray, y: np.ndarray, w: dict) -> xgb.DMatrix:
+    sw = np.array([w[int(v)] for v in y], dtype=float)
+    return xgb.DMatrix(X, label=y, weight=sw)
+
+
+def walk_forward(
+    df: pd.DataFrame,
+    params: dict,
+    warmup_years: float = 3.0,
+    freq: str = "M",
+    init_rounds: int = 200,
+    rounds_per_step: int = 10,
+    mode: str = "continue",
+    window_rows: int = WINDOW_ROWS,
+    step_eta: float = STEP_ETA,
+    retrain_every: int = RETRAIN_EVERY,
+) -> pd.DataFrame:
+    """
+    df: frame do modelo (load_model_frame). Retorna uma linha por jogo fora da
+    amostra com p_h/p_d/p_a e o passo em que foi previsto.
+    """
+    df = df.sort_values(["date", "pool_key"], kind="stable").reset_index(drop=True)
+    X = FeaturePipeline.fit(df).transform(df)
+    y = df["target_1x2"].values.astype(int)
+
+    steps = df["date"].dt.to_period(freq)
+    start = df["date"].min() + pd.DateOffset(months=int(round(warmup_years * 12)))
+    first_step = pd.Timestamp(start).to_period(freq)
+    step_ids = sorted(p for p in steps.unique() if p >= first_step)
+    if not step_ids:
+        raise RuntimeError("Histórico curto demais para o aquecimento pedido.")
+
+    step_arr = steps.values
+    seen = int(np.searchsorted(df["date"].values, np.datetime64(first_step.start_time), side="left"))
+    print(f"[INFO] Aquecimento: {seen} jogos até {first_step.start_time.date()} | {len(step_ids)} passos ({freq}) | modo={mode}")
+
+    _, w = class_weights(y[:seen])
+    booster = xgb.train(params, weighted_dmatrix(X[:seen], y[:seen], w), num_boost_round=init_rounds)
+    step_params = {**params, "eta": float(params.get("eta", 0.3)) * step_eta}
+
+    parts = []
+    for i, step in enumerate(step_ids, start=1):
+        rows = np.flatnonzero(step_arr == step)
+        if len(rows) == 0:
+            continue
+
+        # 1) previsão fora da amostra (booster só viu jogos anteriores ao passo)
+        prob = booster.predict(xgb.DMatrix(X[rows]))
+        parts.append(pd.DataFrame({
+            "row": rows,
+            "step": str(step),
+            "p_h": prob[:, 0],
+            "p_d": prob[:, 1],
+            "p_a": prob[:, 2],
+        }))
+
+        # 2) incorpora os jogos encerrados do passo
+        hi = int(rows.max()) + 1
+        seen = hi
+        if mode == "retrain" or (retrain_every > 0 and i % retrain_every == 0):
+            _, w = class_weights(y[:hi])
+            booster = xgb.train(params, weighted_dmatrix(X[:hi], y[:hi], w), num_boost_round=init_rounds)
+        else:
+            lo = max(0, hi - window_rows)  # janela deslizante, não só o mês
+            _, w = class_weights(y[lo:hi])
+            booster = xgb.train(
+                step_params,
+                weighted_dmatrix(X[lo:hi], y[lo:hi], w),
+                num_boost_round=rounds_per_step,
+                xgb_model=booster,
+            )
+
+    oos = pd.concat(parts, ignore_index=True)
+    meta_cols = ["date", "pool_key", "competition", "season", "home", "away", "target_1x2", "odds_h", "odds_d", "odds_a"]
+    base = df.loc[oos["row"].values, [c for c in meta_cols if c in df.columns]].reset_index(drop=True)
+    out = pd.concat([base, oos.drop(columns=["row"])], axis=1)
+    out["pred"] = out[["p_h", "p_d", "p_a"]].values.argmax(axis=1)
+    out["logloss"] = logloss_rows(out[["p_h", "p_d", "p_a"]].values, out["target_1x2"].values.astype(int))
+    return out
+
+
+def performance_curve(oos: pd.DataFrame) -> pd.DataFrame:
+    g = oos.groupby("step", sort=True)
+    curve = pd.DataFrame({
+        "n": g.size(),
+        "logloss": g["logloss"].mean(),
+        "accuracy": g.apply(lambda d: float((d["pred"] == d["target_1x2"]).mean())),
+    }).reset_index()
+    curve["cum_n"] = curve["n"].cumsum()
+    curve["cum_logloss"] = (curve["logloss"] * curve["n"]).cumsum() / curve["cum_n"]
+    return curve
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Backtest walk-forward do XGBoost 1X2 (continuação do booster).")
+    ap.add_argument("--freq", default="M", help="tamanho do passo (período pandas: M, W, Q...)")
+    ap.add_argument("--warmup-years", type=float, default=3.0)
+    ap.add_argument("--init-rounds", type=int, default=None,
+                    help="rounds do booster inicial (padrão: best_iteration do champion + 1)")
+    ap.add_argument("--rounds-per-step", type=int, default=10)
+    ap.add_argument("--mode", choices=["continue", "retrain"], default="continue")
+    ap.add_argument("--window-rows", type=int, default=WINDOW_ROWS,
+                    help="continue: jogos mais recentes usados nos rounds anexados")
+    ap.add_argument("--step-eta", type=float, default=STEP_ETA,
+                    help="continue: eta dos rounds anexados = step-eta x eta")
+    ap.add_argument("--retrain-every", type=int, default=RETRAIN_EVERY,
+                    help="continue: retreina do zero a cada N passos (0 = nunca)")
+    ap.add_argument("--out-suffix", default="", help="sufixo nos CSVs de saída (ex.: _retrain p/ comparar modos)")
+    args = ap.parse_args(argv)
+
+    params, tuned = resolve_params()
+    init_rounds = args.init_rounds
+    if init_rounds is None:
+        best_it = (tuned or {}).get("best_iteration")
+        if best_it is None:
+            try:
+                best_it = ModelRegistry().meta().get("best_iteration")  # champion atual
+            except FileNotFoundError:
+                best_it = None
+        init_rounds = int(best_it) + 1 if best_it is not None and int(best_it) >= 0 else 200
+
+    df = load_model_frame(DATA_PATH)
+
+    t0 = time.perf_counter()
+    oos = walk_forward(
+        df, params,
+        warmup_years=args.warmup_years,
+        freq=args.freq,
+        init_rounds=init_rounds,
+        rounds_per_step=args.rounds_per_step,
+        mode=args.mode,
+        window_rows=args.window_rows,
+        step_eta=args.step_eta,
+        retrain_every=args.retrain_every,
+    )
+    elapsed = time.perf_counter() - t0
+
+    curve = performance_curve(oos)
+    out_pred = OUT_PRED.replace(".csv", f"{args.out_suffix}.csv")
+    out_curve = OUT_CURVE.replace(".csv", f"{args.out_suffix}.csv")
+    oos.to_csv(out_pred, index=False, encoding="utf-8")
+    curve.to_csv(out_curve, index=False, encoding="utf-8")
+
+    by_year = oos.groupby(oos["date"].dt.year).agg(
+        n=("logloss", "size"),
+        logloss=("logloss", "mean"),
+        accuracy=("pred", lambda s: float((s == oos.loc[s.index, "target_1x2"]).mean())),
+    )
+
+    print("\n" + "=" * 70)
+    print("WALK-FORWARD (fora da amostra) por ano")
+    print("=" * 70)
+    print(by_year.round(4).to_string())
+    print("\n" + "-" * 70)
+    print(f"[OK] Jogos OOS: {len(oos)} | LogLoss: {oos['logloss'].mean():.4f} | "
+          f"Accuracy: {(oos['pred'] == oos['target_1x2']).mean():.4f}")
+    print(f"[OK] Tempo ({args.mode}): {elapsed:.1f}s | init_rounds={init_rounds} | rounds/passo={args.rounds_per_step}")
+    print(f"[OK] Previsões OOS: {out_pred}")
+    print(f"[OK] Curva por passo: {out_curve}")
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    main()
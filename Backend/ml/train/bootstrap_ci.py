@@ -0,0 +1,165 @@
+# Backend/ml/train/bootstrap_ci.py
+# ------------------------------------------------------------
+# Intervalos de confiança por bootstrap (vetorizado) p/ a avaliação no TEST
+#
+# Métricas (por competição + __ALL__):
+#   accuracy / logloss do modelo (todos os jogos)
+#   model_acc_odds / house_acc_odds / delta_acc (modelo - casa, em pontos
+#   percentuais) no subset com odds 1x2 completas (mesmo do print "Delta")
+#   roi_model / roi_house: aposta fixa de 1 unidade no pick (odd - 1 ou -1)
+#
+# Como:
+# - reamostras = matriz de índices (B x n) sorteada de uma vez; vira matriz
+#   de contagens (quantas vezes cada jogo caiu em cada reamostra)
+# - cada métrica é razão de somas: contagens @ [valores por jogo x grupo]
+#   -> 1 matmul dá todas as métricas, de todos os grupos, em todas as
+#   reamostras (blocos de --block reamostras p/ limitar memória)
+# - Reamostra o TEST inteiro; o tamanho de cada competição varia junto
+# - IC percentil (alpha/2, 1 - alpha/2) + fração das reamostras > 0
+# ------------------------------------------------------------
+
+import warnings
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+ALL_LABEL = "__ALL__"
+DEFAULT_N_BOOT = 2000
+DEFAULT_ALPHA = 0.05
+DEFAULT_SEED = 42
+DEFAULT_BLOCK = 500
+EPS = 1e-15
+
+# colunas por jogo (somadas pela matriz de contagens)
+_COLS = ["one", "model_correct", "nll", "odds", "model_correct_odds", "house_correct_odds",
+         "picked", "profit_model", "profit_house"]
+_C = {c: i for i, c in enumerate(_COLS)}
+
+METRICS = ["accuracy", "logloss", "model_acc_odds", "house_acc_odds", "delta_acc_pp", "roi_model", "roi_house"]
+
+
+def _metrics_from_sums(S: np.ndarray) -> np.ndarray:
+    """S (..., colunas, grupos) -> (..., métricas, grupos); NaN onde o denominador é 0."""
+    def ratio(num, den):
+        d = S[..., _C[den], :]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(d > 0, num / np.where(d > 0, d, 1.0), np.nan)
+
+    col = lambda c: S[..., _C[c], :]  # noqa: E731
+    return np.stack([
+        ratio(col("model_correct"), "one"),
+        ratio(col("nll"), "one"),
+        ratio(col("model_correct_odds"), "odds"),
+        ratio(col("house_correct_odds"), "odds"),
+        100.0 * ratio(col("model_correct_odds") - col("house_correct_odds"), "odds"),
+        ratio(col("profit_model"), "picked"),
+        ratio(col("profit_house"), "odds"),
+    ], axis=-2)
+
+
+def per_match_values(
+    prob: np.ndarray,
+    y: np.ndarray,
+    odds: np.ndarray,
+    has_odds: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """(n, colunas) com os valores por jogo que as métricas somam."""
+    prob = np.asarray(prob, dtype=np.float64)
+    y = np.asarray(y, dtype=np.int64)
+    odds = np.asarray(odds, dtype=np.float64)
+    n = len(y)
+    rows = np.arange(n)
+    ho = ~np.isnan(odds).any(axis=1) if has_odds is None else np.asarray(has_odds, dtype=bool)
+
+    pred = np.argmax(prob, axis=1)
+    house = np.argmin(np.where(ho[:, None], odds, np.inf), axis=1)
+    m_ok = pred == y
+    h_ok = ho & (house == y)
+
+    picked_odds = odds[rows, pred]
+    picked = ~np.isnan(picked_odds)
+    profit_model = np.where(picked, np.where(m_ok, picked_odds - 1.0, -1.0), 0.0)
+    house_odds = np.where(ho, odds[rows, house], 0.0)
+    profit_house = np.where(ho, np.where(h_ok, house_odds - 1.0, -1.0), 0.0)
+
+    V = np.zeros((n, len(_COLS)), dtype=np.float64)
+    V[:, _C["one"]] = 1.0
+    V[:, _C["model_correct"]] = m_ok
+    V[:, _C["nll"]] = -np.log(np.clip(prob[rows, y], EPS, 1.0))
+    V[:, _C["odds"]] = ho
+    V[:, _C["model_correct_odds"]] = m_ok & ho
+    V[:, _C["house_correct_odds"]] = h_ok
+    V[:, _C["picked"]] = picked
+    V[:, _C["profit_model"]] = profit_model
+    V[:, _C["profit_house"]] = profit_house
+    return V
+
+
+def bootstrap_ci(
+    prob: np.ndarray,
+    y: np.ndarray,
+    odds: np.ndarray,
+    groups: Optional[np.ndarray] = None,
+    has_odds: Optional[np.ndarray] = None,
+    n_boot: int = DEFAULT_N_BOOT,
+    alpha: float = DEFAULT_ALPHA,
+    seed: int = DEFAULT_SEED,
+    block: int = DEFAULT_BLOCK,
+) -> pd.DataFrame:
+    """
+    Tabela longa: group, metric, estimate, ci_low, ci_high, p_gt_0, n.
+    groups: rótulo por jogo (ex.: competição); None = só __ALL__.
+    """
+    V = per_match_values(prob, y, odds, has_odds)
+    n = len(V)
+    if groups is None:
+        labels = np.array([ALL_LABEL], dtype=object)
+        G = np.ones((n, 1))
+    else:
+        codes, uniq = pd.factorize(pd.Series(groups).astype(str), sort=True)
+        labels = np.concatenate([[ALL_LABEL], uniq.astype(object)])
+        G = np.zeros((n, len(labels)))
+        G[:, 0] = 1.0
+        G[np.arange(n), codes + 1] = 1.0
+
+    # (n, colunas * grupos): cada coluna de valor "mascarada" por grupo
+    M = (V[:, :, None] * G[:, None, :]).reshape(n, -1)
+    shape = (len(_COLS), len(labels))
+    point = _metrics_from_sums((np.ones(n) @ M).reshape(shape))
+
+    rng = np.random.default_rng(seed)
+    boot = np.empty((n_boot, len(METRICS), len(labels)))
+    for lo in range(0, n_boot, block):
+        b = min(block, n_boot - lo)
+        idx = rng.integers(0, n, size=(b, n))                        # matriz de índices
+        counts = np.bincount((np.arange(b)[:, None] * n + idx).ravel(), minlength=b * n)
+        S = counts.reshape(b, n).astype(np.float64) @ M
+        boot[lo:lo + b] = _metrics_from_sums(S.reshape(b, *shape))
+
+    q = 100.0 * np.array([alpha / 2, 1 - alpha / 2])
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)  # grupo sem odds: métrica toda NaN
+        low, high = np.nanpercentile(boot, q, axis=0)
+        valid = (~np.isnan(boot)).sum(axis=0)
+        p_pos = np.where(valid > 0, (boot > 0).sum(axis=0) / np.maximum(valid, 1), np.nan)
+
+    n_group = G.sum(axis=0).astype(int)
+    out = pd.DataFrame({
+        "group": np.tile(labels, len(METRICS)),
+        "metric": np.repeat(METRICS, len(labels)),
+        "estimate": point.ravel(),
+        "ci_low": low.ravel(),
+        "ci_high": high.ravel(),
+        "p_gt_0": p_pos.ravel(),
+        "n": np.tile(n_group, len(METRICS)),
+    })
+    order = {g: i for i, g in enumerate(labels)}
+    return out.sort_values(["group", "metric"], key=lambda s: s.map(order) if s.name == "group" else s.map(METRICS.index),
+                           kind="stable").reset_index(drop=True)
+
+
+def ci_wide(table: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """1 linha por grupo p/ uma métrica (print)."""
+    return table[table["metric"] == metric].drop(columns="metric").set_index("group")
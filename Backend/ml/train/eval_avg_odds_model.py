@@ -9,20 +9,43 @@
 # com mesmas colunas/linhas (ALL + por competição/pasta), mas do MODELO.
 #
 # Entrada:
-#   Backend/ml/datasets/matches_enriched.csv
-#   Backend/ml/models/xgb_1x2.json
-#   Backend/ml/models/xgb_1x2_columns.pkl
+#   Backend/ml/datasets/matches_enriched.csv (ou .parquet tipado)
+#   modelo champion do registro (Backend/ml/models/model_registry.py)
+#   ou a versão em BISS_MODEL_VERSION / --model-version
+#   probs do TEST: tabela predictions.parquet da versão (gravada pelo treino;
+#   Backend/ml/models/oos_predictions.py) -- só re-prevê o que faltar
 #
 # Saídas:
 #   Backend/ml/train/predictor_odds_summary.csv
+#   (--by season pool_key odds_band) predictor_odds_summary_by_<g>.csv
+#   Backend/ml/train/predictor_bootstrap_ci.csv (IC 95% por competição; --bootstrap 0 desliga)
 # ------------------------------------------------------------
 
 import os
-import math
-import joblib
+import sys
+import time
 import numpy as np
 import pandas as pd
-import xgboost as xgb
+
+# Pipeline de features fica em ml/datasets (feature_pipeline.py)
+DATASETS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets"))
+if DATASETS_DIR not in sys.path:
+    sys.path.insert(0, DATASETS_DIR)
+
+from feature_cache import FeatureMatrixCache  # noqa: E402
+from feature_pipeline import FeaturePipeline  # noqa: E402
+from train_1x2_xgb import (  # noqa: E402
+    TRAIN_FRAC,
+    VAL_FRAC,
+    feature_spec,
+    load_model_frame,
+    split_by_pool_temporal,
+)
+from model_registry import load_model  # noqa: E402
+from pool_router import PoolRouter  # noqa: E402
+from oos_predictions import exclude_trained, oos_proba  # noqa: E402
+from bootstrap_ci import ALL_LABEL, DEFAULT_N_BOOT, bootstrap_ci, ci_wide  # noqa: E402
+from odds_summary import PREDICTOR_COLUMNS, odds_band, row_aggregates, summary_tables  # noqa: E402
 
 
 # ==========================
@@ -33,85 +56,13 @@ import xgboost as xgb
 # FILTER_COMPETITIONS = {"Brasileirão - Série A Betano"}
 FILTER_COMPETITIONS = None
 
+# agrupamentos extras do resumo (coluna do TEST; odds_band = faixa da odd do favorito)
+EXTRA_GROUPINGS = ("season", "pool_key", "odds_band")
+
 
 # ==========================
 # Utils
 # ==========================
-def entropy_1x2(ph, pd_, pa) -> float:
-    for v in (ph, pd_, pa):
-        if v is None or (isinstance(v, float) and np.isnan(v)):
-            return np.nan
-        if v <= 0:
-            return np.nan
-    s = float(ph + pd_ + pa)
-    if s <= 0:
-        return np.nan
-    ph2, pd2, pa2 = float(ph) / s, float(pd_) / s, float(pa) / s
-    return -(ph2 * math.log(ph2) + pd2 * math.log(pd2) + pa2 * math.log(pa2))
-
-
-def split_by_pool_temporal(df: pd.DataFrame, train_frac=0.80, val_frac=0.10):
-    """Split temporal sem leakage dentro de cada pool_key (igual treino)."""
-    parts_train, parts_val, parts_test = [], [], []
-
-    for pk, g in df.groupby("pool_key", sort=False):
-        g = g.sort_values("date").reset_index(drop=True)
-        n = len(g)
-        if n < 10:
-            parts_train.append(g)
-            continue
-
-        i_train_end = int(n * train_frac)
-        i_val_end = int(n * (train_frac + val_frac))
-
-        if i_train_end >= n - 2:
-            i_train_end = max(1, n - 2)
-        if i_val_end >= n - 1:
-            i_val_end = max(i_train_end + 1, n - 1)
-
-        parts_train.append(g.iloc[:i_train_end].copy())
-        parts_val.append(g.iloc[i_train_end:i_val_end].copy())
-        parts_test.append(g.iloc[i_val_end:].copy())
-
-    train_df = pd.concat(parts_train, ignore_index=True) if parts_train else df.iloc[:0].copy()
-    val_df = pd.concat(parts_val, ignore_index=True) if parts_val else df.iloc[:0].copy()
-    test_df = pd.concat(parts_test, ignore_index=True) if parts_test else df.iloc[:0].copy()
-
-    train_df = train_df.sort_values("date").reset_index(drop=True)
-    val_df = val_df.sort_values("date").reset_index(drop=True)
-    test_df = test_df.sort_values("date").reset_index(drop=True)
-    return train_df, val_df, test_df
-
-
-def build_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Reconstrói features auxiliares exatamente como no treino."""
-    df = df.copy()
-
-    df["has_odds_1x2"] = (~df["imp_ph"].isna() & ~df["imp_pd"].isna() & ~df["imp_pa"].isna()).astype(int)
-    df["has_ou_25"] = (~df["ou_p_over25"].isna() & ~df["ou_p_under25"].isna()).astype(int)
-
-    df["abs_elo_diff"] = df["elo_diff"].abs()
-    df["abs_imp_ph_minus_pa"] = df["imp_ph_minus_pa"].abs()
-
-    df["imp_entropy_1x2"] = [
-        entropy_1x2(ph, pd_, pa)
-        for ph, pd_, pa in zip(df["imp_ph"].values, df["imp_pd"].values, df["imp_pa"].values)
-    ]
-
-    df["fav_prob"] = np.nan
-    m_odds = df["has_odds_1x2"] == 1
-    if m_odds.any():
-        df.loc[m_odds, "fav_prob"] = np.maximum(df.loc[m_odds, "imp_ph"].values, df.loc[m_odds, "imp_pa"].values)
-
-    df["draw_edge"] = np.nan
-    df.loc[m_odds, "draw_edge"] = df.loc[m_odds, "imp_pd"].values - df.loc[m_odds, "fav_prob"].values
-
-    df["balanced_flag"] = 0
-    df.loc[m_odds, "balanced_flag"] = (df.loc[m_odds, "fav_prob"].values < 0.45).astype(int)
-
-    return df
-
-
 def _ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
@@ -137,85 +88,63 @@ def _safe_quantile(x: pd.Series, q: float) -> float:
     return float(x.quantile(q))
 
 
+def load_test_frame(data_path: str, pipeline: FeaturePipeline) -> pd.DataFrame:
+    """
+    Frame do TEST (mesmas linhas do treino). Usa o frame do cache de matrizes do
+    treino quando a chave e as colunas batem com o modelo; senão refaz features + split.
+    As probs vêm de oos_predictions.oos_proba (tabela da versão; só re-prevê o que falta).
+    """
+    cache = FeatureMatrixCache()
+    if cache.enabled:
+        mats = cache.load(cache.key_for(data_path, feature_spec(FILTER_COMPETITIONS)))
+        if mats is not None and list(mats["columns"]) == pipeline.columns:
+            print("[INFO] TEST do cache de matrizes de features")
+            return mats["test_frame"]
+
+    # frame e split do treino (train_1x2_xgb.py): mesma ordenação, mesmas features
+    df = load_model_frame(data_path)
+
+    # (opcional) filtro de competição no dataset
+    if FILTER_COMPETITIONS is not None:
+        df = df[df["competition"].astype(str).isin(set(FILTER_COMPETITIONS))].reset_index(drop=True)
+
+    _, _, test_df = split_by_pool_temporal(df, train_frac=TRAIN_FRAC, val_frac=VAL_FRAC)
+    if len(test_df) == 0:
+        raise RuntimeError("TEST vazio. Verifique o split por pool_key / filtro de competição.")
+
+    return test_df
+
+
 # ==========================
 # Main
 # ==========================
-def main():
+def main(model_version: str = None, use_router: bool = False, extra_groupings: tuple = (), n_boot: int = DEFAULT_N_BOOT):
     THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
     ML_DIR = os.path.abspath(os.path.join(THIS_DIR, ".."))  # .../Backend/ml
 
     DATA_PATH = os.path.join(ML_DIR, "datasets", "matches_enriched.csv")
-    MODELS_DIR = os.path.join(ML_DIR, "models")
-
-    MODEL_PATH = os.path.join(MODELS_DIR, "xgb_1x2.json")
-    COLS_PATH = os.path.join(MODELS_DIR, "xgb_1x2_columns.pkl")
 
     OUT_PRED_SUMMARY = os.path.join(THIS_DIR, "predictor_odds_summary.csv")
+    OUT_BOOTSTRAP = os.path.join(THIS_DIR, "predictor_bootstrap_ci.csv")
 
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f"Dataset não encontrado: {DATA_PATH}")
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Modelo não encontrado: {MODEL_PATH}")
-    if not os.path.exists(COLS_PATH):
-        raise FileNotFoundError(f"Colunas não encontradas: {COLS_PATH}")
-
-    df = pd.read_csv(DATA_PATH)
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df = df.dropna(subset=["date", "target_1x2"]).copy()
-    df["target_1x2"] = df["target_1x2"].astype(int)
 
-    # (opcional) filtro de competição no dataset
-    if FILTER_COMPETITIONS is not None:
-        df = df[df["competition"].astype(str).isin(set(FILTER_COMPETITIONS))].copy()
+    # champion do registro (ou versão fixada: argumento / env BISS_MODEL_VERSION)
+    model = load_model(model_version)
+    print(f"[INFO] Modelo: {model.version}")
+    test_df = exclude_trained(model, load_test_frame(DATA_PATH, model.pipeline), "TEST")
 
-    df = df.sort_values(["pool_key", "date"]).reset_index(drop=True)
+    router = PoolRouter.load() if use_router else None
+    if use_router and router is None:
+        raise FileNotFoundError("Manifesto do roteador não encontrado (rode train_pool_specialists.py)")
 
-    # features iguais ao treino
-    df = build_features(df)
-
-    # split igual treino (pega TEST)
-    _, _, test_df = split_by_pool_temporal(df, train_frac=0.80, val_frac=0.10)
-    if len(test_df) == 0:
-        raise RuntimeError("TEST vazio. Verifique o split por pool_key / filtro de competição.")
-
-    # mesmas cols do treino (num + one-hot)
-    num_cols = [
-        "elo_home_pre", "elo_away_pre", "elo_diff", "abs_elo_diff",
-        "form_pts_home_3", "form_pts_home_5",
-        "form_pts_away_3", "form_pts_away_5",
-        "gd_home_5", "gd_away_5",
-        "odds_h", "odds_d", "odds_a",
-        "imp_ph", "imp_pd", "imp_pa",
-        "imp_overround_1x2",
-        "imp_ph_minus_pa",
-        "abs_imp_ph_minus_pa",
-        "imp_entropy_1x2",
-        "fav_prob",
-        "draw_edge",
-        "balanced_flag",
-        "ou_p_over25", "ou_p_under25",
-        "ou_overround",
-        "ou_p_over_minus_under",
-        "has_odds_1x2",
-        "has_ou_25",
-    ]
-    cat_cols = ["pool_key", "competition"]
-
-    def make_X(d: pd.DataFrame) -> pd.DataFrame:
-        Xn = d[num_cols].copy()
-        Xc = pd.get_dummies(d[cat_cols].astype(str), prefix=cat_cols, dummy_na=False)
-        return pd.concat([Xn, Xc], axis=1)
-
-    X_test = make_X(test_df)
-
-    all_cols = joblib.load(COLS_PATH)
-    X_test = X_test.reindex(columns=all_cols, fill_value=0)
-
-    booster = xgb.Booster()
-    booster.load_model(MODEL_PATH)
-
-    dtest = xgb.DMatrix(X_test.values.astype(np.float32))
-    prob = booster.predict(dtest)
+    if router is not None:
+        # especialistas por pool (TEST do global, mesmas linhas)
+        print(f"[INFO] Roteador por pool: {router.describe()}")
+        prob = router.predict_proba(test_df)
+    else:
+        prob = oos_proba(model, test_df, "test")
     pred = np.argmax(prob, axis=1)
 
     out = test_df.copy().reset_index(drop=True)
@@ -272,6 +201,24 @@ def main():
     # ============================================================
     # Assertividade: modelo vs casa no MESMO subset has_odds_1x2=1
     # ============================================================
+    # IC por bootstrap (todas as reamostras de uma vez; ver bootstrap_ci.py)
+    ci = None
+    if n_boot > 0:
+        t_boot = time.perf_counter()
+        ci = bootstrap_ci(
+            prob, out["target_1x2"].to_numpy(), out[["odds_h", "odds_d", "odds_a"]].to_numpy(dtype=float),
+            groups=out["competition"].astype(str).to_numpy(),
+            has_odds=(out["has_odds_1x2"] == 1).to_numpy(),
+            n_boot=n_boot,
+        )
+        t_boot = time.perf_counter() - t_boot
+
+    def ci_text(metric: str, scale: float = 1.0, unit: str = "") -> str:
+        if ci is None:
+            return ""
+        r = ci_wide(ci, metric).loc[ALL_LABEL]
+        return f"  (IC 95%: {r['ci_low']*scale:.2f}{unit} .. {r['ci_high']*scale:.2f}{unit})"
+
     subset = out[out["has_odds_1x2"] == 1].copy()
     if len(subset):
         model_acc = float(subset["model_correct"].mean())
@@ -281,124 +228,65 @@ def main():
         print("[ACCURACY] TEST (somente has_odds_1x2=1) — MODELO vs CASA")
         print("=" * 80)
         print(f"n={len(subset)} ({len(subset)/len(out)*100:.1f}% do TEST)")
-        print(f"House acc: {house_acc*100:.2f}%")
-        print(f"Model acc: {model_acc*100:.2f}%")
-        print(f"Delta:     {(model_acc-house_acc)*100:.2f} pp")
+        print(f"House acc: {house_acc*100:.2f}%{ci_text('house_acc_odds', 100, '%')}")
+        print(f"Model acc: {model_acc*100:.2f}%{ci_text('model_acc_odds', 100, '%')}")
+        print(f"Delta:     {(model_acc-house_acc)*100:.2f} pp{ci_text('delta_acc_pp', 1, ' pp')}")
     else:
         print("\n[WARN] TEST não possui linhas com has_odds_1x2=1. Não há baseline de casa para comparar.")
 
+    if ci is not None:
+        print("\n" + "=" * 80)
+        print(f"[BOOTSTRAP] TEST — {n_boot} reamostras em {t_boot:.2f}s (IC 95% percentil)")
+        print("=" * 80)
+        print(ci_wide(ci, "delta_acc_pp")[["estimate", "ci_low", "ci_high", "p_gt_0", "n"]]
+              .round(3).to_string(header=["delta_pp", "low", "high", "P(>0)", "n"]))
+        print()
+        print(ci_wide(ci, "roi_model")[["estimate", "ci_low", "ci_high", "p_gt_0"]]
+              .round(4).to_string(header=["roi_model", "low", "high", "P(>0)"]))
+        _ensure_dir(os.path.dirname(OUT_BOOTSTRAP))
+        ci.to_csv(OUT_BOOTSTRAP, index=False, encoding="utf-8")
+        print("[OK] IC por bootstrap salvo em:", OUT_BOOTSTRAP)
+
     # ============================================================
-    # Gera CSV espelho predictor_odds_summary.csv
+    # Gera CSV espelho predictor_odds_summary.csv (motor único: odds_summary.py)
     # - Linhas: __ALL__ + por competition (campo do dataset)
     # - Colunas: espelho do house_odds_summary + extras úteis do modelo
+    # - --by season/pool_key/odds_band: tabelas extras no mesmo groupby
     # ============================================================
-    def summarize_predictor(frame: pd.DataFrame) -> dict:
-        frame = frame.copy()
-
-        # métricas básicas
-        rows_read = int(len(frame))
-        rows_with_odds = int((frame["has_odds_1x2"] == 1).sum())
-        rows_with_result = int(len(frame))  # aqui sempre tem target
-
-        d = {
-            "rows_read": rows_read,
-            "rows_with_odds": rows_with_odds,
-            "rows_with_result": rows_with_result,
-        }
-
-        m2 = frame["has_odds_1x2"] == 1
-
-        # médias de odds e probs (espelho do house_odds_summary)
-        if m2.any():
-            d["mean_odd_home"] = _safe_mean(frame.loc[m2, "odds_h"])
-            d["mean_odd_draw"] = _safe_mean(frame.loc[m2, "odds_d"])
-            d["mean_odd_away"] = _safe_mean(frame.loc[m2, "odds_a"])
-
-            all_odds = pd.concat(
-                [frame.loc[m2, "odds_h"], frame.loc[m2, "odds_d"], frame.loc[m2, "odds_a"]],
-                axis=0,
-            ).dropna()
-            d["mean_odd_universe"] = float(all_odds.mean()) if len(all_odds) else float("nan")
-
-            fav_odds = frame.loc[m2, ["odds_h", "odds_d", "odds_a"]].min(axis=1).dropna()
-            d["mean_odd_favorite"] = float(fav_odds.mean()) if len(fav_odds) else float("nan")
-
-            # probs raw = 1/odd (mesma interpretação do house report)
-            oh = pd.to_numeric(frame.loc[m2, "odds_h"], errors="coerce")
-            od = pd.to_numeric(frame.loc[m2, "odds_d"], errors="coerce")
-            oa = pd.to_numeric(frame.loc[m2, "odds_a"], errors="coerce")
-
-            iph = (1.0 / oh).replace([np.inf, -np.inf], np.nan)
-            ipd = (1.0 / od).replace([np.inf, -np.inf], np.nan)
-            ipa = (1.0 / oa).replace([np.inf, -np.inf], np.nan)
-
-            d["mean_imp_prob_home_raw"] = float(iph.mean()) if len(iph.dropna()) else float("nan")
-            d["mean_imp_prob_draw_raw"] = float(ipd.mean()) if len(ipd.dropna()) else float("nan")
-            d["mean_imp_prob_away_raw"] = float(ipa.mean()) if len(ipa.dropna()) else float("nan")
-
-            ip_all = pd.concat([iph, ipd, ipa], axis=0).dropna()
-            d["mean_imp_prob_universe_raw"] = float(ip_all.mean()) if len(ip_all) else float("nan")
-
-            # normalizadas + overround (já do dataset)
-            d["mean_prob_home_norm"] = _safe_mean(frame.loc[m2, "imp_ph"])
-            d["mean_prob_draw_norm"] = _safe_mean(frame.loc[m2, "imp_pd"])
-            d["mean_prob_away_norm"] = _safe_mean(frame.loc[m2, "imp_pa"])
-            d["mean_overround"] = _safe_mean(frame.loc[m2, "imp_overround_1x2"])
-        else:
-            # mantém colunas presentes
-            d["mean_odd_home"] = float("nan")
-            d["mean_odd_draw"] = float("nan")
-            d["mean_odd_away"] = float("nan")
-            d["mean_odd_universe"] = float("nan")
-            d["mean_odd_favorite"] = float("nan")
-            d["mean_imp_prob_home_raw"] = float("nan")
-            d["mean_imp_prob_draw_raw"] = float("nan")
-            d["mean_imp_prob_away_raw"] = float("nan")
-            d["mean_imp_prob_universe_raw"] = float("nan")
-            d["mean_prob_home_norm"] = float("nan")
-            d["mean_prob_draw_norm"] = float("nan")
-            d["mean_prob_away_norm"] = float("nan")
-            d["mean_overround"] = float("nan")
-
-        # "acertos" do modelo (espelho do "house_correct" no report da casa)
-        d["model_correct"] = int(frame["model_correct"].sum())
-        d["model_accuracy"] = float(frame["model_correct"].mean()) if len(frame) else float("nan")
-
-        # baseline (casa no MESMO frame, útil)
-        if rows_with_odds > 0:
-            # para ficar alinhado, mede house_accuracy apenas nas linhas com odds completas
-            hh = frame[m2]
-            d["house_correct"] = int(hh["house_correct"].sum())
-            d["house_accuracy"] = float(hh["house_correct"].mean()) if len(hh) else float("nan")
-        else:
-            d["house_correct"] = 0
-            d["house_accuracy"] = float("nan")
-
-        # odds do pick do modelo (extra)
-        picked = frame.dropna(subset=["picked_odds"])
-        d["picked_odds_mean"] = _safe_mean(picked["picked_odds"]) if len(picked) else float("nan")
-        d["picked_odds_median"] = _safe_median(picked["picked_odds"]) if len(picked) else float("nan")
-        d["picked_odds_p25"] = _safe_quantile(picked["picked_odds"], 0.25) if len(picked) else float("nan")
-        d["picked_odds_p75"] = _safe_quantile(picked["picked_odds"], 0.75) if len(picked) else float("nan")
-
-        return d
-
-    rows = []
-    rows.append({"competition_folder": "__ALL__", **summarize_predictor(out)})
-
-    # Por competition (campo do dataset) — para espelhar no nível que você treina/avalia
-    for comp, g in out.groupby("competition", dropna=False):
-        rows.append({"competition_folder": str(comp), **summarize_predictor(g)})
-
-    pred_df = pd.DataFrame(rows)
+    out["odds_band"] = odds_band(out[["odds_h", "odds_d", "odds_a"]].min(axis=1))
+    groupings = {"competition_folder": "competition", **{g: g for g in extra_groupings}}
+    rows = row_aggregates(
+        out,
+        keys=list(dict.fromkeys(groupings.values())),
+        model_pick=out["pred"].to_numpy(),
+        has_odds=(out["has_odds_1x2"] == 1).to_numpy(),
+        norm_cols=["imp_ph", "imp_pd", "imp_pa", "imp_overround_1x2"],
+    )
+    tables = summary_tables(rows, groupings, PREDICTOR_COLUMNS)
 
     _ensure_dir(os.path.dirname(OUT_PRED_SUMMARY))
-    pred_df.to_csv(OUT_PRED_SUMMARY, index=False, encoding="utf-8")
+    tables["competition_folder"].to_csv(OUT_PRED_SUMMARY, index=False, encoding="utf-8")
 
     print("\n" + "-" * 90)
     print("[OK] predictor_odds_summary.csv salvo em:", OUT_PRED_SUMMARY)
+    for g in extra_groupings:
+        path = OUT_PRED_SUMMARY.replace(".csv", f"_by_{g}.csv")
+        tables[g].to_csv(path, index=False, encoding="utf-8")
+        print(f"[OK] Resumo por {g} salvo em:", path)
     print("-" * 90)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Avalia o modelo 1X2 no TEST (odds médias + accuracy).")
+    ap.add_argument("--model-version", default=None, help="versão do registro (padrão: champion)")
+    ap.add_argument("--router", action="store_true", help="avalia o roteador de especialistas por pool")
+    ap.add_argument("--by", nargs="*", default=[], choices=list(EXTRA_GROUPINGS),
+                    help="resumos extras (predictor_odds_summary_by_<g>.csv)")
+    ap.add_argument("--bootstrap", type=int, default=DEFAULT_N_BOOT,
+                    help="reamostras p/ os IC de accuracy/logloss/delta/ROI (0 = desliga)")
+    args = ap.parse_args()
+
+    main(model_version=args.model_version, use_router=args.router, extra_groupings=tuple(args.by),
+         n_boot=args.bootstrap)
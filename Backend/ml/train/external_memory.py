@@ -0,0 +1,238 @@
+# Backend/ml/train/external_memory.py
+# ------------------------------------------------------------
+# Treino em memória externa (dataset maior que a RAM)
+#
+# - 1ª passada leve: só pool_key/competition/date/target_1x2 -> split
+#   temporal POR POOL de cada linha do arquivo (mesma regra do
+#   split_by_pool_temporal), pesos por classe do TRAIN e pipeline de
+#   features ajustado (categorias vistas); check_split confere o split
+#   contra o split em memória (mesmas linhas em TRAIN/VAL/TEST)
+# - Depois um xgb.DataIter por split lê o dataset em lotes (iter_enriched:
+#   row groups do Parquet ou chunks do CSV), aplica add_model_features +
+#   FeaturePipeline.transform no lote e entrega só as linhas daquele split
+# - "extmem": ExtMemQuantileDMatrix (páginas quantizadas em disco, em
+#   Backend/ml/train/.cache/extmem/); "quantile": QuantileDMatrix
+#   (quantizado em memória, ~1 byte por valor em vez de 4)
+#
+# Pico de memória ~ tamanho do lote (+ colunas leves da 1ª passada),
+# não o dataset inteiro. Usado por train_1x2_xgb.py --stream.
+# ------------------------------------------------------------
+
+import os
+import sys
+import shutil
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+DATASETS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets"))
+if DATASETS_DIR not in sys.path:
+    sys.path.insert(0, DATASETS_DIR)
+
+from dataset_io import ROW_GROUP_ROWS, enriched_columns, iter_enriched, read_enriched  # noqa: E402
+from feature_pipeline import NUM_COLS, FeaturePipeline, add_model_features  # noqa: E402
+from train_1x2_xgb import (  # noqa: E402
+    NEEDED_COLS,
+    TRAIN_FRAC,
+    VAL_FRAC,
+    class_weights,
+    order_model_frame,
+    split_bounds,
+    split_by_pool_temporal,
+)
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+EXTMEM_CACHE_DIR = os.path.join(THIS_DIR, ".cache", "extmem")
+
+STREAM_MODES = ("extmem", "quantile")
+SPLIT_IDS = {"train": 0, "val": 1, "test": 2}
+
+SMALL_POOL = 10  # pools menores vão inteiros p/ o TRAIN (igual ao split em memória)
+
+
+# =========================
+# 1ª passada: split por linha do arquivo
+# =========================
+
+def plan_split(data_path: str, train_frac=TRAIN_FRAC, val_frac=VAL_FRAC) -> dict:
+    """
+    Lê só as colunas leves e decide o split de cada linha (na ordem do arquivo).
+    Retorna {"split": int8[n_linhas] (-1 = descartada), "pipeline", "weights", "info"}.
+    """
+    light = read_enriched(data_path, columns=["pool_key", "competition", "date", "target_1x2"], verbose=False)
+    dates = pd.to_datetime(light["date"], errors="coerce")
+    valid = (dates.notna() & light["target_1x2"].notna()).values
+
+    split = np.full(len(light), -1, dtype=np.int8)
+    rows = np.flatnonzero(valid)
+    pools = light["pool_key"].astype(str).values[rows]
+    d = dates.values[rows]
+
+    # ordem cronológica dentro de cada pool
+    srt = np.lexsort((d, pools))
+    order = rows[srt]
+    _, starts, counts = np.unique(pools[srt], return_index=True, return_counts=True)
+    for start, n in zip(starts, counts):
+        block = order[start:start + n]
+        if n < SMALL_POOL:
+            split[block] = SPLIT_IDS["train"]
+            continue
+        i_train_end, i_val_end = split_bounds(int(n), train_frac, val_frac)
+        split[block[:i_train_end]] = SPLIT_IDS["train"]
+        split[block[i_train_end:i_val_end]] = SPLIT_IDS["val"]
+        split[block[i_val_end:]] = SPLIT_IDS["test"]
+
+    check_split(light, split, train_frac, val_frac)
+
+    y_train = light["target_1x2"].values[split == SPLIT_IDS["train"]].astype(int)
+    counts_train, w = class_weights(y_train)
+
+    def end_date(name):
+        m = split == SPLIT_IDS[name]
+        return str(pd.Timestamp(dates.values[m].max()).date()) if m.any() else None
+
+    info = {
+        "n_rows": int(valid.sum()),
+        "date_min": str(pd.Timestamp(d.min()).date()),
+        "date_max": str(pd.Timestamp(d.max()).date()),
+        "split": {
+            "strategy": "temporal_by_pool_key",
+            "train_rows": int((split == SPLIT_IDS["train"]).sum()),
+            "val_rows": int((split == SPLIT_IDS["val"]).sum()),
+            "test_rows": int((split == SPLIT_IDS["test"]).sum()),
+            "train_end_date": end_date("train"),
+            "val_end_date": end_date("val"),
+            "test_end_date": end_date("test"),
+        },
+        "class_counts_train": {str(k): int(v) for k, v in counts_train.items()},
+        "class_weights_train": {str(k): float(v) for k, v in w.items()},
+    }
+
+    pipeline = FeaturePipeline.fit(light.loc[valid])
+    return {"split": split, "pipeline": pipeline, "weights": w, "info": info}
+
+
+def check_split(light: pd.DataFrame, split: np.ndarray, train_frac=TRAIN_FRAC, val_frac=VAL_FRAC):
+    """
+    Confere o split por linha contra o split em memória (order_model_frame +
+    split_by_pool_temporal) nas colunas leves: mesmas linhas em cada split,
+    senão RuntimeError (o --stream treinaria/avaliaria outro TEST).
+    """
+    df = order_model_frame(light.assign(_row=np.arange(len(light))))
+    expected = np.full(len(light), -1, dtype=np.int8)
+    for name, part in zip(("train", "val", "test"), split_by_pool_temporal(df, train_frac, val_frac)):
+        expected[part["_row"].to_numpy()] = SPLIT_IDS[name]
+
+    diff = np.flatnonzero(expected != split)
+    if len(diff):
+        raise RuntimeError(
+            f"Split por linha difere do split em memória em {len(diff)} linhas "
+            f"(ex.: linhas {diff[:5].tolist()} -> {split[diff[:5]].tolist()} vs {expected[diff[:5]].tolist()})"
+        )
+    print(f"[OK] Split por linha = split em memória ({int((split >= 0).sum())} linhas)")
+
+
+# =========================
+# DataIter: lotes do dataset -> linhas de um split
+# =========================
+
+class SplitBatchIter(xgb.DataIter):
+    def __init__(
+        self,
+        data_path: str,
+        columns: list,
+        split: np.ndarray,
+        split_id: int,
+        pipeline: FeaturePipeline,
+        weights: Optional[dict],
+        batch_rows: int,
+        cache_prefix: Optional[str] = None,
+    ):
+        self.data_path = data_path
+        self.columns = columns
+        self.split = split
+        self.split_id = split_id
+        self.pipeline = pipeline
+        self.weights = weights
+        self.batch_rows = batch_rows
+        self._batches = None
+        self._offset = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._batches = None
+        self._offset = 0
+
+    def next(self, input_data) -> bool:
+        if self._batches is None:
+            self._batches = iter_enriched(self.data_path, self.columns, self.batch_rows)
+
+        for chunk in self._batches:
+            lo = self._offset
+            self._offset += len(chunk)
+            mask = self.split[lo:self._offset] == self.split_id
+            if not mask.any():
+                continue
+
+            b = chunk.loc[mask].reset_index(drop=True)
+            add_model_features(b)
+            y = b["target_1x2"].values.astype(int)
+            kwargs = {}
+            if self.weights is not None:
+                kwargs["weight"] = np.array([self.weights[int(v)] for v in y], dtype=float)
+            input_data(data=self.pipeline.transform(b), label=y, **kwargs)
+            return True
+        return False
+
+
+def build_stream_matrices(
+    data_path: str,
+    mode: str = "extmem",
+    batch_rows: int = ROW_GROUP_ROWS,
+    cache_dir: str = EXTMEM_CACHE_DIR,
+) -> dict:
+    """
+    Mesmo contrato do build_feature_matrices (train/val/test, columns, info),
+    mas montado em lotes. test_frame = None (não há frame inteiro em memória).
+    """
+    if mode not in STREAM_MODES:
+        raise ValueError(f"mode deve ser um de {STREAM_MODES}")
+
+    available = set(enriched_columns(data_path))
+    missing = NEEDED_COLS - available
+    if missing:
+        raise RuntimeError(f"Dataset está faltando colunas: {missing}")
+    columns = sorted(NEEDED_COLS | (set(NUM_COLS) & available))
+
+    plan = plan_split(data_path)
+    if plan["info"]["split"]["val_rows"] == 0 or plan["info"]["split"]["test_rows"] == 0:
+        raise RuntimeError("Split gerou VAL/TEST vazios. Verifique se há linhas suficientes por pool_key.")
+
+    if mode == "extmem":
+        shutil.rmtree(cache_dir, ignore_errors=True)  # páginas de um treino anterior
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_iter(name: str) -> SplitBatchIter:
+        return SplitBatchIter(
+            data_path, columns, plan["split"], SPLIT_IDS[name], plan["pipeline"],
+            plan["weights"] if name == "train" else None,
+            batch_rows,
+            cache_prefix=os.path.join(cache_dir, name) if mode == "extmem" else None,
+        )
+
+    dmatrix_cls = xgb.ExtMemQuantileDMatrix if mode == "extmem" else xgb.QuantileDMatrix
+    dtrain = dmatrix_cls(make_iter("train"))
+    dval = dmatrix_cls(make_iter("val"), ref=dtrain)
+    dtest = dmatrix_cls(make_iter("test"), ref=dtrain)
+
+    print(f"[INFO] Matrizes em lotes ({mode}, {batch_rows} linhas/lote): "
+          f"train={dtrain.num_row()} val={dval.num_row()} test={dtest.num_row()}")
+
+    return {
+        "train": dtrain, "val": dval, "test": dtest,
+        "columns": plan["pipeline"].columns, "info": plan["info"],
+        "test_frame": None, "pipeline": plan["pipeline"],
+    }
@@ -0,0 +1,119 @@
+# Backend/ml/train/feature_cache.py
+# ------------------------------------------------------------
+# Cache das matrizes de features (train/val/test) em formato binário do XGBoost
+#
+# - Chave: hash do dataset (conteúdo do matches_enriched.csv) + versão do
+#   schema de features + colunas/split/filtro usados
+# - Guarda: DMatrix binário por split (features float32 + label + peso),
+#   lista de colunas, info do split (datas, contagens) e o frame do TEST
+#   (odds/competição, usado pelo eval)
+# - Hit -> treino/eval pulam leitura do CSV, features, one-hot e reindex
+#
+# Cache em: Backend/ml/train/.cache/features/<chave>/
+# Obs: QuantileDMatrix não é serializável; o hist do xgboost.train
+#      quantiza o DMatrix carregado normalmente.
+# ------------------------------------------------------------
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+DATASETS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets"))
+if DATASETS_DIR not in sys.path:
+    sys.path.insert(0, DATASETS_DIR)
+
+from match_cache import HAS_ARROW, file_digest  # noqa: E402
+
+
+# Suba quando mudar o jeito de montar features ou o split (entropia, flags, one-hot, ordenação...)
+FEATURE_SCHEMA_VERSION = 3
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(THIS_DIR, ".cache", "features")
+
+SPLITS = ("train", "val", "test")
+
+
+class FeatureMatrixCache:
+    """
+    Uso:
+        cache = FeatureMatrixCache()
+        key = cache.key_for(DATA_PATH, {"num_cols": ..., "cat_cols": ..., ...})
+        hit = cache.load(key)        # None em miss
+        ...
+        cache.save(key, {"train": dtrain, ...}, columns, info, test_frame)
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled and HAS_ARROW  # frame do TEST vai em Parquet
+
+    def key_for(self, data_path: str, spec: dict) -> str:
+        payload = {
+            "schema": FEATURE_SCHEMA_VERSION,
+            "dataset_sha1": file_digest(data_path),
+            "spec": spec,
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Optional[dict]:
+        """{"train"/"val"/"test": DMatrix, "columns": [...], "info": {...}, "test_frame": DataFrame}"""
+        if not self.enabled:
+            return None
+        d = self._dir(key)
+        meta_path = os.path.join(d, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("schema") != FEATURE_SCHEMA_VERSION:
+                return None
+            out = {s: xgb.DMatrix(os.path.join(d, f"{s}.buffer")) for s in SPLITS}
+            out["columns"] = meta["columns"]
+            out["info"] = meta.get("info") or {}
+            out["test_frame"] = pd.read_parquet(os.path.join(d, "test_frame.parquet"))
+            return out
+        except Exception:
+            return None
+
+    def save(
+        self,
+        key: str,
+        dmats: Dict[str, xgb.DMatrix],
+        columns: List[str],
+        info: dict,
+        test_frame: pd.DataFrame,
+    ):
+        if not self.enabled:
+            return
+        d = self._dir(key)
+        tmp = d + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp, exist_ok=True)
+
+        for s in SPLITS:
+            dmats[s].save_binary(os.path.join(tmp, f"{s}.buffer"))
+        test_frame.reset_index(drop=True).to_parquet(os.path.join(tmp, "test_frame.parquet"), index=False)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"schema": FEATURE_SCHEMA_VERSION, "columns": list(columns), "info": info},
+                      f, ensure_ascii=False, indent=2, default=str)
+
+        # meta.json por último + rename do diretório: cache nunca fica pela metade
+        shutil.rmtree(d, ignore_errors=True)
+        os.replace(tmp, d)
+
+
+def labels_of(dmat: xgb.DMatrix) -> np.ndarray:
+    return dmat.get_label().astype(int)
@@ -0,0 +1,250 @@
+# Backend/ml/train/odds_summary.py
+# ------------------------------------------------------------
+# Motor único dos resumos casa x modelo
+# (house_odds_summary.csv e predictor_odds_summary.csv)
+#
+# Entrada: 1 frame com chave(s) de grupo + odds H/D/A + target (+ pick do
+# modelo, opcional). Pick da casa = menor odd do trio (empate -> 1º).
+#
+# - row_aggregates(): a ÚNICA passada pelas linhas -> colunas somáveis
+#   (contagens, somas de odds/probs, acertos) por jogo
+# - aggregate(): 1 groupby.sum p/ todas as métricas; o resultado é parcial
+#   somável (merge_aggregates junta arquivos/lotes; rollup gera grupos
+#   mais grossos e o __ALL__ sem voltar às linhas)
+# - summary_tables(): várias agregações (competição, temporada, pool, faixa
+#   de odd...) saem de 1 groupby na combinação das chaves + rollups
+# - Quantis do pick do modelo (não somáveis): 1 groupby.quantile por agrupamento
+# ------------------------------------------------------------
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+ALL_LABEL = "__ALL__"
+
+# faixas da odd do favorito (menor odd do trio)
+ODDS_BANDS = [1.0, 1.5, 2.0, 2.5, 3.0, np.inf]
+
+PICKED_QUANTILES = {"picked_odds_median": 0.50, "picked_odds_p25": 0.25, "picked_odds_p75": 0.75}
+
+COUNT_COLS = ["n_rows", "n_odds", "n_result", "n_odds_result", "house_correct", "n_model", "model_correct", "n_picked"]
+SUM_COLS = [
+    "sum_oh", "sum_od", "sum_oa", "sum_fav",
+    "sum_iph", "sum_ipd", "sum_ipa",
+    "sum_ph", "sum_pd", "sum_pa", "sum_overround",
+    "sum_picked",
+]
+
+# colunas de cada CSV (na ordem); rows_with_result muda de sentido entre os dois:
+# casa = jogos com odds + placar (onde a casa é medida); modelo = jogos com target
+HOUSE_COLUMNS = [
+    "rows_read", "rows_with_odds", "rows_with_result:n_odds_result", "house_correct",
+    "mean_odd_home", "mean_odd_draw", "mean_odd_away", "mean_odd_universe", "mean_odd_favorite",
+    "mean_imp_prob_home_raw", "mean_imp_prob_draw_raw", "mean_imp_prob_away_raw", "mean_imp_prob_universe_raw",
+    "mean_prob_home_norm", "mean_prob_draw_norm", "mean_prob_away_norm", "mean_overround",
+    "house_accuracy",
+]
+PREDICTOR_COLUMNS = [
+    "rows_read", "rows_with_odds", "rows_with_result:n_result",
+    "mean_odd_home", "mean_odd_draw", "mean_odd_away", "mean_odd_universe", "mean_odd_favorite",
+    "mean_imp_prob_home_raw", "mean_imp_prob_draw_raw", "mean_imp_prob_away_raw", "mean_imp_prob_universe_raw",
+    "mean_prob_home_norm", "mean_prob_draw_norm", "mean_prob_away_norm", "mean_overround",
+    "model_correct", "model_accuracy", "house_correct", "house_accuracy",
+    "picked_odds_mean", "picked_odds_median", "picked_odds_p25", "picked_odds_p75",
+]
+
+
+def odds_band(fav_odds) -> pd.Categorical:
+    """Odd do favorito -> faixa ('1.50-2.00', ...)."""
+    labels = [f"{lo:.2f}-{hi:.2f}" if np.isfinite(hi) else f"{lo:.2f}+" for lo, hi in zip(ODDS_BANDS[:-1], ODDS_BANDS[1:])]
+    return pd.cut(np.asarray(fav_odds, dtype=float), ODDS_BANDS, labels=labels, right=False)
+
+
+# =========================
+# 1 passada pelas linhas
+# =========================
+
+def row_aggregates(
+    frame: pd.DataFrame,
+    keys: Sequence[str] = (),
+    odds_cols: Sequence[str] = ("odds_h", "odds_d", "odds_a"),
+    target_col: str = "target_1x2",
+    model_pick: Optional[np.ndarray] = None,
+    has_odds: Optional[np.ndarray] = None,
+    norm_cols: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Colunas somáveis por jogo (+ as chaves de grupo e a odd do pick do modelo).
+    - target: 0/1/2; -1 ou NaN = sem resultado
+    - has_odds: padrão = trio completo; médias de odds/probs só nessas linhas
+    - norm_cols: (ph, pd, pa, overround) já normalizados no dataset; sem eles,
+      normaliza 1/odd aqui
+    - model_pick: 0/1/2 por jogo (-1 = sem pick); None = só casa
+    """
+    n = len(frame)
+    odds = np.column_stack([pd.to_numeric(frame[c], errors="coerce").to_numpy(dtype=float) for c in odds_cols])
+    ok = ~np.isnan(odds).any(axis=1) if has_odds is None else np.asarray(has_odds, dtype=bool)
+    y = pd.to_numeric(frame[target_col], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    known = y >= 0
+
+    o = np.where(ok[:, None], odds, 0.0)
+    with np.errstate(divide="ignore"):
+        ip = np.where(ok[:, None], 1.0 / np.where(ok[:, None], odds, 1.0), 0.0)
+    if norm_cols is not None:
+        norm = np.column_stack([pd.to_numeric(frame[c], errors="coerce").to_numpy(dtype=float) for c in norm_cols])
+        norm = np.where(ok[:, None], norm, 0.0)
+    else:
+        s = ip.sum(axis=1)
+        safe = np.where(s > 0, s, 1.0)
+        norm = np.column_stack([ip / safe[:, None], np.where(ok, s - 1.0, 0.0)])
+
+    house_pick = np.where(ok, np.argmin(np.where(ok[:, None], odds, np.inf), axis=1), -1)
+    odds_result = ok & known
+
+    cols: Dict[str, np.ndarray] = {k: frame[k].to_numpy() for k in keys}
+    cols.update({
+        "n_rows": np.ones(n, dtype=np.int64),
+        "n_odds": ok.astype(np.int64),
+        "n_result": known.astype(np.int64),
+        "n_odds_result": odds_result.astype(np.int64),
+        "house_correct": (odds_result & (house_pick == y)).astype(np.int64),
+        "sum_oh": o[:, 0], "sum_od": o[:, 1], "sum_oa": o[:, 2],
+        "sum_fav": np.where(ok, o.min(axis=1, initial=np.inf, where=ok[:, None]), 0.0),
+        "sum_iph": ip[:, 0], "sum_ipd": ip[:, 1], "sum_ipa": ip[:, 2],
+        "sum_ph": norm[:, 0], "sum_pd": norm[:, 1], "sum_pa": norm[:, 2], "sum_overround": norm[:, 3],
+    })
+
+    if model_pick is None:
+        pick = np.full(n, -1, dtype=np.int64)
+    else:
+        pick = np.asarray(model_pick, dtype=np.int64)
+    has_pick = pick >= 0
+    picked = np.full(n, np.nan)
+    picked[has_pick] = odds[np.flatnonzero(has_pick), pick[has_pick]]
+    cols.update({
+        "n_model": (has_pick & known).astype(np.int64),
+        "model_correct": (has_pick & known & (pick == y)).astype(np.int64),
+        "n_picked": (~np.isnan(picked)).astype(np.int64),
+        "sum_picked": np.nan_to_num(picked, nan=0.0),
+        "picked_odds": picked,
+    })
+    return pd.DataFrame(cols, index=frame.index)
+
+
+# =========================
+# Agregados somáveis
+# =========================
+
+def aggregate(rows: pd.DataFrame, keys: Sequence[str]) -> pd.DataFrame:
+    """1 groupby.sum p/ todas as contagens/somas (índice = chaves)."""
+    cols = COUNT_COLS + SUM_COLS
+    if not keys:
+        return rows[cols].sum().to_frame().T
+    return rows.groupby(list(keys), dropna=False, sort=True, observed=True)[cols].sum()
+
+
+def merge_aggregates(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Soma parciais (ex.: 1 por arquivo) com as mesmas chaves."""
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return pd.DataFrame(columns=COUNT_COLS + SUM_COLS)
+    both = pd.concat(parts)
+    return both.groupby(level=list(range(both.index.nlevels)), dropna=False, sort=True).sum()
+
+
+def rollup(agg: pd.DataFrame, keys: Sequence[str] = ()) -> pd.DataFrame:
+    """Agregado mais grosso a partir de um mais fino (keys vazio = total)."""
+    if not keys:
+        return agg.sum().to_frame().T
+    return agg.groupby(level=list(keys), dropna=False, sort=True, observed=True).sum()
+
+
+def finalize(agg: pd.DataFrame) -> pd.DataFrame:
+    """Somas -> médias/taxas (NaN onde o denominador é 0)."""
+    def ratio(num, den):
+        den = agg[den].astype(float) if isinstance(den, str) else den
+        return (num / den.where(den > 0)).astype(float)
+
+    n_odds = agg["n_odds"]
+    out = pd.DataFrame(index=agg.index)
+    out["rows_read"] = agg["n_rows"].astype(np.int64)
+    out["rows_with_odds"] = n_odds.astype(np.int64)
+    out["n_result"] = agg["n_result"].astype(np.int64)
+    out["n_odds_result"] = agg["n_odds_result"].astype(np.int64)
+    out["house_correct"] = agg["house_correct"].astype(np.int64)
+    out["model_correct"] = agg["model_correct"].astype(np.int64)
+
+    out["mean_odd_home"] = ratio(agg["sum_oh"], "n_odds")
+    out["mean_odd_draw"] = ratio(agg["sum_od"], "n_odds")
+    out["mean_odd_away"] = ratio(agg["sum_oa"], "n_odds")
+    out["mean_odd_universe"] = ratio(agg["sum_oh"] + agg["sum_od"] + agg["sum_oa"], 3 * n_odds)
+    out["mean_odd_favorite"] = ratio(agg["sum_fav"], "n_odds")
+    out["mean_imp_prob_home_raw"] = ratio(agg["sum_iph"], "n_odds")
+    out["mean_imp_prob_draw_raw"] = ratio(agg["sum_ipd"], "n_odds")
+    out["mean_imp_prob_away_raw"] = ratio(agg["sum_ipa"], "n_odds")
+    out["mean_imp_prob_universe_raw"] = ratio(agg["sum_iph"] + agg["sum_ipd"] + agg["sum_ipa"], 3 * n_odds)
+    out["mean_prob_home_norm"] = ratio(agg["sum_ph"], "n_odds")
+    out["mean_prob_draw_norm"] = ratio(agg["sum_pd"], "n_odds")
+    out["mean_prob_away_norm"] = ratio(agg["sum_pa"], "n_odds")
+    out["mean_overround"] = ratio(agg["sum_overround"], "n_odds")
+
+    out["house_accuracy"] = ratio(agg["house_correct"], "n_odds_result")
+    out["model_accuracy"] = ratio(agg["model_correct"], "n_model")
+    out["picked_odds_mean"] = ratio(agg["sum_picked"], "n_picked")
+    return out
+
+
+def _select(table: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+    """Colunas do CSV; 'nome:origem' renomeia (ex.: rows_with_result:n_odds_result)."""
+    src = {c.split(":")[0]: c.split(":")[-1] for c in columns}
+    return pd.DataFrame({name: table[s] for name, s in src.items()})
+
+
+def summary_table(
+    agg: pd.DataFrame,
+    columns: Sequence[str],
+    label_col: str,
+    rows: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    __ALL__ + 1 linha por grupo do agregado (índice de 1 nível).
+    rows (com a chave do grupo) só é usado p/ os quantis do pick do modelo.
+    """
+    total = finalize(rollup(agg))
+    groups = finalize(agg)
+    need_q = any(c.split(":")[0] in PICKED_QUANTILES for c in columns)
+    if need_q:
+        if rows is None:
+            raise ValueError("quantis do pick precisam das linhas (rows)")
+        key = agg.index.name
+        q = rows.groupby(key, dropna=False, sort=True, observed=True)["picked_odds"].quantile(list(PICKED_QUANTILES.values()))
+        q = q.unstack()
+        for name, p in PICKED_QUANTILES.items():
+            total[name] = float(rows["picked_odds"].quantile(p))
+            groups[name] = q[p].reindex(groups.index).to_numpy() if len(q) else np.nan
+
+    total.index = [ALL_LABEL]
+    groups.index = [str(v) for v in groups.index]
+    out = pd.concat([_select(total, columns), _select(groups, columns)])
+    out.index.name = label_col
+    return out.reset_index()
+
+
+def summary_tables(
+    rows: pd.DataFrame,
+    groupings: Dict[str, str],
+    columns: Sequence[str],
+) -> Dict[str, pd.DataFrame]:
+    """
+    Várias tabelas (1 por agrupamento) a partir das mesmas linhas:
+    1 groupby.sum na combinação das chaves e rollup p/ cada uma.
+    groupings = {nome da 1ª coluna do CSV: coluna-chave em rows}
+    """
+    keys = list(dict.fromkeys(groupings.values()))
+    fine = aggregate(rows, keys)
+    return {
+        label: summary_table(rollup(fine, [key]), columns, label_col=label, rows=rows[[key, "picked_odds"]])
+        for label, key in groupings.items()
+    }
@@ -63,9 +63,11 @@ def main():
     print("[OK] Pipeline concluído com sucesso.")
     print("Gerados:")
     print(" - Backend/ml/datasets/matches_enriched.csv")
-    print(" - Backend/ml/models/xgb_1x2.json")
-    print(" - Backend/ml/models/xgb_1x2_meta.json")
-    print(" - Backend/ml/models/xgb_1x2_columns.pkl")
+    print(" - Backend/ml/datasets/matches_enriched.parquet")
+    print(" - Backend/ml/datasets/matches_enriched_state.npz")
+    print(" - Backend/ml/datasets/elo_ratings.json")
+    print(" - Backend/ml/datasets/team_feature_store.npz")
+    print(" - Backend/ml/models/registry/xgb_1x2/ (nova versão + champion)")
     print(" - Backend/ml/train/house_odds_summary.csv")
     print(" - Backend/ml/train/predictor_odds_summary.csv")
     print("-" * 90)
@@ -0,0 +1,304 @@
+# Backend/ml/train/staking_sim.py
+# ------------------------------------------------------------
+# Simulador de apostas / gestão de banca sobre previsões fora da amostra
+#
+# Fonte (--source):
+#   backtest: Backend/ml/train/backtest_oos_predictions.csv (walk-forward,
+#             todo o histórico após o aquecimento) — padrão se existir
+#   test:     champion do registro no TEST (mesmo split do treino; probs da
+#             tabela predictions.parquet da versão, models/oos_predictions.py)
+#
+# Regras:
+# - Aposta no pick do modelo (maior prob), só em jogos com odds 1x2
+# - Filtros: edge = p_pick * odd - 1 >= edge_min e p_pick >= conf_min
+# - Estratégias (banca inicial = 1):
+#     flat:         stake fixa = --flat-stake (fração da banca INICIAL)
+#     proportional: stake = --fraction x banca atual
+#     kelly:        stake = --kelly x Kelly (edge / (odd - 1)), teto --kelly-cap
+# - Jogos em ordem cronológica, 1 a 1 (jogos do mesmo dia em sequência)
+# - flat quebra quando a banca fica abaixo da stake: para de apostar (ruined)
+#
+# Varredura vetorizada: todas as combinações (edge_min x conf_min) de uma
+# vez, em blocos de combinações: máscara (combinações x jogos) -> cumsum
+# (flat) / cumprod (proporcional, Kelly) -> banca, drawdown máximo e
+# yield (lucro / total apostado). Cada competição roda com banca própria,
+# além do __ALL__ (todas as competições na mesma banca).
+#
+# Uso:
+#   python Backend/ml/train/staking_sim.py                      # 21 x 21, backtest
+#   python Backend/ml/train/staking_sim.py --source test --grid 100   # 10k combinações
+#
+# Saídas:
+#   Backend/ml/train/staking_sweep.csv   (grupo x estratégia x combinação)
+#   Backend/ml/train/staking_equity.csv  (curva da banca da melhor
+#                                         combinação por grupo/estratégia,
+#                                         com >= --min-bets apostas)
+# ------------------------------------------------------------
+
+import os
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
+ML_DIR = os.path.abspath(os.path.join(THIS_DIR, ".."))
+DATA_PATH = os.path.join(ML_DIR, "datasets", "matches_enriched.csv")
+BACKTEST_PRED = os.path.join(THIS_DIR, "backtest_oos_predictions.csv")
+
+OUT_SWEEP = os.path.join(THIS_DIR, "staking_sweep.csv")
+OUT_EQUITY = os.path.join(THIS_DIR, "staking_equity.csv")
+
+ALL_LABEL = "__ALL__"
+STRATEGIES = ("flat", "proportional", "kelly")
+
+EDGE_RANGE = (-0.10, 0.30)
+CONF_RANGE = (0.34, 0.80)
+DEFAULT_GRID = 21                # 21 x 21 combinações; --grid 100 -> 10k
+FLAT_STAKE = 0.01
+FRACTION = 0.01
+KELLY_FRACTION = 0.25
+KELLY_CAP = 0.05
+MIN_BETS = 100                   # p/ escolher a "melhor" combinação
+COMBO_BLOCK = 64                 # combinações por bloco (cabe no cache; medido)
+
+
+# =========================
+# Entrada: previsões OOS -> apostas candidatas
+# =========================
+
+def load_backtest_predictions(path: str = BACKTEST_PRED) -> pd.DataFrame:
+    df = pd.read_csv(path, parse_dates=["date"])
+    return df.rename(columns={"p_h": "p_home", "p_d": "p_draw", "p_a": "p_away"})
+
+
+def load_test_predictions(model_version: Optional[str] = None) -> pd.DataFrame:
+    """Champion (ou versão fixada) no TEST: frame da avaliação + tabela de previsões da versão."""
+    from eval_avg_odds_model import load_test_frame  # ajusta o sys.path (datasets/, models/)
+    from model_registry import load_model
+    from oos_predictions import exclude_trained, oos_proba
+
+    model = load_model(model_version)
+    test_df = exclude_trained(model, load_test_frame(DATA_PATH, model.pipeline), "TEST")
+    prob = oos_proba(model, test_df, "test")
+    out = test_df[["date", "competition", "home", "away", "target_1x2", "odds_h", "odds_d", "odds_a"]].copy()
+    out["p_home"], out["p_draw"], out["p_away"] = prob[:, 0], prob[:, 1], prob[:, 2]
+    return out
+
+
+def candidate_bets(df: pd.DataFrame) -> pd.DataFrame:
+    """1 aposta candidata por jogo com odds: pick, prob, odd, edge, retorno por unidade."""
+    odds = df[["odds_h", "odds_d", "odds_a"]].to_numpy(dtype=float)
+    prob = df[["p_home", "p_draw", "p_away"]].to_numpy(dtype=float)
+    ok = (~np.isnan(odds).any(axis=1)) & (odds > 1.0).all(axis=1)
+
+    rows = np.arange(len(df))
+    pick = np.argmax(prob, axis=1)
+    p = prob[rows, pick]
+    o = odds[rows, pick]
+    y = df["target_1x2"].to_numpy(dtype=int)
+
+    bets = pd.DataFrame({
+        "date": pd.to_datetime(df["date"]).to_numpy(),
+        "competition": df["competition"].astype(str).to_numpy(),
+        "pick": pick, "p": p, "odd": o,
+        "edge": p * o - 1.0,
+        "ret": np.where(pick == y, o - 1.0, -1.0),  # lucro por unidade apostada
+    })[ok]
+    return bets.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+# =========================
+# Varredura vetorizada
+# =========================
+
+def threshold_grid(n_edge: int = DEFAULT_GRID, n_conf: int = DEFAULT_GRID) -> pd.DataFrame:
+    e, c = np.meshgrid(np.linspace(*EDGE_RANGE, n_edge), np.linspace(*CONF_RANGE, n_conf), indexing="ij")
+    return pd.DataFrame({"edge_min": e.ravel().round(6), "conf_min": c.ravel().round(6)})
+
+
+def _stake_fraction(strategy: str, bets: pd.DataFrame, params: dict) -> np.ndarray:
+    if strategy == "flat":
+        return np.full(len(bets), params["flat_stake"])
+    if strategy == "proportional":
+        return np.full(len(bets), params["fraction"])
+    kelly = bets["edge"].to_numpy() / (bets["odd"].to_numpy() - 1.0)
+    return np.clip(params["kelly"] * kelly, 0.0, params["kelly_cap"])
+
+
+def simulate(
+    bets: pd.DataFrame,
+    grid: pd.DataFrame,
+    strategy: str,
+    params: dict,
+    keep_curves: bool = False,
+    block: int = COMBO_BLOCK,
+) -> Dict[str, np.ndarray]:
+    """
+    Todas as combinações do grid p/ 1 estratégia. Retorna arrays por combinação
+    (n_bets, staked, profit, yield, final, max_drawdown, ruined) e, se
+    keep_curves, a banca (combinações x jogos) -- só p/ grids pequenos.
+    """
+    n, C = len(bets), len(grid)
+    edge, conf = bets["edge"].to_numpy(), bets["p"].to_numpy()
+    ret = bets["ret"].to_numpy()
+    frac = _stake_fraction(strategy, bets, params)
+    # combinações que selecionam o mesmo conjunto de apostas (nenhum jogo entre
+    # os limiares) têm o mesmo resultado: simula cada conjunto 1 vez
+    e_key = np.searchsorted(np.sort(edge), grid["edge_min"].to_numpy(), side="left")
+    c_key = np.searchsorted(np.sort(conf), grid["conf_min"].to_numpy(), side="left")
+    _, first, inverse = np.unique(np.stack([e_key, c_key], axis=1), axis=0, return_index=True, return_inverse=True)
+    if len(first) < C:
+        r = simulate(bets, grid.iloc[first], strategy, params, keep_curves, block)
+        return {k: (v[inverse.ravel()] if v is not None else None) for k, v in r.items()}
+    e_min = grid["edge_min"].to_numpy()[:, None]
+    c_min = grid["conf_min"].to_numpy()[:, None]
+
+    out = {k: np.zeros(C) for k in ("n_bets", "staked", "profit", "final", "max_drawdown", "ruined")}
+    curves = np.empty((C, n)) if keep_curves else None
+    if n == 0:
+        out["final"][:] = 1.0
+        out["yield"] = np.full(C, np.nan)
+        out["curves"] = curves
+        return out
+
+    for lo in range(0, C, block):
+        hi = min(C, lo + block)
+        # stake 0 (Kelly com edge <= 0) não é aposta: fora de n_bets/--min-bets
+        bet = (edge >= e_min[lo:hi]) & (conf >= c_min[lo:hi]) & (frac > 0)   # (b, n)
+        f = np.where(bet, frac, 0.0)
+        ruined = np.zeros(hi - lo, dtype=bool)
+        if strategy == "flat":
+            # quebra: banca antes do jogo < stake fixa -> para de apostar.
+            # O 1º ponto de quebra não muda ao zerar as apostas seguintes,
+            # então 1 passada corrige a curva inteira.
+            bank = 1.0 + np.cumsum(f * ret, axis=1)
+            prev = np.concatenate([np.ones((hi - lo, 1)), bank[:, :-1]], axis=1)
+            broke = np.logical_or.accumulate(bet & (prev < frac), axis=1)
+            if broke.any():
+                ruined = broke[:, -1]
+                bet &= ~broke
+                f = np.where(bet, frac, 0.0)
+                bank = 1.0 + np.cumsum(f * ret, axis=1)
+            stake = f
+        else:
+            bank = np.cumprod(1.0 + f * ret, axis=1)                      # stake sai da banca atual
+            prev = np.concatenate([np.ones((hi - lo, 1)), bank[:, :-1]], axis=1)
+            stake = f * prev
+
+        peak = np.maximum(np.maximum.accumulate(bank, axis=1), 1.0)
+        out["n_bets"][lo:hi] = bet.sum(axis=1)
+        out["staked"][lo:hi] = stake.sum(axis=1)
+        out["final"][lo:hi] = bank[:, -1]
+        out["max_drawdown"][lo:hi] = (1.0 - bank / peak).max(axis=1)
+        out["ruined"][lo:hi] = ruined
+        if keep_curves:
+            curves[lo:hi] = bank
+
+    out["profit"] = out["final"] - 1.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["yield"] = np.where(out["staked"] > 0, out["profit"] / out["staked"], np.nan)
+    out["curves"] = curves
+    return out
+
+
+def _groups(bets: pd.DataFrame) -> list:
+    """__ALL__ (banca única) + cada competição com banca própria."""
+    return [(ALL_LABEL, bets)] + [(str(c), g.reset_index(drop=True)) for c, g in bets.groupby("competition", sort=True)]
+
+
+def sweep(bets: pd.DataFrame, grid: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """Tabela grupo x estratégia x combinação (sem curvas: memória ~ bloco x jogos)."""
+    tables = []
+    for label, g in _groups(bets):
+        for strategy in STRATEGIES:
+            r = simulate(g, grid, strategy, params)
+            t = grid.copy()
+            t.insert(0, "strategy", strategy)
+            t.insert(0, "group", label)
+            for k in ("n_bets", "staked", "profit", "yield", "final", "max_drawdown"):
+                t[k] = r[k]
+            t["n_bets"] = t["n_bets"].astype(int)
+            t["ruined"] = r["ruined"].astype(bool)
+            tables.append(t)
+    return pd.concat(tables, ignore_index=True)
+
+
+def best_rows(table: pd.DataFrame, min_bets: int = MIN_BETS) -> pd.DataFrame:
+    """Maior yield por grupo/estratégia entre as combinações com >= min_bets apostas."""
+    t = table[(table["n_bets"] >= min_bets) & table["yield"].notna()]
+    idx = t.groupby(["group", "strategy"], sort=False)["yield"].idxmax()
+    return table.loc[idx.to_numpy()]
+
+
+def equity_curves(bets: pd.DataFrame, best: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """Curva da banca (jogo a jogo) de cada linha de best_rows, re-simulada sozinha."""
+    groups = dict(_groups(bets))
+    curves = []
+    for _, row in best.iterrows():
+        g = groups[row["group"]]
+        one = pd.DataFrame({"edge_min": [row["edge_min"]], "conf_min": [row["conf_min"]]})
+        bank = simulate(g, one, row["strategy"], params, keep_curves=True)["curves"][0]
+        curves.append(pd.DataFrame({
+            "group": row["group"], "strategy": row["strategy"],
+            "edge_min": row["edge_min"], "conf_min": row["conf_min"],
+            "date": g["date"].to_numpy(), "competition": g["competition"].to_numpy(),
+            "bankroll": bank,
+        }))
+    return pd.concat(curves, ignore_index=True) if curves else pd.DataFrame()
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Simula gestão de banca (flat / proporcional / Kelly fracionado).")
+    ap.add_argument("--source", choices=["backtest", "test"], default=None,
+                    help="previsões OOS (padrão: backtest se existir, senão TEST do champion)")
+    ap.add_argument("--model-version", default=None, help="com --source test: versão do registro")
+    ap.add_argument("--since", default=None, help="só jogos a partir desta data (YYYY-MM-DD)")
+    ap.add_argument("--grid", type=int, default=DEFAULT_GRID, help="pontos por eixo (edge x confiança)")
+    ap.add_argument("--flat-stake", type=float, default=FLAT_STAKE)
+    ap.add_argument("--fraction", type=float, default=FRACTION)
+    ap.add_argument("--kelly", type=float, default=KELLY_FRACTION, help="fração do Kelly")
+    ap.add_argument("--kelly-cap", type=float, default=KELLY_CAP)
+    ap.add_argument("--min-bets", type=int, default=MIN_BETS)
+    args = ap.parse_args(argv)
+
+    source = args.source or ("backtest" if os.path.exists(BACKTEST_PRED) else "test")
+    df = load_backtest_predictions() if source == "backtest" else load_test_predictions(args.model_version)
+    bets = candidate_bets(df)
+    if args.since:
+        bets = bets[bets["date"] >= pd.Timestamp(args.since)].reset_index(drop=True)
+    grid = threshold_grid(args.grid, args.grid)
+    params = {"flat_stake": args.flat_stake, "fraction": args.fraction,
+              "kelly": args.kelly, "kelly_cap": args.kelly_cap}
+    print(f"[INFO] Fonte: {source} | {len(df)} jogos, {len(bets)} com odds "
+          f"({bets['date'].min().date()} .. {bets['date'].max().date()}) | {len(grid)} combinações")
+
+    t0 = time.perf_counter()
+    table = sweep(bets, grid, params)
+    dt = time.perf_counter() - t0
+    best = best_rows(table, args.min_bets)
+    equity = equity_curves(bets, best, params)
+
+    table.to_csv(OUT_SWEEP, index=False, encoding="utf-8")
+    equity.to_csv(OUT_EQUITY, index=False, encoding="utf-8")
+
+    show = ["group", "strategy", "edge_min", "conf_min", "n_bets", "yield", "final", "max_drawdown", "ruined"]
+    print("\n" + "=" * 90)
+    print(f"[STAKING] Melhor combinação por grupo/estratégia (yield, >= {args.min_bets} apostas)")
+    print("=" * 90)
+    print(best[show].round(4).to_string(index=False))
+
+    base = table[(table["edge_min"] == grid["edge_min"].min()) & (table["conf_min"] == grid["conf_min"].min())]
+    print(f"\nSem filtro (edge >= {grid['edge_min'].min():.2f}, conf >= {grid['conf_min'].min():.2f}), __ALL__:")
+    print(base[base["group"] == ALL_LABEL][show[1:]].round(4).to_string(index=False))
+
+    print(f"\n[OK] Varredura: {len(table)} linhas em {dt:.2f}s -> {OUT_SWEEP}")
+    print(f"[OK] Curvas da banca -> {OUT_EQUITY}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,20 @@
 # - NÃO usa XGBClassifier.fit callbacks/early_stopping_rounds
 # - Treina com xgboost.train (DMatrix) + early_stopping_rounds
 #
-# Entrada:  Backend/ml/datasets/matches_enriched.csv
-# Saídas:   Backend/ml/models/xgb_1x2.json
-#           Backend/ml/models/xgb_1x2_meta.json
-#           Backend/ml/models/xgb_1x2_columns.pkl
+# Entrada:  Backend/ml/datasets/matches_enriched.csv (ou .parquet tipado)
+#           (matrizes de features ficam em cache: feature_cache.py; --no-cache remonta)
+#           --stream extmem|quantile: lê em lotes (external_memory.py), memória ~ lote
+# Saída:    nova versão no registro (Backend/ml/models/model_registry.py):
+#           Backend/ml/models/registry/xgb_1x2/versions/<versão>/{model,schema,meta}.json
+#           e promoção a champion (--no-promote só registra)
+#           + predictions.parquet da versão com as probs do TEST (oos_predictions.py;
+#           avaliação/backtests leem dela em vez de re-prever)
 # ------------------------------------------------------------
 
 import os
+import sys
 import json
 import math
-import joblib
 import numpy as np
 import pandas as pd
 
@@ -23,43 +27,61 @@ from sklearn.metrics import accuracy_score, log_loss, classification_report, con
 
 import xgboost as xgb
 
+# Leitor tipado do dataset fica em ml/datasets (dataset_io.py)
+DATASETS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets"))
+if DATASETS_DIR not in sys.path:
+    sys.path.insert(0, DATASETS_DIR)
+
+# Registro versionado de modelos fica em ml/models (model_registry.py)
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models"))
+if MODELS_DIR not in sys.path:
+    sys.path.insert(0, MODELS_DIR)
+
+from dataset_io import frame_memory_mb, read_enriched  # noqa: E402
+from feature_pipeline import (  # noqa: E402
+    CAT_COLS,
+    NUM_COLS,
+    FeaturePipeline,
+    add_model_features,
+)
+from feature_cache import FeatureMatrixCache, labels_of  # noqa: E402
+from match_cache import file_digest  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from oos_predictions import prediction_table, write_predictions  # noqa: E402
+
 
 def ensure_dir(p: str):
     os.makedirs(p, exist_ok=True)
 
 
-def entropy_1x2(ph, pd_, pa) -> float:
-    """Entropia (base e) das probs 1x2 normalizadas. Maior = jogo mais equilibrado."""
-    for v in (ph, pd_, pa):
-        if v is None or (isinstance(v, float) and np.isnan(v)):
-            return np.nan
-        if v <= 0:
-            return np.nan
-    s = float(ph + pd_ + pa)
-    if s <= 0:
-        return np.nan
-    ph2, pd2, pa2 = float(ph) / s, float(pd_) / s, float(pa) / s
-    return - (ph2 * math.log(ph2) + pd2 * math.log(pd2) + pa2 * math.log(pa2))
+def split_bounds(n: int, train_frac=0.80, val_frac=0.10):
+    """Fim do TRAIN e do VAL (exclusivos) num pool de n jogos em ordem cronológica."""
+    i_train_end = int(n * train_frac)
+    i_val_end = int(n * (train_frac + val_frac))
+
+    if i_train_end >= n - 2:
+        i_train_end = max(1, n - 2)
+    if i_val_end >= n - 1:
+        i_val_end = max(i_train_end + 1, n - 1)
+    return i_train_end, i_val_end
 
 
 def split_by_pool_temporal(df: pd.DataFrame, train_frac=0.80, val_frac=0.10):
-    """Split temporal sem leakage dentro de cada pool_key."""
+    """
+    Split temporal sem leakage dentro de cada pool_key. Ordenações estáveis:
+    jogos do mesmo pool na mesma data mantêm a ordem do arquivo (igual ao
+    external_memory.plan_split, que usa np.lexsort).
+    """
     parts_train, parts_val, parts_test = [], [], []
 
     for pk, g in df.groupby("pool_key", sort=False):
-        g = g.sort_values("date").reset_index(drop=True)
+        g = g.sort_values("date", kind="stable").reset_index(drop=True)
         n = len(g)
         if n < 10:
             parts_train.append(g)
             continue
 
-        i_train_end = int(n * train_frac)
-        i_val_end = int(n * (train_frac + val_frac))
-
-        if i_train_end >= n - 2:
-            i_train_end = max(1, n - 2)
-        if i_val_end >= n - 1:
-            i_val_end = max(i_train_end + 1, n - 1)
+        i_train_end, i_val_end = split_bounds(n, train_frac, val_frac)
 
         parts_train.append(g.iloc[:i_train_end].copy())
         parts_val.append(g.iloc[i_train_end:i_val_end].copy())
@@ -69,187 +91,247 @@ def split_by_pool_temporal(df: pd.DataFrame, train_frac=0.80, val_frac=0.10):
     val_df = pd.concat(parts_val, ignore_index=True) if parts_val else df.iloc[:0].copy()
     test_df = pd.concat(parts_test, ignore_index=True) if parts_test else df.iloc[:0].copy()
 
-    train_df = train_df.sort_values("date").reset_index(drop=True)
-    val_df = val_df.sort_values("date").reset_index(drop=True)
-    test_df = test_df.sort_values("date").reset_index(drop=True)
+    train_df = train_df.sort_values("date", kind="stable").reset_index(drop=True)
+    val_df = val_df.sort_values("date", kind="stable").reset_index(drop=True)
+    test_df = test_df.sort_values("date", kind="stable").reset_index(drop=True)
 
     return train_df, val_df, test_df
 
 
-def main():
-    # -------------------------
-    # Paths
-    # -------------------------
-    THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
-    BACKEND_DIR = os.path.abspath(os.path.join(THIS_DIR, "..", ".."))  # .../Backend
-
-    DATA_PATH = os.path.join(BACKEND_DIR, "ml", "datasets", "matches_enriched.csv")
-    MODELS_DIR = os.path.join(BACKEND_DIR, "ml", "models")
-    ensure_dir(MODELS_DIR)
-
-    MODEL_PATH = os.path.join(MODELS_DIR, "xgb_1x2.json")
-    META_PATH = os.path.join(MODELS_DIR, "xgb_1x2_meta.json")
-    COLS_PATH = os.path.join(MODELS_DIR, "xgb_1x2_columns.pkl")
+# Colunas que o dataset precisa ter p/ montar as features do modelo
+NEEDED_COLS = {
+    "date", "target_1x2",
+    "elo_home_pre", "elo_away_pre", "elo_diff",
+    "form_pts_home_3", "form_pts_home_5", "form_pts_away_3", "form_pts_away_5",
+    "gd_home_5", "gd_away_5",
+    "pool_key", "competition",
+    "odds_h", "odds_d", "odds_a",
+    "imp_ph", "imp_pd", "imp_pa",
+    "imp_overround_1x2", "imp_ph_minus_pa",
+    "ou_p_over25", "ou_p_under25",
+    "ou_overround", "ou_p_over_minus_under",
+}
+
+TRAIN_FRAC = 0.80
+VAL_FRAC = 0.10
+
+DEFAULT_PARAMS = {
+    "objective": "multi:softprob",
+    "num_class": 3,
+    "eval_metric": "mlogloss",
+
+    "max_depth": 5,
+    "eta": 0.02,
+    "subsample": 0.85,
+    "colsample_bytree": 0.85,
+    "min_child_weight": 2.0,
+    "gamma": 0.2,
+    "lambda": 2.0,
+    "alpha": 0.1,
+
+    "tree_method": "hist",
+    "seed": 42,
+}
+
+NUM_BOOST_ROUND = 8000
+EARLY_STOPPING_ROUNDS = 200
+
+
+# config promovida pela busca (tune_1x2_xgb.py); arquivo próprio, separado do meta legado
+TUNED_PATH = os.path.join(MODELS_DIR, "xgb_1x2_tuned.json")
+
+
+def resolve_params(tuned_path: str = TUNED_PATH):
+    """
+    Params do treino = DEFAULT_PARAMS + os promovidos pela busca (tune_1x2_xgb.py),
+    que ficam em xgb_1x2_tuned.json. Retorna (params, tuned|None).
+    """
+    tuned = None
+    try:
+        with open(tuned_path, "r", encoding="utf-8") as f:
+            tuned = json.load(f) or None
+    except Exception:
+        tuned = None
+
+    params = dict(DEFAULT_PARAMS)
+    if tuned and isinstance(tuned.get("params"), dict):
+        params.update(tuned["params"])
+    return params, tuned
+
+
+def order_model_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Linhas com data + alvo, ordenadas (estável) por pool_key + data: a ordem que o split vê."""
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df = df.dropna(subset=["date", "target_1x2"]).copy()
+    df["target_1x2"] = df["target_1x2"].astype(int)
+    return df.sort_values(["pool_key", "date"], kind="stable").reset_index(drop=True)
 
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"Dataset não encontrado em: {DATA_PATH}")
 
+def load_model_frame(data_path: str) -> pd.DataFrame:
+    """Dataset enriquecido + features extras do modelo, ordenado por pool_key + data."""
     # -------------------------
     # Load + sanity
     # -------------------------
-    df = pd.read_csv(DATA_PATH)
-
-    needed_cols = {
-        "date", "target_1x2",
-        "elo_home_pre", "elo_away_pre", "elo_diff",
-        "form_pts_home_3", "form_pts_home_5", "form_pts_away_3", "form_pts_away_5",
-        "gd_home_5", "gd_away_5",
-        "pool_key", "competition",
-        "odds_h", "odds_d", "odds_a",
-        "imp_ph", "imp_pd", "imp_pa",
-        "imp_overround_1x2", "imp_ph_minus_pa",
-        "ou_p_over25", "ou_p_under25",
-        "ou_overround", "ou_p_over_minus_under",
-    }
-    missing = needed_cols - set(df.columns)
+    df = read_enriched(data_path)
+
+    missing = NEEDED_COLS - set(df.columns)
     if missing:
         raise RuntimeError(f"Dataset está faltando colunas: {missing}")
 
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df = df.dropna(subset=["date", "target_1x2"]).copy()
-    df["target_1x2"] = df["target_1x2"].astype(int)
-    df = df.sort_values(["pool_key", "date"]).reset_index(drop=True)
+    df = order_model_frame(df)
 
     # -------------------------
     # Extra features (robustas com NaN)
     # -------------------------
-    df["has_odds_1x2"] = (~df["imp_ph"].isna() & ~df["imp_pd"].isna() & ~df["imp_pa"].isna()).astype(int)
-    df["has_ou_25"] = (~df["ou_p_over25"].isna() & ~df["ou_p_under25"].isna()).astype(int)
+    add_model_features(df)
+    print(f"[INFO] Frame de treino: {frame_memory_mb(df):.1f} MB em memória")
+    return df
 
-    df["abs_elo_diff"] = df["elo_diff"].abs()
-    df["abs_imp_ph_minus_pa"] = df["imp_ph_minus_pa"].abs()
 
-    df["imp_entropy_1x2"] = [
-        entropy_1x2(ph, pd_, pa)
-        for ph, pd_, pa in zip(df["imp_ph"].values, df["imp_pd"].values, df["imp_pa"].values)
-    ]
-
-    # fav_prob/draw_edge sem warning: só calcula onde há odds
-    df["fav_prob"] = np.nan
-    m_odds = df["has_odds_1x2"] == 1
-    if m_odds.any():
-        df.loc[m_odds, "fav_prob"] = np.maximum(df.loc[m_odds, "imp_ph"].values, df.loc[m_odds, "imp_pa"].values)
+def class_weights(y: np.ndarray):
+    """Pesos por classe 1/sqrt(freq), normalizados p/ média 1. Retorna (counts, pesos)."""
+    counts = Counter(np.asarray(y).tolist())
+    inv = {c: (1.0 / math.sqrt(max(1, counts.get(c, 1)))) for c in [0, 1, 2]}
+    mean_inv = sum(inv.values()) / 3.0
+    w = {c: (inv[c] / mean_inv) for c in inv}
+    return counts, w
 
-    df["draw_edge"] = np.nan
-    df.loc[m_odds, "draw_edge"] = df.loc[m_odds, "imp_pd"].values - df.loc[m_odds, "fav_prob"].values
 
-    df["balanced_flag"] = 0
-    df.loc[m_odds, "balanced_flag"] = (df.loc[m_odds, "fav_prob"].values < 0.45).astype(int)
+def build_feature_matrices(data_path: str) -> dict:
+    """
+    Lê o dataset, monta features + split temporal + one-hot e devolve
+    {"train"/"val"/"test": DMatrix, "columns": [...], "info": {...}, "test_frame": test_df}.
+    É o que o FeatureMatrixCache guarda.
+    """
+    df = load_model_frame(data_path)
 
     # -------------------------
     # Split temporal por pool_key
     # -------------------------
-    train_df, val_df, test_df = split_by_pool_temporal(df, train_frac=0.80, val_frac=0.10)
+    train_df, val_df, test_df = split_by_pool_temporal(df, train_frac=TRAIN_FRAC, val_frac=VAL_FRAC)
     if len(val_df) == 0 or len(test_df) == 0:
         raise RuntimeError("Split gerou VAL/TEST vazios. Verifique se há linhas suficientes por pool_key.")
 
     # -------------------------
-    # Features (num + cat one-hot)
+    # Features (num + cat one-hot): pipeline ajustado no dataset todo
+    # (layout = todas as categorias vistas, igual ao antigo union + sorted)
     # -------------------------
-    num_cols = [
-        "elo_home_pre", "elo_away_pre", "elo_diff", "abs_elo_diff",
-        "form_pts_home_3", "form_pts_home_5",
-        "form_pts_away_3", "form_pts_away_5",
-        "gd_home_5", "gd_away_5",
-
-        "odds_h", "odds_d", "odds_a",
-
-        "imp_ph", "imp_pd", "imp_pa",
-        "imp_overround_1x2",
-        "imp_ph_minus_pa",
-        "abs_imp_ph_minus_pa",
-        "imp_entropy_1x2",
-
-        "fav_prob",
-        "draw_edge",
-        "balanced_flag",
-
-        "ou_p_over25", "ou_p_under25",
-        "ou_overround",
-        "ou_p_over_minus_under",
-
-        "has_odds_1x2",
-        "has_ou_25",
-    ]
-    cat_cols = ["pool_key", "competition"]
-
-    def make_X(d: pd.DataFrame) -> pd.DataFrame:
-        Xn = d[num_cols].copy()
-        Xc = pd.get_dummies(d[cat_cols].astype(str), prefix=cat_cols, dummy_na=False)
-        X = pd.concat([Xn, Xc], axis=1)
-        return X
-
-    X_train = make_X(train_df)
+    pipeline = FeaturePipeline.fit(df)
+    all_cols = pipeline.columns
+
+    X_train = pipeline.transform(train_df)
     y_train = train_df["target_1x2"].values.astype(int)
 
-    X_val = make_X(val_df)
+    X_val = pipeline.transform(val_df)
     y_val = val_df["target_1x2"].values.astype(int)
 
-    X_test = make_X(test_df)
+    X_test = pipeline.transform(test_df)
     y_test = test_df["target_1x2"].values.astype(int)
 
-    # alinha colunas
-    all_cols = sorted(set(X_train.columns) | set(X_val.columns) | set(X_test.columns))
-    X_train = X_train.reindex(columns=all_cols, fill_value=0)
-    X_val = X_val.reindex(columns=all_cols, fill_value=0)
-    X_test = X_test.reindex(columns=all_cols, fill_value=0)
-
-    joblib.dump(all_cols, COLS_PATH)
-
     # -------------------------
     # sample weights (1/sqrt(freq))
     # -------------------------
-    counts = Counter(y_train.tolist())
-    inv = {c: (1.0 / math.sqrt(max(1, counts.get(c, 1)))) for c in [0, 1, 2]}
-    mean_inv = sum(inv.values()) / 3.0
-    w = {c: (inv[c] / mean_inv) for c in inv}
+    counts, w = class_weights(y_train)
     sample_weight = np.array([w[int(y)] for y in y_train], dtype=float)
 
-    print("\n" + "-" * 70)
-    print("[INFO] Class counts (train):", dict(counts))
-    print("[INFO] Class weights (train):", w)
-    print("-" * 70)
-
     # -------------------------
     # DMatrix (xgboost.train)
     # -------------------------
-    dtrain = xgb.DMatrix(X_train.values.astype(np.float32), label=y_train, weight=sample_weight)
-    dval = xgb.DMatrix(X_val.values.astype(np.float32), label=y_val)
-    dtest = xgb.DMatrix(X_test.values.astype(np.float32), label=y_test)
+    dtrain = xgb.DMatrix(X_train, label=y_train, weight=sample_weight)
+    dval = xgb.DMatrix(X_val, label=y_val)
+    dtest = xgb.DMatrix(X_test, label=y_test)
+
+    info = {
+        "n_rows": int(len(df)),
+        "date_min": str(df["date"].min().date()),
+        "date_max": str(df["date"].max().date()),
+        "split": {
+            "strategy": "temporal_by_pool_key",
+            "train_rows": int(len(train_df)),
+            "val_rows": int(len(val_df)),
+            "test_rows": int(len(test_df)),
+            "train_end_date": str(train_df["date"].max().date()) if len(train_df) else None,
+            "val_end_date": str(val_df["date"].max().date()) if len(val_df) else None,
+            "test_end_date": str(test_df["date"].max().date()) if len(test_df) else None,
+        },
+        "class_counts_train": {str(k): int(v) for k, v in counts.items()},
+        "class_weights_train": {str(k): float(v) for k, v in w.items()},
+    }
+
+    return {
+        "train": dtrain, "val": dval, "test": dtest,
+        "columns": all_cols, "info": info, "test_frame": test_df, "pipeline": pipeline,
+    }
+
+
+def feature_spec(filter_competitions=None) -> dict:
+    """Tudo que muda as matrizes além do dataset (entra na chave do cache)."""
+    return {
+        "num_cols": NUM_COLS,
+        "cat_cols": CAT_COLS,
+        "split": [TRAIN_FRAC, VAL_FRAC],
+        "filter_competitions": sorted(filter_competitions) if filter_competitions else None,
+    }
+
+
+def load_feature_matrices(data_path: str, use_cache: bool = True) -> dict:
+    """Matrizes do cache (hit) ou montadas do zero (miss, e grava no cache)."""
+    cache = FeatureMatrixCache(enabled=use_cache)
+    key = cache.key_for(data_path, feature_spec()) if cache.enabled else None
+
+    mats = cache.load(key) if key else None
+    if mats is not None:
+        print(f"[INFO] Matrizes de features do cache ({key})")
+        mats["pipeline"] = FeaturePipeline.from_columns(mats["columns"])
+        return mats
+
+    mats = build_feature_matrices(data_path)
+    if key:
+        cache.save(key, mats, mats["columns"], mats["info"], mats["test_frame"])
+        print(f"[INFO] Matrizes de features salvas no cache ({key})")
+    return mats
+
+
+def main(use_cache: bool = True, stream: str = None, batch_rows: int = None, promote: bool = True):
+    # -------------------------
+    # Paths
+    # -------------------------
+    THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
+    BACKEND_DIR = os.path.abspath(os.path.join(THIS_DIR, "..", ".."))  # .../Backend
+
+    DATA_PATH = os.path.join(BACKEND_DIR, "ml", "datasets", "matches_enriched.csv")
+    ensure_dir(MODELS_DIR)
+
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f"Dataset não encontrado em: {DATA_PATH}")
+
+    # -------------------------
+    # Features (cache binário, montagem completa ou em lotes)
+    # -------------------------
+    if stream:
+        from external_memory import build_stream_matrices
+
+        mats = build_stream_matrices(DATA_PATH, mode=stream, **({"batch_rows": batch_rows} if batch_rows else {}))
+    else:
+        mats = load_feature_matrices(DATA_PATH, use_cache=use_cache)
+    dtrain, dval, dtest = mats["train"], mats["val"], mats["test"]
+    y_train, y_val, y_test = labels_of(dtrain), labels_of(dval), labels_of(dtest)
+    info = mats["info"]
+
+    print("\n" + "-" * 70)
+    print("[INFO] Class counts (train):", {int(k): v for k, v in info["class_counts_train"].items()})
+    print("[INFO] Class weights (train):", {int(k): v for k, v in info["class_weights_train"].items()})
+    print("-" * 70)
 
     # -------------------------
     # Params + Train
     # -------------------------
-    params = {
-        "objective": "multi:softprob",
-        "num_class": 3,
-        "eval_metric": "mlogloss",
-
-        "max_depth": 5,
-        "eta": 0.02,
-        "subsample": 0.85,
-        "colsample_bytree": 0.85,
-        "min_child_weight": 2.0,
-        "gamma": 0.2,
-        "lambda": 2.0,
-        "alpha": 0.1,
-
-        "tree_method": "hist",
-        "seed": 42,
-    }
+    params, tuned = resolve_params()
+    if tuned:
+        print(f"[INFO] Usando hiperparâmetros promovidos pelo tune_1x2_xgb.py (val mlogloss {tuned.get('val_mlogloss')})")
 
-    num_boost_round = 8000
-    early_stopping_rounds = 200
+    num_boost_round = NUM_BOOST_ROUND
+    early_stopping_rounds = EARLY_STOPPING_ROUNDS
 
     evals = [(dtrain, "train"), (dval, "val")]
     booster = xgb.train(
@@ -283,58 +365,73 @@ def main():
         print("\nRelatório:")
         print(classification_report(y_true, pred, digits=4))
 
-        return acc, ll
+        return acc, ll, prob
 
-    train_acc, train_ll = eval_split("TRAIN", dtrain, y_train)
-    val_acc, val_ll = eval_split("VAL", dval, y_val)
-    test_acc, test_ll = eval_split("TEST", dtest, y_test)
+    train_acc, train_ll, _ = eval_split("TRAIN", dtrain, y_train)
+    val_acc, val_ll, _ = eval_split("VAL", dval, y_val)
+    test_acc, test_ll, test_prob = eval_split("TEST", dtest, y_test)
 
     # -------------------------
     # Save
     # -------------------------
-    booster.save_model(MODEL_PATH)
-
     meta = {
-        "data_path": DATA_PATH,
-        "n_rows": int(len(df)),
-        "date_min": str(df["date"].min().date()),
-        "date_max": str(df["date"].max().date()),
-        "split": {
-            "strategy": "temporal_by_pool_key",
-            "train_rows": int(len(train_df)),
-            "val_rows": int(len(val_df)),
-            "test_rows": int(len(test_df)),
-            "train_end_date": str(train_df["date"].max().date()) if len(train_df) else None,
-            "val_end_date": str(val_df["date"].max().date()) if len(val_df) else None,
-            "test_end_date": str(test_df["date"].max().date()) if len(test_df) else None,
-        },
+        "data_file": os.path.relpath(DATA_PATH, os.path.join(BACKEND_DIR, "ml")).replace(os.sep, "/"),
+        "dataset_sha1": file_digest(DATA_PATH),
+        "n_rows": info["n_rows"],
+        "date_min": info["date_min"],
+        "date_max": info["date_max"],
+        "split": info["split"],
         "metrics": {
             "train": {"accuracy": float(train_acc), "logloss": float(train_ll)},
             "val": {"accuracy": float(val_acc), "logloss": float(val_ll)},
             "test": {"accuracy": float(test_acc), "logloss": float(test_ll)},
         },
         "best_iteration": best_it,
-        "num_cols": num_cols,
-        "cat_cols": cat_cols,
-        "class_counts_train": {str(k): int(v) for k, v in counts.items()},
-        "class_weights_train": {str(k): float(v) for k, v in w.items()},
+        "num_cols": NUM_COLS,
+        "cat_cols": CAT_COLS,
+        "class_counts_train": info["class_counts_train"],
+        "class_weights_train": info["class_weights_train"],
         "xgb_params": params,
         "num_boost_round": int(num_boost_round),
         "early_stopping_rounds": int(early_stopping_rounds),
-        "model_path": MODEL_PATH,
-        "columns_path": COLS_PATH,
+        "tuned_params": tuned,
+        "data_mode": stream or "in_memory",
     }
 
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
+    registry = ModelRegistry()
+    version = registry.register(booster, mats["pipeline"], meta)
+    if promote:
+        registry.promote(version, reason="train_1x2_xgb.py")
+
+    # probs do TEST já calculadas acima -> tabela da versão (--stream não tem o frame)
+    pred_path = None
+    if mats.get("test_frame") is not None:
+        pred_path = write_predictions(registry.load(version),
+                                      prediction_table(mats["test_frame"], test_prob, "test", version))
 
     print("\n" + "-" * 70)
-    print("[OK] Modelo salvo em:", MODEL_PATH)
-    print("[OK] Colunas salvas em:", COLS_PATH)
-    print("[OK] Metadata salva em:", META_PATH)
+    print(f"[OK] Modelo registrado: {registry.name}/{version} ({registry.version_dir(version)})")
+    if promote:
+        print("[OK] Versão promovida a champion:", registry.champion_path)
+    else:
+        print(f"[INFO] Champion mantido ({registry.champion()}); promova com: python Backend/ml/models/model_registry.py --promote {version}")
+    if pred_path:
+        print(f"[OK] Previsões do TEST ({len(test_prob)} jogos) salvas em: {pred_path}")
     print("[OK] best_iteration:", best_it)
     print("-" * 70)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Treina o XGBoost 1X2.")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="ignora o cache de matrizes de features e remonta tudo")
+    ap.add_argument("--stream", choices=["extmem", "quantile"], default=None,
+                    help="lê o dataset em lotes (dataset maior que a RAM): extmem = páginas em disco, quantile = quantizado em memória")
+    ap.add_argument("--batch-rows", type=int, default=None, help="linhas por lote no --stream")
+    ap.add_argument("--no-promote", action="store_true",
+                    help="só registra a versão nova, sem trocar o champion")
+    args = ap.parse_args()
+
+    main(use_cache=not args.no_cache, stream=args.stream, batch_rows=args.batch_rows, promote=not args.no_promote)
@@ -0,0 +1,231 @@
+# Backend/ml/train/train_pool_specialists.py
+# ------------------------------------------------------------
+# Modelos especialistas por pool_key (1 XGBoost por pool), em paralelo
+#
+# - Mesmo dataset, features e split temporal por pool do treino global
+# - Cada pool com pelo menos --min-train-rows jogos de TRAIN ganha um
+#   modelo próprio (pipeline ajustado só no pool); pools esparsos ficam
+#   com o modelo global (fallback do roteador)
+# - Especialista só entra no roteador se ganhar do global no VAL do pool
+#   (--route-all desliga essa checagem)
+# - Pools treinam em processos separados (nthread = núcleos / workers)
+# - Só retreina pools cujos dados mudaram: cada especialista guarda o hash
+#   das linhas do pool; hash igual ao do champion do pool -> pula (--force refaz)
+# - Registra cada especialista no registro (nome por pool) e grava o
+#   manifesto do roteador (models/pool_router.py), que a previsão usa
+#
+# Uso:
+#   python Backend/ml/train/train_pool_specialists.py --workers 3
+# ------------------------------------------------------------
+
+import os
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import accuracy_score, log_loss
+
+from train_1x2_xgb import (
+    EARLY_STOPPING_ROUNDS,
+    NEEDED_COLS,
+    NUM_BOOST_ROUND,
+    TRAIN_FRAC,
+    VAL_FRAC,
+    class_weights,
+    load_model_frame,
+    resolve_params,
+    split_by_pool_temporal,
+)
+from feature_pipeline import FeaturePipeline
+from model_registry import DEFAULT_MODEL_NAME, ModelRegistry
+from pool_router import PoolRouter, pool_model_name, read_manifest, write_manifest
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
+ML_DIR = os.path.abspath(os.path.join(THIS_DIR, ".."))
+DATA_PATH = os.path.join(ML_DIR, "datasets", "matches_enriched.csv")
+
+MIN_TRAIN_ROWS = 2000
+
+
+def pool_fingerprint(g: pd.DataFrame) -> str:
+    """Hash das linhas do pool (colunas usadas pelo modelo): muda se entrou/alterou jogo."""
+    cols = sorted(NEEDED_COLS)
+    h = pd.util.hash_pandas_object(g[cols].reset_index(drop=True), index=False).values
+    return hashlib.sha1(h.tobytes()).hexdigest()[:20]
+
+
+def _metrics(prob: np.ndarray, y: np.ndarray) -> dict:
+    return {
+        "logloss": float(log_loss(y, prob, labels=[0, 1, 2])),
+        "accuracy": float(accuracy_score(y, np.argmax(prob, axis=1))),
+        "rows": int(len(y)),
+    }
+
+
+def _fit_pool(pool_key: str, mats: dict, params: dict, nthread: int) -> dict:
+    """Worker: treina o especialista de 1 pool (early stopping no VAL do pool)."""
+    t0 = time.perf_counter()
+    dtrain = xgb.DMatrix(mats["X_train"], label=mats["y_train"], weight=mats["w_train"])
+    dval = xgb.DMatrix(mats["X_val"], label=mats["y_val"])
+    booster = xgb.train(
+        params={**params, "nthread": nthread},
+        dtrain=dtrain,
+        num_boost_round=NUM_BOOST_ROUND,
+        evals=[(dval, "val")],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        verbose_eval=False,
+    )
+    prob_val = booster.predict(dval)
+    prob_test = booster.predict(xgb.DMatrix(mats["X_test"]))
+    return {
+        "pool_key": pool_key,
+        "model_raw": bytes(booster.save_raw(raw_format="json")),
+        "best_iteration": int(getattr(booster, "best_iteration", -1)),
+        "val": _metrics(prob_val, mats["y_val"]),
+        "test": _metrics(prob_test, mats["y_test"]),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def pool_matrices(pipeline: FeaturePipeline, tr: pd.DataFrame, va: pd.DataFrame, te: pd.DataFrame) -> dict:
+    y_train = tr["target_1x2"].values.astype(int)
+    _, w = class_weights(y_train)
+    return {
+        "X_train": pipeline.transform(tr), "y_train": y_train,
+        "w_train": np.array([w[int(v)] for v in y_train], dtype=float),
+        "X_val": pipeline.transform(va), "y_val": va["target_1x2"].values.astype(int),
+        "X_test": pipeline.transform(te), "y_test": te["target_1x2"].values.astype(int),
+    }
+
+
+def train_specialists(
+    df: pd.DataFrame,
+    workers: int = 1,
+    min_train_rows: int = MIN_TRAIN_ROWS,
+    force: bool = False,
+    promote: bool = True,
+    route_all: bool = False,
+) -> pd.DataFrame:
+    params, _ = resolve_params()
+    train_df, val_df, test_df = split_by_pool_temporal(df, train_frac=TRAIN_FRAC, val_frac=VAL_FRAC)
+    global_model = ModelRegistry().load()
+
+    manifest = read_manifest() or {}
+    routes = dict(manifest.get("routes") or {})
+
+    jobs, report = {}, []
+    for pk, g in df.groupby("pool_key", sort=True, observed=True):
+        pk = str(pk)
+        name = pool_model_name(pk)
+        tr = train_df[train_df["pool_key"].astype(str) == pk]
+        va = val_df[val_df["pool_key"].astype(str) == pk]
+        te = test_df[test_df["pool_key"].astype(str) == pk]
+        row = {"pool_key": pk, "model": name, "train_rows": len(tr), "test_rows": len(te)}
+
+        if len(tr) < min_train_rows or len(va) == 0 or len(te) == 0:
+            routes.pop(pk, None)
+            report.append({**row, "status": "fallback_global"})
+            continue
+
+        fp = pool_fingerprint(g)
+        reg = ModelRegistry(name)
+        if not force and reg.champion() and reg.meta().get("pool_sha1") == fp:
+            if route_all or reg.meta().get("beats_global_val"):
+                routes[pk] = {"name": name, "version": reg.champion()}
+            else:
+                routes.pop(pk, None)
+            report.append({**row, "status": "unchanged", "version": reg.champion(), "routed": pk in routes})
+            continue
+
+        pipeline = FeaturePipeline.fit(g)
+        jobs[pk] = (name, fp, pipeline, pool_matrices(pipeline, tr, va, te), va, te, row)
+
+    if jobs:
+        workers = max(1, min(workers, len(jobs)))
+        nthread = max(1, (os.cpu_count() or 1) // workers)
+        print(f"[INFO] {len(jobs)} pools p/ treinar | {workers} workers x nthread={nthread}")
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(_fit_pool, pk, job[3], params, nthread) for pk, job in jobs.items()]
+            results = [f.result() for f in futures]
+
+        for r in results:
+            name, fp, pipeline, _, va, te, row = jobs[r["pool_key"]]
+            booster = xgb.Booster(model_file=bytearray(r["model_raw"]))
+            g_val, g_test = (
+                _metrics(global_model.booster.predict(xgb.DMatrix(global_model.pipeline.transform(d))),
+                         d["target_1x2"].values.astype(int))
+                for d in (va, te)
+            )
+            beats = r["val"]["logloss"] < g_val["logloss"]
+
+            reg = ModelRegistry(name)
+            version = reg.register(booster, pipeline, {
+                "pool_key": r["pool_key"],
+                "pool_sha1": fp,
+                "metrics": {"val": r["val"], "test": r["test"], "global_val": g_val, "global_test": g_test},
+                "beats_global_val": bool(beats),
+                "best_iteration": r["best_iteration"],
+                "xgb_params": params,
+                "fallback": DEFAULT_MODEL_NAME,
+            })
+            if promote:
+                reg.promote(version, reason="train_pool_specialists.py")
+                if route_all or beats:
+                    routes[r["pool_key"]] = {"name": name, "version": version}
+                else:
+                    routes.pop(r["pool_key"], None)
+            report.append({
+                **row, "status": "trained", "version": version, "seconds": r["seconds"],
+                "routed": r["pool_key"] in routes,
+                "val_logloss": r["val"]["logloss"], "global_val_logloss": g_val["logloss"],
+                "test_logloss": r["test"]["logloss"], "global_test_logloss": g_test["logloss"],
+                "test_accuracy": r["test"]["accuracy"], "global_test_accuracy": g_test["accuracy"],
+            })
+
+    if promote:
+        write_manifest(routes)
+    return pd.DataFrame(report).sort_values("pool_key").reset_index(drop=True)
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Treina 1 XGBoost 1X2 por pool_key (+ manifesto do roteador).")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--min-train-rows", type=int, default=MIN_TRAIN_ROWS,
+                    help="pools com menos jogos de TRAIN usam o modelo global")
+    ap.add_argument("--force", action="store_true", help="retreina mesmo pools sem dados novos")
+    ap.add_argument("--no-promote", action="store_true", help="só registra; não troca champions nem o roteador")
+    ap.add_argument("--route-all", action="store_true",
+                    help="roteia p/ o especialista mesmo se ele perder do global no VAL do pool")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    df = load_model_frame(DATA_PATH)
+    report = train_specialists(
+        df,
+        workers=args.workers,
+        min_train_rows=args.min_train_rows,
+        force=args.force,
+        promote=not args.no_promote,
+        route_all=args.route_all,
+    )
+
+    print("\n" + "=" * 70)
+    print("ESPECIALISTAS POR POOL")
+    print("=" * 70)
+    print(report.round(4).to_string(index=False))
+
+    if not args.no_promote:
+        router = PoolRouter.load()
+        print(f"\n[OK] Roteador: {len(router.describe())} pools com especialista; resto -> {DEFAULT_MODEL_NAME} ({router.fallback.version})")
+    print(f"[OK] Tempo total: {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# Backend/ml/train/tune_1x2_xgb.py
+# ------------------------------------------------------------
+# Busca de hiperparâmetros do XGBoost 1X2 em paralelo
+#
+# - Matrizes train/val montadas 1x (cache do treino) e gravadas em binário
+#   num diretório temporário; cada worker carrega 1x (somente leitura)
+# - Process pool com nthread limitado por worker (workers * nthread <= núcleos)
+# - Successive halving: todas as configs rodam até o 1º degrau de rounds,
+#   só as melhores (val mlogloss) seguem para o próximo degrau (continuando
+#   o booster, sem recomeçar). Early stopping igual ao treino.
+# - Salva tabela de resultados e promove a melhor config para
+#   Backend/ml/models/xgb_1x2_tuned.json (usada pelo treino)
+#
+# Uso:
+#   python tune_1x2_xgb.py --trials 48 --workers 4
+# Saída: Backend/ml/train/hparam_search_results.csv
+# ------------------------------------------------------------
+
+import os
+import json
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from train_1x2_xgb import (
+    DEFAULT_PARAMS,
+    EARLY_STOPPING_ROUNDS,
+    NUM_BOOST_ROUND,
+    TUNED_PATH,
+    load_feature_matrices,
+)
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
+ML_DIR = os.path.abspath(os.path.join(THIS_DIR, ".."))
+DATA_PATH = os.path.join(ML_DIR, "datasets", "matches_enriched.csv")
+OUT_CSV = os.path.join(THIS_DIR, "hparam_search_results.csv")
+
+# Degraus de rounds do successive halving (último = teto do treino)
+RUNGS = [100, 300, 900, 2700, NUM_BOOST_ROUND]
+KEEP_FRAC = 1.0 / 3.0
+
+TUNED_KEYS = ["max_depth", "eta", "subsample", "colsample_bytree", "min_child_weight", "gamma", "lambda", "alpha"]
+
+
+# =========================
+# Espaço de busca
+# =========================
+
+def sample_params(rng: np.random.Generator) -> dict:
+    def loguniform(lo, hi):
+        return float(np.exp(rng.uniform(np.log(lo), np.log(hi))))
+
+    return {
+        "max_depth": int(rng.integers(3, 9)),
+        "eta": round(loguniform(0.01, 0.1), 5),
+        "subsample": round(float(rng.uniform(0.6, 1.0)), 3),
+        "colsample_bytree": round(float(rng.uniform(0.5, 1.0)), 3),
+        "min_child_weight": round(loguniform(0.5, 20.0), 3),
+        "gamma": round(float(rng.uniform(0.0, 1.0)), 3),
+        "lambda": round(loguniform(0.5, 10.0), 3),
+        "alpha": round(loguniform(1e-3, 1.0), 4),
+    }
+
+
+def build_trials(n_trials: int, seed: int) -> List[dict]:
+    """Trial 0 = params atuais do treino (baseline); o resto é amostrado."""
+    rng = np.random.default_rng(seed)
+    trials = [{k: DEFAULT_PARAMS[k] for k in TUNED_KEYS}]
+    while len(trials) < n_trials:
+        trials.append(sample_params(rng))
+    return trials
+
+
+# =========================
+# Worker (matrizes carregadas 1x por processo)
+# =========================
+
+_MATS: Dict[str, xgb.DMatrix] = {}
+
+
+def _init_worker(mats_dir: str):
+    _MATS["train"] = xgb.DMatrix(os.path.join(mats_dir, "train.buffer"))
+    _MATS["val"] = xgb.DMatrix(os.path.join(mats_dir, "val.buffer"))
+
+
+def _run_trial(trial_id: int, tuned: dict, nthread: int, target_rounds: int, model_raw: Optional[bytes]) -> dict:
+    """Treina (ou continua) 1 trial até `target_rounds` rounds no total."""
+    params = {**DEFAULT_PARAMS, **tuned, "nthread": nthread}
+    init = xgb.Booster(model_file=bytearray(model_raw)) if model_raw else None
+    done = init.num_boosted_rounds() if init is not None else 0
+
+    evals_result = {}
+    booster = xgb.train(
+        params=params,
+        dtrain=_MATS["train"],
+        num_boost_round=max(0, target_rounds - done),
+        evals=[(_MATS["val"], "val")],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        evals_result=evals_result,
+        verbose_eval=False,
+        xgb_model=init,
+    )
+
+    curve = evals_result.get("val", {}).get("mlogloss", [])
+    n_rounds = booster.num_boosted_rounds()
+    return {
+        "trial": trial_id,
+        "rounds": n_rounds,
+        "best_iteration": int(getattr(booster, "best_iteration", n_rounds - 1)),
+        "val_mlogloss": float(getattr(booster, "best_score", min(curve) if curve else np.nan)),
+        "stopped": n_rounds < target_rounds,  # early stopping -> convergiu, não precisa de mais rounds
+        "model_raw": bytes(booster.save_raw()),
+    }
+
+
+# =========================
+# Successive halving
+# =========================
+
+def run_search(trials: List[dict], workers: int, mats_dir: str) -> pd.DataFrame:
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers, len(trials)))
+    nthread = max(1, cores // workers)
+    print(f"[INFO] {len(trials)} trials | {workers} workers x nthread={nthread} ({cores} núcleos)")
+
+    state = {
+        i: {"trial": i, **t, "rung": 0, "rounds": 0, "best_iteration": -1,
+            "val_mlogloss": np.nan, "status": "running", "model_raw": None}
+        for i, t in enumerate(trials)
+    }
+    alive = list(state.keys())
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mats_dir,)) as ex:
+        for rung, target in enumerate(RUNGS):
+            futures = [
+                ex.submit(_run_trial, i, trials[i], nthread, target, state[i]["model_raw"])
+                for i in alive
+            ]
+            for fut in futures:
+                r = fut.result()
+                st = state[r["trial"]]
+                # continuação só conta se melhorou o melhor ponto dos degraus anteriores
+                if not (r["val_mlogloss"] >= st["val_mlogloss"]):
+                    st.update({k: r[k] for k in ("best_iteration", "val_mlogloss")})
+                st.update({k: r[k] for k in ("rounds", "model_raw")})
+                st["rung"] = rung
+                if r["stopped"]:
+                    st["status"] = "converged"
+
+            ranked = sorted(alive, key=lambda i: state[i]["val_mlogloss"])
+            best = state[ranked[0]]
+            print(f"[INFO] Degrau {rung} ({target} rounds): {len(alive)} trials | melhor val mlogloss {best['val_mlogloss']:.5f} (trial {best['trial']})")
+
+            if rung == len(RUNGS) - 1:
+                break
+
+            keep = set(ranked[:max(1, int(np.ceil(len(ranked) * KEEP_FRAC)))])
+            for i in alive:
+                if i not in keep and state[i]["status"] == "running":
+                    state[i]["status"] = "pruned"
+                if state[i]["status"] != "running":
+                    state[i]["model_raw"] = None
+            alive = [i for i in ranked if i in keep and state[i]["status"] == "running"]
+            if not alive:
+                break
+
+    for st in state.values():
+        st.pop("model_raw", None)
+        if st["status"] == "running":
+            st["status"] = "completed"
+
+    return pd.DataFrame(list(state.values())).sort_values("val_mlogloss").reset_index(drop=True)
+
+
+def promote_best(results: pd.DataFrame, tuned_path: str, results_path: str) -> dict:
+    """Grava a melhor config em xgb_1x2_tuned.json (o treino passa a usá-la)."""
+    best = results.iloc[0]
+    tuned = {
+        "params": {k: (int(best[k]) if k == "max_depth" else float(best[k])) for k in TUNED_KEYS},
+        "val_mlogloss": float(best["val_mlogloss"]),
+        "best_iteration": int(best["best_iteration"]),
+        "trial": int(best["trial"]),
+        "n_trials": int(len(results)),
+        "searched_at": datetime.now().isoformat(timespec="seconds"),
+        "results_path": os.path.relpath(results_path, ML_DIR).replace(os.sep, "/"),  # relativo a Backend/ml
+    }
+
+    tmp = tuned_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(tuned, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, tuned_path)
+    return tuned
+
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Busca de hiperparâmetros do XGBoost 1X2 (successive halving).")
+    ap.add_argument("--trials", type=int, default=27)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--no-promote", action="store_true", help="só gera a tabela, não grava o xgb_1x2_tuned.json")
+    ap.add_argument("--out", default=OUT_CSV)
+    args = ap.parse_args()
+
+    mats = load_feature_matrices(DATA_PATH)
+    mats_dir = tempfile.mkdtemp(prefix="xgb_tune_")
+    try:
+        mats["train"].save_binary(os.path.join(mats_dir, "train.buffer"))
+        mats["val"].save_binary(os.path.join(mats_dir, "val.buffer"))
+        del mats
+
+        results = run_search(build_trials(args.trials, args.seed), args.workers, mats_dir)
+    finally:
+        shutil.rmtree(mats_dir, ignore_errors=True)
+
+    results.to_csv(args.out, index=False, encoding="utf-8")
+
+    print("\n" + "=" * 70)
+    print("TOP 5 (val mlogloss)")
+    print("=" * 70)
+    print(results.head(5).to_string(index=False))
+    print(f"\n[OK] Resultados: {args.out}")
+
+    if not args.no_promote:
+        tuned = promote_best(results, TUNED_PATH, args.out)
+        print(f"[OK] Melhor config promovida em: {TUNED_PATH} (trial {tuned['trial']}, val mlogloss {tuned['val_mlogloss']:.5f})")
+        print("[OK] Rode train_1x2_xgb.py para treinar o modelo final com ela.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# Backend/ml/train/update_1x2_xgb.py
+# ------------------------------------------------------------
+# Atualização incremental do XGBoost 1X2 (pós-rodada), sem retreino completo
+#
+# - Carrega o champion do registro (booster + pipeline de features)
+# - Janela recente: jogos dos últimos --window-days antes do holdout
+# - Holdout: jogos dos últimos --holdout-days (nunca usados na atualização)
+# - Candidato = champion + --rounds rounds treinados só na janela
+#   (xgb.train(..., xgb_model=champion)), pesos por classe da janela
+# - Compara logloss no holdout: candidato só é registrado/promovido se
+#   ganhar do champion por pelo menos --min-gain; senão fica o champion
+#
+# - Meta do candidato: trained_through = início do holdout (a janela cai
+#   dentro do TEST do treino completo). Avaliação no TEST / tabela OOS /
+#   staking descartam jogos até essa data (models/oos_predictions.py).
+#   best_iteration, métricas e split do pai não são herdados (não valem
+#   p/ o booster novo)
+#
+# Obs: o layout de colunas é o do champion. Pool/competição nova (não vista
+# no treino completo) entra com one-hot zerado até o próximo treino completo.
+#
+# Uso (ex.: cron noturno, depois do build_dataset.py --incremental):
+#   python Backend/ml/train/update_1x2_xgb.py --rounds 40
+# ------------------------------------------------------------
+
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import accuracy_score, log_loss
+
+from train_1x2_xgb import DEFAULT_PARAMS, class_weights, load_model_frame
+from model_registry import ModelRegistry
+
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))  # .../Backend/ml/train
+ML_DIR = os.path.abspath(os.path.join(THIS_DIR, ".."))
+DATA_PATH = os.path.join(ML_DIR, "datasets", "matches_enriched.csv")
+
+DEFAULT_ROUNDS = 40
+DEFAULT_WINDOW_DAYS = 180
+DEFAULT_HOLDOUT_DAYS = 21
+
+# chaves do meta do pai que não descrevem o candidato
+NOT_INHERITED = ("name", "version", "registered_at", "files", "best_iteration", "metrics", "split", "trained_through")
+
+
+def unseen_category_rows(df: pd.DataFrame, pipeline) -> int:
+    """Linhas com pool/competição fora do layout do champion (one-hot zerado)."""
+    miss = np.zeros(len(df), dtype=bool)
+    for c, levels in pipeline.cat_levels.items():
+        miss |= ~df[c].astype(str).isin(set(levels)).values
+    return int(miss.sum())
+
+
+def holdout_metrics(booster: xgb.Booster, dmat: xgb.DMatrix, y: np.ndarray) -> dict:
+    prob = booster.predict(dmat)
+    return {
+        "logloss": float(log_loss(y, prob, labels=[0, 1, 2])),
+        "accuracy": float(accuracy_score(y, np.argmax(prob, axis=1))),
+        "rows": int(len(y)),
+    }
+
+
+def incremental_update(
+    registry: ModelRegistry,
+    df: pd.DataFrame,
+    rounds: int = DEFAULT_ROUNDS,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+    holdout_days: int = DEFAULT_HOLDOUT_DAYS,
+    eta: Optional[float] = None,
+    min_gain: float = 0.0,
+    promote: bool = True,
+    base_version: Optional[str] = None,
+) -> dict:
+    """
+    Roda 1 atualização. Retorna {"accepted", "champion", "candidate"(se registrado),
+    "champion_holdout", "candidate_holdout", "window_rows", ...}.
+    """
+    champ = registry.load(base_version)
+    pipeline = champ.pipeline
+
+    date_max = df["date"].max()
+    holdout_start = date_max - pd.Timedelta(days=holdout_days)
+    window_start = holdout_start - pd.Timedelta(days=window_days)
+
+    win = df[(df["date"] > window_start) & (df["date"] <= holdout_start)]
+    hold = df[df["date"] > holdout_start]
+    if len(win) == 0 or len(hold) == 0:
+        raise RuntimeError("Janela ou holdout vazio. Ajuste --window-days/--holdout-days.")
+
+    unseen = unseen_category_rows(pd.concat([win, hold]), pipeline)
+    if unseen:
+        print(f"[WARN] {unseen} jogos com pool/competição fora do layout do champion (one-hot zerado); "
+              f"rode um treino completo p/ incluí-los")
+
+    y_win = win["target_1x2"].values.astype(int)
+    y_hold = hold["target_1x2"].values.astype(int)
+    _, w = class_weights(y_win)
+    dwin = xgb.DMatrix(pipeline.transform(win), label=y_win,
+                       weight=np.array([w[int(v)] for v in y_win], dtype=float))
+    dhold = xgb.DMatrix(pipeline.transform(hold), label=y_hold)
+
+    params = {**DEFAULT_PARAMS, **(champ.meta.get("xgb_params") or {})}
+    if eta is not None:
+        params["eta"] = eta
+
+    t0 = time.perf_counter()
+    candidate = xgb.train(params, dwin, num_boost_round=rounds, xgb_model=champ.booster)
+    fit_s = time.perf_counter() - t0
+
+    m_champ = holdout_metrics(champ.booster, dhold, y_hold)
+    m_cand = holdout_metrics(candidate, dhold, y_hold)
+    accepted = m_cand["logloss"] <= m_champ["logloss"] - min_gain
+
+    out = {
+        "accepted": bool(accepted),
+        "champion": champ.version,
+        "champion_holdout": m_champ,
+        "candidate_holdout": m_cand,
+        "window_rows": int(len(win)),
+        "window_start": str(window_start.date()),
+        "holdout_start": str(holdout_start.date()),
+        "date_max": str(date_max.date()),
+        "fit_seconds": round(fit_s, 2),
+    }
+    if not accepted:
+        return out
+
+    meta = {
+        **{k: v for k, v in champ.meta.items() if k not in NOT_INHERITED},
+        "parent_version": champ.version,
+        "date_max": out["date_max"],
+        "trained_through": out["holdout_start"],
+        "metrics": {"holdout": m_cand},
+        "xgb_params": params,
+        "update": {
+            "kind": "incremental",
+            "rounds": int(rounds),
+            "total_rounds": int(candidate.num_boosted_rounds()),
+            "window_start": out["window_start"],
+            "holdout_start": out["holdout_start"],
+            "window_rows": out["window_rows"],
+            "parent_holdout": m_champ,
+        },
+    }
+    version = registry.register(candidate, pipeline, meta)
+    if promote:
+        registry.promote(version, reason=f"update_1x2_xgb.py (holdout {m_champ['logloss']:.4f} -> {m_cand['logloss']:.4f})")
+    out["candidate"] = version
+    return out
+
+
+def main(argv: Optional[list] = None):
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Atualização incremental do champion XGBoost 1X2.")
+    ap.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="rounds adicionados ao champion")
+    ap.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS)
+    ap.add_argument("--holdout-days", type=int, default=DEFAULT_HOLDOUT_DAYS)
+    ap.add_argument("--eta", type=float, default=None, help="eta dos rounds novos (padrão: o do champion)")
+    ap.add_argument("--min-gain", type=float, default=0.0, help="ganho mínimo de logloss no holdout p/ aceitar")
+    ap.add_argument("--base-version", default=None, help="versão de partida (padrão: champion)")
+    ap.add_argument("--no-promote", action="store_true", help="registra o candidato aceito sem trocar o champion")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    df = load_model_frame(DATA_PATH)
+    registry = ModelRegistry()
+    res = incremental_update(
+        registry, df,
+        rounds=args.rounds,
+        window_days=args.window_days,
+        holdout_days=args.holdout_days,
+        eta=args.eta,
+        min_gain=args.min_gain,
+        promote=not args.no_promote,
+        base_version=args.base_version,
+    )
+
+    print("\n" + "-" * 70)
+    print(f"[INFO] Champion: {res['champion']} | janela {res['window_start']} .. {res['holdout_start']} "
+          f"({res['window_rows']} jogos) | holdout até {res['date_max']}")
+    print(f"[INFO] Holdout champion:  logloss {res['champion_holdout']['logloss']:.4f} | acc {res['champion_holdout']['accuracy']:.4f} "
+          f"({res['champion_holdout']['rows']} jogos)")
+    print(f"[INFO] Holdout candidato: logloss {res['candidate_holdout']['logloss']:.4f} | acc {res['candidate_holdout']['accuracy']:.4f}")
+    if res["accepted"]:
+        state = "promovido a champion" if not args.no_promote else "registrado (champion mantido)"
+        print(f"[OK] Candidato {res['candidate']} {state}")
+    else:
+        print("[OK] Candidato não ganhou no holdout; champion mantido")
+    print(f"[OK] Tempo total: {time.perf_counter() - t0:.1f}s (rounds novos: {res['fit_seconds']:.1f}s)")
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    main()